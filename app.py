@@ -1,43 +1,207 @@
 from flask import Flask, render_template, redirect, url_for, session
 import os
+import click
 from datetime import datetime
 from database.models import db  # Import db after models setup
 from flask_migrate import Migrate
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.urandom(24)
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quiz_master.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Adaptive testing: stop after max items, or once the ability SE is small enough
+    app.config['ADAPTIVE_MAX_ITEMS'] = 20
+    app.config['ADAPTIVE_MIN_ITEMS'] = 5
+    app.config['ADAPTIVE_TARGET_SE'] = 0.3
+    # PBKDF2 cost factor; existing hashes are upgraded on next login when changed
+    app.config['PASSWORD_HASH_ITERATIONS'] = 600000
+    # Catalog fragment cache: per-process LRU budget and optional shared directory
+    app.config['FRAGMENT_CACHE_BYTES'] = 16 * 1024 * 1024
+    app.config['FRAGMENT_CACHE_DIR'] = None
+    # Scores older than this move to quarterly columnar files on `flask archive-scores`
+    app.config['SCORE_ARCHIVE_DIR'] = os.path.join(app.instance_path, 'score_archive')
+    app.config['SCORE_ARCHIVE_AFTER_DAYS'] = 730
+    # Event log: buffered events are written once this many are waiting, or every interval seconds
+    app.config['EVENT_BATCH_SIZE'] = 500
+    app.config['EVENT_FLUSH_INTERVAL'] = 1.0
+    # Content-addressed question images
+    app.config['MEDIA_ROOT'] = os.path.join(app.instance_path, 'media')
+    app.config['MEDIA_MAX_BYTES'] = 10 * 1024 * 1024
+    # Token buckets per endpoint and scope as (capacity, seconds); state shared by all workers
+    app.config['RATE_LIMIT_ENABLED'] = True
+    app.config['RATE_LIMIT_DB'] = os.path.join(app.instance_path, 'rate_limits.db')
+    app.config['RATE_LIMITS'] = {
+        # A whole class logs in from one school NAT address; the user bucket stops guessing
+        'auth.login': {'ip': (300, 60), 'user': (5, 60), 'endpoint': (600, 60)},
+        'auth.register': {'ip': (5, 3600), 'endpoint': (60, 60)},
+        'user.submit_quiz': {'user': (10, 60), 'ip': (600, 60)},
+    }
+    # Admission control: queue, then shed, non-critical requests while DB writes are slow
+    app.config['ADMISSION_ENABLED'] = True
+    app.config['ADMISSION_LATENCY_MS'] = 100
+    app.config['ADMISSION_EWMA_SECONDS'] = 2.0
+    app.config['ADMISSION_CONCURRENCY'] = 2
+    app.config['ADMISSION_QUEUE_TIMEOUT'] = 0.5
+    app.config['ADMISSION_CRITICAL'] = ('auth.login', 'auth.logout', 'user.submit_quiz', 'user.adaptive_quiz',
+                                        'admin.live_stream', 'admin.admission_stats', 'static')
+    # Background jobs: queue -> jobs allowed to run at once across all `flask worker` processes
+    app.config['JOB_QUEUES'] = {'default': 2, 'index': 1, 'media': 1, 'maintenance': 1}
+    app.config['JOB_RETRY_BACKOFF'] = 30  # Seconds before the first retry; doubles per attempt
+    app.config['JOB_STALE_SECONDS'] = 120  # Running jobs without a worker heartbeat this long are retried
+    app.config['JOB_UPLOAD_DIR'] = os.path.join(app.instance_path, 'job_uploads')  # Files jobs read, e.g. rosters
+    app.config['JOB_RUN_INLINE'] = False  # Run jobs inside enqueue(), e.g. for development without a worker
+    app.config.update(config or {})
 
     # Initialize db with app
     db.init_app(app)
     migrate = Migrate(app, db)  # Initialize Flask-Migrate
 
+    from utils.events import event_log
+    event_log.init_app(app)
+    from utils.rate_limit import rate_limiter
+    rate_limiter.init_app(app)
+    from utils.admission import admission
+    admission.init_app(app)
+    from utils import media
+    media.init_app(app)
+
+    # Template fragment cache ({% cache %} tag)
+    from utils.fragment_cache import FragmentCache, FragmentCacheExtension
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = FragmentCache(
+        max_bytes=app.config['FRAGMENT_CACHE_BYTES'],
+        directory=app.config['FRAGMENT_CACHE_DIR']
+    )
+
     # Register blueprints
     from routes.auth import auth_bp
     from routes.admin import admin_bp
     from routes.user import user_bp
+    from routes.media import media_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(user_bp, url_prefix='/user')
+    app.register_blueprint(media_bp, url_prefix='/media')
 
     @app.route('/')
     def index():
         """Home page - redirect to login"""
         return redirect(url_for('auth.login'))
 
+    @app.cli.command('calibrate-items')
+    @click.option('--model', type=click.Choice(['2PL', '3PL']), default='2PL')
+    def calibrate_items_command(model):
+        """Fit IRT parameters for questions from recorded answers"""
+        from utils.irt import calibrate_items
+        count = calibrate_items(model=model)
+        print(f"Calibrated {count} questions ({model})")
+
+    @app.cli.command('build-recommendations')
+    @click.option('--top', default=10, help='Recommendations stored per user')
+    @click.option('--factors', default=32, help='Latent factors in the SVD')
+    def build_recommendations_command(top, factors):
+        """Recompute quiz recommendations for every student"""
+        from utils.recommend import build_recommendations
+        count = build_recommendations(top_n=top, factors=factors)
+        print(f"Stored recommendations for {count} users")
+
+    @app.cli.command('detect-collusion')
+    @click.argument('quiz_id', type=int)
+    def detect_collusion_command(quiz_id):
+        """Flag attempt pairs with near-identical wrong answers"""
+        from utils.collusion import detect_collusion
+        count = detect_collusion(quiz_id)
+        print(f"Flagged {count} suspicious pairs for quiz {quiz_id}")
+
+    @app.cli.command('import-roster')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--workers', type=int, default=None, help='Hashing processes (default: all cores)')
+    def import_roster_command(path, workers):
+        """Bulk-create student accounts from a CSV roster"""
+        from utils.roster import import_roster_file
+        summary = import_roster_file(path, iterations=app.config['PASSWORD_HASH_ITERATIONS'], workers=workers)
+        print(f"Created {summary['created']} users, skipped {summary['existing']} existing "
+              f"and {summary['duplicates']} duplicate rows")
+        for error in summary['errors']:
+            print(f"  {error}")
+
+    @app.cli.command('refresh-rollups')
+    @click.option('--full', is_flag=True, help='Rebuild from scratch instead of incrementally')
+    def refresh_rollups_command(full):
+        """Update the quiz/chapter/subject statistics rollups"""
+        from utils.rollups import refresh_rollups
+        processed = refresh_rollups(full=full)
+        print(f"Processed {processed} scores")
+
+    @app.cli.command('archive-scores')
+    @click.option('--days', type=int, default=None, help='Archive attempts older than this many days')
+    def archive_scores_command(days):
+        """Move old attempts into compressed quarterly partition files"""
+        from datetime import timedelta
+        from utils.score_archive import archive_scores
+        days = days if days is not None else app.config['SCORE_ARCHIVE_AFTER_DAYS']
+        moved = archive_scores(datetime.utcnow() - timedelta(days=days))
+        print(f"Archived {moved} scores older than {days} days")
+
+    @app.cli.command('replay-events')
+    @click.option('--from-scratch', is_flag=True, help='Clear projections and replay the whole log')
+    @click.option('--projection', 'names', multiple=True, help='Only these projections (repeatable)')
+    def replay_events_command(from_scratch, names):
+        """Update the tables derived from the event log"""
+        from utils.projections import replay, PROJECTIONS
+        unknown = [name for name in names if name not in PROJECTIONS]
+        if unknown:
+            raise click.BadParameter(f"Unknown projection(s): {', '.join(unknown)}")
+        for name, applied in replay(names or None, from_scratch=from_scratch).items():
+            print(f"{name}: applied {applied} events")
+
+    @app.cli.command('build-derivatives')
+    def build_derivatives_command():
+        """Generate any resized image variants that are still pending"""
+        from utils.media import build_derivatives
+        built = build_derivatives()
+        print(f"Built {built} image variants")
+
+    @app.cli.command('sweep-media')
+    @click.option('--min-age', default=3600, show_default=True, help='Only delete files older than this many seconds')
+    def sweep_media_command(min_age):
+        """Delete image files that no blob row references, e.g. after a crash"""
+        from utils.media import sweep_orphans
+        removed = sweep_orphans(min_age=min_age)
+        print(f"Removed {removed} orphaned media files")
+
+    @app.cli.command('index-questions')
+    @click.option('--rebuild', is_flag=True, help='Drop the index and sign every question again')
+    def index_questions_command(rebuild):
+        """Add unindexed questions to the near-duplicate index and rebuild the report"""
+        from utils.duplicates import index_questions, refresh_duplicate_report
+        indexed = index_questions(rebuild=rebuild)
+        print(f"Indexed {indexed} questions; {refresh_duplicate_report()} duplicate clusters")
+
+    @app.cli.command('worker')
+    @click.option('--queue', 'queues', multiple=True, help='Only run jobs from these queues (repeatable)')
+    def worker_command(queues):
+        """Run background jobs until interrupted"""
+        from utils.jobs import run_worker
+        unknown = [name for name in queues if name not in app.config['JOB_QUEUES']]
+        if unknown:
+            raise click.BadParameter(f"Unknown queue(s): {', '.join(unknown)}")
+        print(f"Worker {os.getpid()} running queues: {', '.join(queues or app.config['JOB_QUEUES'])}")
+        run_worker(app, queues)
+
     # Define initialization function
     def create_tables():
         """Create database tables and admin user"""
         with app.app_context():
             db.create_all()
             from database.models import User
+            from utils.security import hash_password
             admin = User.query.filter_by(username='admin@quizmaster.com').first()
             if not admin:
                 admin = User(
                     username='admin@quizmaster.com',
-                    password='admin123',  # Use proper hashing in production
+                    password=hash_password('admin123', app.config['PASSWORD_HASH_ITERATIONS']),
                     full_name='Quiz Master Admin',
                     qualification='Administrator',
                     dob=datetime(1990, 1, 1),
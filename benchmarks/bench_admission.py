@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Load test: quiz submission latency while admins run heavy requests.
+
+Usage: python benchmarks/bench_admission.py [seconds] [scores]
+Serves the app from a threaded development server on a throwaway SQLite
+database holding ``scores`` attempts. Students submit a quiz in a loop
+while a crowd of other students keeps reloading their dashboard and
+results, and admins keep rebuilding the statistics from scratch (a long
+write transaction) and exporting every attempt as CSV (a long read that
+commits have to wait for). The run is repeated with admission control off
+and on, reporting submit latency percentiles and what happened to the
+other requests. Also reports the cost of a rate-limit token take.
+"""
+
+import http.client
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+
+from app import create_app
+from database.models import db
+from utils.admission import admission
+from utils.events import event_log
+from utils.rate_limit import RateLimiter
+
+STUDENTS = 8
+REFRESHERS = 24
+ADMINS = 2
+QUESTIONS = 20
+
+
+class Client:
+    """Keeps the session cookie; redirects are not followed"""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+
+    def request(self, method, path, form=None):
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            conn.request(method, path, urlencode(form) if form else None, headers)
+            response = conn.getresponse()
+            response.read()
+        finally:
+            conn.close()
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status
+
+
+def populate(conn, scores):
+    rng = random.Random(scores)
+    cur = conn.cursor()
+    cur.execute("INSERT INTO subjects (id, name) VALUES (1, 'Subject')")
+    cur.execute("INSERT INTO chapters (id, name, subject_id) VALUES (1, 'Chapter', 1)")
+    cur.execute("INSERT INTO quizzes (id, chapter_id, title, date_of_quiz, time_duration) VALUES (1, 1, 'Quiz', '2024-01-01', '01:00')")
+    cur.executemany("INSERT INTO questions (id, quiz_id, question_statement, option1, option2, option3, option4, correct_option) "
+                    "VALUES (?, 1, ?, 'a', 'b', 'c', 'd', 1)", [(i, f'Question {i}?') for i in range(1, QUESTIONS + 1)])
+    cur.executemany("INSERT INTO users (username, password, full_name, qualification, dob, is_admin) "
+                    "VALUES (?, ?, ?, 'BSc', '2000-01-01', 0)",
+                    [(f'student{i}@example.com', f'pw{i}', f'Student {i}') for i in range(STUDENTS + REFRESHERS)])
+    cur.executemany("INSERT INTO scores (quiz_id, user_id, time_stamp_of_attempt, total_scored, total_questions, time_taken) "
+                    "VALUES (1, ?, '2024-01-01 10:00:00', ?, 20, '0:10:00')",
+                    [(rng.randint(2, STUDENTS + REFRESHERS + 1), rng.randint(0, 20)) for _ in range(scores)])
+    conn.commit()
+
+
+def run(tmp, seconds, scores, enabled):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, f'bench-{enabled}.db')}",
+        'PASSWORD_HASH_ITERATIONS': 1000,
+        'RATE_LIMIT_ENABLED': False,
+        'ADMISSION_ENABLED': enabled,
+        'JOB_RUN_INLINE': True,  # Keep the statistics refresh inside the admin's request
+    })
+    with app.app_context():
+        populate(db.engine.raw_connection(), scores)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def student(i):
+        client = Client(server.port)
+        client.request('POST', '/login', {'username': f'student{i}@example.com', 'password': f'pw{i}'})
+        answers = {f'question_{q}': random.randint(1, 4) for q in range(1, QUESTIONS + 1)}
+        while not stop.is_set():
+            client.request('GET', '/user/quiz/1/start')
+            start = time.perf_counter()
+            status = client.request('POST', '/user/quiz/1/submit', answers)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses[f'submit {status}'] += 1
+            time.sleep(random.uniform(0.02, 0.1))
+
+    def refresher(i):
+        client = Client(server.port)
+        client.request('POST', '/login', {'username': f'student{i}@example.com', 'password': f'pw{i}'})
+        while not stop.is_set():
+            for path in ('/user/dashboard', '/user/results'):
+                status = client.request('GET', path)
+                with lock:
+                    statuses[f'page {status}'] += 1
+
+    def admin():
+        client = Client(server.port)
+        client.request('POST', '/login', {'username': 'admin@quizmaster.com', 'password': 'admin123'})
+        while not stop.is_set():
+            status = client.request('GET', '/admin/export/scores.csv')
+            with lock:
+                statuses[f'export {status}'] += 1
+            status = client.request('POST', '/admin/reports/refresh', {'full': 1})
+            with lock:
+                statuses[f'refresh {status}'] += 1
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(STUDENTS)]
+    threads += [threading.Thread(target=refresher, args=(i,)) for i in range(STUDENTS, STUDENTS + REFRESHERS)]
+    threads += [threading.Thread(target=admin) for _ in range(ADMINS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+    with app.app_context():
+        event_log.flush()
+
+    latencies.sort()
+    pick = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1000
+    print(f"admission {'on ' if enabled else 'off'}  {len(latencies):5d} submits  p50 {pick(0.5):7.1f}ms  "
+          f"p95 {pick(0.95):7.1f}ms  p99 {pick(0.99):7.1f}ms  max {latencies[-1] * 1000:7.1f}ms")
+    print('             ' + ', '.join(f'{key}: {count}' for key, count in sorted(statuses.items())))
+    if enabled:
+        stats = admission.stats()
+        print(f"             queued {stats['queued']}, shed {stats['shed']}")
+
+
+def bench_rate_limiter(tmp, takes=20000):
+    limiter = RateLimiter()
+    limiter._path = os.path.join(tmp, 'rate_limits.db')
+    start = time.perf_counter()
+    for i in range(takes):
+        limiter.take(f'auth.login:ip:10.0.{i % 256}.{i % 100}', 20, 60)
+    elapsed = time.perf_counter() - start
+    print(f"rate limit take       {elapsed / takes * 1e6:6.1f}us")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 15
+    scores = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_rate_limiter(tmp)
+        print(f"{STUDENTS} students submitting, {REFRESHERS} reloading pages, {ADMINS} admins refreshing and "
+              f"exporting {scores} attempts, {seconds:.0f}s per run")
+        run(tmp, seconds, scores, enabled=False)
+        run(tmp, seconds, scores, enabled=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark score archival and merged live/archive reads.
+
+Usage: python benchmarks/bench_archive.py [scores] [users]
+Loads ``scores`` synthetic attempts spread over five years into a throwaway
+SQLite database, archives everything older than two years, then times a
+student's merged result history before and after archiving and a recent
+(archive-pruned) export scan.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database.models import db
+from utils.score_archive import archive_scores
+from utils.score_store import user_scores, iter_scores
+
+QUIZZES = 200
+YEARS = 5
+
+
+def insert_scores(conn, count, users, now, batch=200000):
+    rng = random.Random(count)
+    span = YEARS * 365 * 86400
+    for start in range(0, count, batch):
+        rows = []
+        for _ in range(min(batch, count - start)):
+            total = rng.randint(5, 20)
+            when = now - timedelta(seconds=rng.randint(0, span))
+            rows.append((rng.randint(1, QUIZZES), rng.randint(2, users + 1), when.strftime('%Y-%m-%d %H:%M:%S'),
+                         rng.randint(0, total), total, f'0:{rng.randint(1, 59):02d}:{rng.randint(0, 59):02d}'))
+        conn.executemany(
+            "INSERT INTO scores (quiz_id, user_id, time_stamp_of_attempt, total_scored, total_questions, time_taken) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+
+
+def timed(label, fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label}: {(time.perf_counter() - start) * 1000 / repeat:.1f}ms ({len(result)} rows)")
+
+
+def main():
+    scores = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    now = datetime.utcnow()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'SCORE_ARCHIVE_DIR': os.path.join(tmp, 'archive'),
+        })
+        with app.app_context():
+            conn = db.engine.raw_connection()
+            cur = conn.cursor()
+            cur.execute("INSERT INTO subjects (id, name) VALUES (1, 'Subject')")
+            cur.execute("INSERT INTO chapters (id, name, subject_id) VALUES (1, 'Chapter', 1)")
+            cur.executemany("INSERT INTO quizzes (id, chapter_id, title, date_of_quiz, time_duration) VALUES (?, 1, ?, '2024-01-01', '01:00')",
+                            [(i, f'Quiz {i}') for i in range(1, QUIZZES + 1)])
+            cur.executemany("INSERT INTO users (id, username, password, full_name, qualification, dob, is_admin) "
+                            "VALUES (?, ?, 'x', ?, 'BSc', '2000-01-01', 0)",
+                            [(i, f'student{i}@example.com', f'Student {i}') for i in range(2, users + 2)])
+            conn.commit()
+
+            start = time.perf_counter()
+            insert_scores(cur.connection, scores, users, now)
+            print(f"Loaded {scores} scores in {time.perf_counter() - start:.1f}s")
+
+            timed("User history (all live)", lambda: user_scores(2))
+
+            start = time.perf_counter()
+            moved = archive_scores(now - timedelta(days=730))
+            print(f"Archived {moved} scores in {time.perf_counter() - start:.2f}s")
+
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(app.config['SCORE_ARCHIVE_DIR']) for name in names)
+            print(f"Archive size: {size / 1e6:.1f}MB ({size / max(moved, 1):.1f} bytes/score)")
+
+            timed("User history (live + archive)", lambda: user_scores(2))
+            timed("Last 30 days export scan", lambda: list(iter_scores(since=now - timedelta(days=30))), repeat=3)
+
+
+if __name__ == '__main__':
+    main()
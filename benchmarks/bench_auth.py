@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark roster import throughput and login latency.
+
+Usage: python benchmarks/bench_auth.py [students] [iterations]
+Runs against a throwaway SQLite database in a temporary directory.
+"""
+
+import csv
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from utils.roster import import_roster_file
+
+
+def write_roster(path, count):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['username', 'password', 'full_name', 'qualification', 'dob'])
+        for i in range(count):
+            writer.writerow([f'student{i}@example.com', f'secret-{i}', f'Student {i}', 'B.Sc', '2004-02-29'])
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 600000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'PASSWORD_HASH_ITERATIONS': iterations,
+        })
+        roster = os.path.join(tmp, 'roster.csv')
+        write_roster(roster, students)
+
+        with app.app_context():
+            start = time.perf_counter()
+            summary = import_roster_file(roster, iterations=iterations)
+            elapsed = time.perf_counter() - start
+        print(f"Import: {summary['created']} users in {elapsed:.1f}s "
+              f"({summary['created'] / elapsed:.0f} users/s on {os.cpu_count()} cores, {iterations} iterations)")
+
+        client = app.test_client()
+        timings = []
+        for i in range(min(students, 50)):
+            start = time.perf_counter()
+            client.post('/login', data={'username': f'student{i}@example.com', 'password': f'secret-{i}'})
+            timings.append((time.perf_counter() - start) * 1000)
+            client.get('/logout')
+        timings.sort()
+        print(f"Login: median {statistics.median(timings):.1f}ms, "
+              f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f}ms over {len(timings)} logins")
+
+
+if __name__ == '__main__':
+    main()
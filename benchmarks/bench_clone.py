@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark set-based chapter cloning.
+
+Usage: python benchmarks/bench_clone.py [quizzes] [questions_per_quiz]
+Runs against a throwaway SQLite database in a temporary directory.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database.models import db, Subject, Chapter, Quiz, Question
+from utils import cloning
+
+
+def main():
+    quiz_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    question_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"})
+        with app.app_context():
+            subject = Subject(name='Benchmark')
+            db.session.add(subject)
+            db.session.flush()
+            chapter = Chapter(name='Source', subject_id=subject.id)
+            db.session.add(chapter)
+            db.session.flush()
+            db.session.execute(Quiz.__table__.insert(), [
+                {'chapter_id': chapter.id, 'title': f'Quiz {i}', 'date_of_quiz': date.today(), 'time_duration': '01:00'}
+                for i in range(quiz_count)
+            ])
+            quiz_ids = [qid for (qid,) in db.session.query(Quiz.id).filter_by(chapter_id=chapter.id)]
+            db.session.execute(Question.__table__.insert(), [
+                {'quiz_id': qid, 'question_statement': f'Question {n} of quiz {qid}?', 'option1': 'A',
+                 'option2': 'B', 'option3': 'C', 'option4': 'D', 'correct_option': 1}
+                for qid in quiz_ids for n in range(question_count)
+            ])
+            db.session.commit()
+
+            start = time.perf_counter()
+            new_id = cloning.clone_chapter(chapter.id, subject.id, name='Copy')
+            elapsed = time.perf_counter() - start
+            copied = Question.query.join(Quiz).filter(Quiz.chapter_id == new_id).count()
+        print(f"Cloned chapter with {quiz_count} quizzes x {question_count} questions "
+              f"({copied} questions copied) in {elapsed * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
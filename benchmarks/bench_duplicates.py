@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark the near-duplicate question index.
+
+Usage: python benchmarks/bench_duplicates.py [questions]
+Builds a throwaway SQLite database with ``questions`` random questions, 5%
+of them lightly edited copies of others, then times the full index build,
+single-question lookups (as done while creating a quiz) and the
+whole-bank cluster report.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database.models import db
+from utils.duplicates import index_questions, find_similar, refresh_duplicate_report, duplicate_clusters
+
+QUIZZES = 1000
+LOOKUPS = 500
+WORDS = [f'word{i}' for i in range(5000)]
+
+
+def random_question(rng):
+    statement = ' '.join(rng.choices(WORDS, k=rng.randint(8, 20))) + '?'
+    return [statement] + [' '.join(rng.choices(WORDS, k=rng.randint(1, 3))) for _ in range(4)]
+
+
+def edit(rng, question):
+    words = question[0].split()
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return [' '.join(words)] + question[1:]
+
+
+def populate(conn, count):
+    rng = random.Random(count)
+    questions = []
+    for _ in range(count):
+        if questions and rng.random() < 0.05:
+            questions.append(edit(rng, rng.choice(questions)))
+        else:
+            questions.append(random_question(rng))
+    cur = conn.cursor()
+    cur.execute("INSERT INTO subjects (id, name) VALUES (1, 'Subject')")
+    cur.execute("INSERT INTO chapters (id, name, subject_id) VALUES (1, 'Chapter', 1)")
+    cur.executemany("INSERT INTO quizzes (id, chapter_id, title, date_of_quiz, time_duration) VALUES (?, 1, ?, '2024-01-01', '01:00')",
+                    [(i, f'Quiz {i}') for i in range(1, QUIZZES + 1)])
+    cur.executemany("INSERT INTO questions (quiz_id, question_statement, option1, option2, option3, option4, correct_option) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 1)",
+                    [(i % QUIZZES + 1, *question) for i, question in enumerate(questions)])
+    conn.commit()
+    return questions
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"})
+        with app.app_context():
+            questions = populate(db.engine.raw_connection(), count)
+            print(f"{count} questions")
+
+            start = time.perf_counter()
+            index_questions()
+            print(f"index build           {time.perf_counter() - start:8.2f}s")
+
+            rng = random.Random(0)
+            timings, found = [], 0
+            for _ in range(LOOKUPS):
+                question = edit(rng, rng.choice(questions))
+                start = time.perf_counter()
+                found += bool(find_similar(question[0], question[1:]))
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            print(f"lookup p50 {timings[len(timings) // 2] * 1000:6.2f}ms  p99 {timings[int(len(timings) * 0.99)] * 1000:6.2f}ms"
+                  f"  ({found}/{LOOKUPS} edited copies found)")
+
+            start = time.perf_counter()
+            clusters = refresh_duplicate_report()
+            print(f"cluster report build  {time.perf_counter() - start:8.2f}s  ({clusters} clusters)")
+
+            start = time.perf_counter()
+            duplicate_clusters()
+            print(f"cluster report read   {time.perf_counter() - start:8.2f}s")
+
+
+if __name__ == '__main__':
+    main()
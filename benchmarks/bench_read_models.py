@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark ORM listings against the column-only read models.
+
+Usage: python benchmarks/bench_read_models.py [rows]
+Builds a throwaway SQLite database with ``rows`` students and ``rows``
+attempts, then for each listing loads and renders ``rows`` entries twice:
+once from full ORM objects (following relationships in the template) and
+once from ``utils.read_models``. Reports wall time and peak Python memory.
+"""
+
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template, render_template_string, session
+
+from app import create_app
+from database.models import db, User, Score
+from utils import read_models
+
+QUIZZES, CHAPTERS, SUBJECTS = 200, 20, 5
+
+ATTEMPTS_ORM = """{% for attempt in attempts %}<tr><td>{{ attempt.quiz.title }}</td>
+<td>{{ attempt.quiz.chapter.subject.name }}</td><td>{{ attempt.user.full_name }}</td>
+<td>{{ attempt.percentage }}%</td><td>{{ attempt.time_stamp_of_attempt.strftime('%Y-%m-%d') }}</td></tr>{% endfor %}"""
+ATTEMPTS_ROWS = """{% for attempt in attempts %}<tr><td>{{ attempt.quiz_title }}</td>
+<td>{{ attempt.subject_name }}</td><td>{{ attempt.full_name }}</td>
+<td>{{ attempt.percentage }}%</td><td>{{ attempt.time_stamp_of_attempt.strftime('%Y-%m-%d') }}</td></tr>{% endfor %}"""
+
+
+def populate(conn, rows):
+    rng = random.Random(rows)
+    cur = conn.cursor()
+    cur.executemany("INSERT INTO subjects (id, name) VALUES (?, ?)", [(i, f'Subject {i}') for i in range(1, SUBJECTS + 1)])
+    cur.executemany("INSERT INTO chapters (id, name, subject_id) VALUES (?, ?, ?)",
+                    [(i, f'Chapter {i}', (i - 1) % SUBJECTS + 1) for i in range(1, CHAPTERS + 1)])
+    cur.executemany("INSERT INTO quizzes (id, chapter_id, title, date_of_quiz, time_duration) VALUES (?, ?, ?, '2024-01-01', '01:00')",
+                    [(i, (i - 1) % CHAPTERS + 1, f'Quiz {i}') for i in range(1, QUIZZES + 1)])
+    cur.executemany("INSERT INTO users (username, password, full_name, qualification, dob, is_admin, created_at) "
+                    "VALUES (?, 'x', ?, 'BSc', '2000-01-01', 0, '2024-01-01 10:00:00')",
+                    [(f'student{i}@example.com', f'Student {i}') for i in range(rows)])
+    cur.executemany("INSERT INTO scores (quiz_id, user_id, time_stamp_of_attempt, total_scored, total_questions, time_taken) "
+                    "VALUES (?, ?, '2024-01-01 10:00:00', ?, 20, '0:10:00')",
+                    [(rng.randint(1, QUIZZES), rng.randint(2, rows + 1), rng.randint(0, 20)) for _ in range(rows)])
+    conn.commit()
+
+
+def measure(label, fn):
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    html = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:8.0f}ms  peak {peak / 1e6:7.1f}MB  ({len(html) // 1024}KB html)")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"})
+        with app.app_context():
+            populate(db.engine.raw_connection(), rows)
+
+        with app.test_request_context():
+            session.update(user_id=1, is_admin=True, full_name='Admin')
+            print(f"{rows} rows per listing")
+            measure("users (ORM)", lambda: render_template(
+                'admin/users.html', users=User.query.filter_by(is_admin=False).all()))
+            measure("users (read model)", lambda: render_template(
+                'admin/users.html', users=read_models.student_rows()))
+            measure("attempts (ORM)", lambda: render_template_string(
+                ATTEMPTS_ORM, attempts=Score.query.order_by(Score.time_stamp_of_attempt.desc()).limit(rows).all()))
+            measure("attempts (read model)", lambda: render_template_string(
+                ATTEMPTS_ROWS, attempts=read_models.attempt_rows(limit=rows)))
+
+
+if __name__ == '__main__':
+    main()
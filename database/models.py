@@ -1,8 +1,19 @@
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from datetime import datetime
 
 db = SQLAlchemy()
 
+@event.listens_for(Engine, 'connect')
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    """SQLite only enforces foreign keys, and runs ON DELETE CASCADE, when asked per connection"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
 class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -64,21 +75,235 @@ class Question(db.Model):
     option3 = db.Column(db.String(200), nullable=False)
     option4 = db.Column(db.String(200), nullable=False)
     correct_option = db.Column(db.Integer, nullable=False)  # 1, 2, 3, or 4
+    # Original question a clone was copied from (through any chain of clones); a
+    # lineage tag rather than a foreign key, so it survives deleting the original
+    source_question_id = db.Column(db.Integer, nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    attachments = db.relationship('Attachment', backref='question', lazy=True, cascade='all, delete-orphan')
+    signature = db.relationship('QuestionSignature', uselist=False, lazy=True, cascade='all, delete-orphan')
+    buckets = db.relationship('QuestionBucket', lazy=True, cascade='all, delete-orphan')
     def __repr__(self):
         return f'<Question {self.id}>'
 
 class Score(db.Model):
     __tablename__ = 'scores'
+    __table_args__ = {'sqlite_autoincrement': True}  # Ids of archived (deleted) attempts must never be reused
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    time_stamp_of_attempt = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    time_stamp_of_attempt = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     total_scored = db.Column(db.Integer, nullable=False)
     total_questions = db.Column(db.Integer, nullable=False)
     time_taken = db.Column(db.String(10))
+    ability = db.Column(db.Float, nullable=True)  # IRT ability estimate for adaptive attempts
+    answers = db.relationship('AttemptAnswer', backref='score', lazy=True, cascade='all, delete-orphan')
     def __repr__(self):
         return f'<Score {self.user_id}-{self.quiz_id}>'
     @property
     def percentage(self):
-        return round((self.total_scored / self.total_questions) * 100, 2)
\ No newline at end of file
+        return round((self.total_scored / self.total_questions) * 100, 2)
+
+class AttemptAnswer(db.Model):
+    __tablename__ = 'attempt_answers'
+    id = db.Column(db.Integer, primary_key=True)
+    score_id = db.Column(db.Integer, db.ForeignKey('scores.id'), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), nullable=False, index=True)
+    chosen_option = db.Column(db.Integer, nullable=True)  # None when the question was skipped
+    is_correct = db.Column(db.Boolean, nullable=False, default=False)
+    def __repr__(self):
+        return f'<AttemptAnswer {self.score_id}-{self.question_id}>'
+
+class ItemCalibration(db.Model):
+    __tablename__ = 'item_calibrations'
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    model = db.Column(db.String(3), nullable=False)  # '2PL' or '3PL'
+    discrimination = db.Column(db.Float, nullable=False)  # a
+    difficulty = db.Column(db.Float, nullable=False)  # b
+    guessing = db.Column(db.Float, nullable=False, default=0.0)  # c, always 0 for 2PL
+    responses = db.Column(db.Integer, nullable=False)
+    calibrated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    def __repr__(self):
+        return f'<ItemCalibration {self.question_id}>'
+
+class Recommendation(db.Model):
+    __tablename__ = 'recommendations'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 1 = best suggestion
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    def __repr__(self):
+        return f'<Recommendation {self.user_id}-{self.rank}>'
+
+class CollusionFlag(db.Model):
+    __tablename__ = 'collusion_flags'
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, index=True)
+    score_a_id = db.Column(db.Integer, db.ForeignKey('scores.id', ondelete='CASCADE'), nullable=False)
+    score_b_id = db.Column(db.Integer, db.ForeignKey('scores.id', ondelete='CASCADE'), nullable=False)
+    similarity = db.Column(db.Float, nullable=False)  # Jaccard similarity of wrong answers
+    shared_wrong = db.Column(db.Integer, nullable=False)  # Identical wrong answers
+    detected_at = db.Column(db.DateTime, default=datetime.utcnow)
+    score_a = db.relationship('Score', foreign_keys=[score_a_id])
+    score_b = db.relationship('Score', foreign_keys=[score_b_id])
+    def __repr__(self):
+        return f'<CollusionFlag {self.score_a_id}-{self.score_b_id}>'
+
+class AppState(db.Model):
+    __tablename__ = 'app_state'
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(255), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    def __repr__(self):
+        return f'<AppState {self.key}={self.value}>'
+
+class QuizStats(db.Model):
+    __tablename__ = 'quiz_stats'
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    passed = db.Column(db.Integer, nullable=False, default=0)
+    percentage_sum = db.Column(db.Float, nullable=False, default=0.0)
+    time_taken_sum = db.Column(db.Integer, nullable=False, default=0)  # Seconds
+    histogram = db.Column(db.String(200), nullable=False, default='0,0,0,0,0,0,0,0,0,0')  # 10% buckets
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    def __repr__(self):
+        return f'<QuizStats {self.quiz_id}>'
+
+class ChapterStats(db.Model):
+    __tablename__ = 'chapter_stats'
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapters.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    passed = db.Column(db.Integer, nullable=False, default=0)
+    percentage_sum = db.Column(db.Float, nullable=False, default=0.0)
+    time_taken_sum = db.Column(db.Integer, nullable=False, default=0)
+    histogram = db.Column(db.String(200), nullable=False, default='0,0,0,0,0,0,0,0,0,0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    def __repr__(self):
+        return f'<ChapterStats {self.chapter_id}>'
+
+class SubjectStats(db.Model):
+    __tablename__ = 'subject_stats'
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    passed = db.Column(db.Integer, nullable=False, default=0)
+    percentage_sum = db.Column(db.Float, nullable=False, default=0.0)
+    time_taken_sum = db.Column(db.Integer, nullable=False, default=0)
+    histogram = db.Column(db.String(200), nullable=False, default='0,0,0,0,0,0,0,0,0,0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    def __repr__(self):
+        return f'<SubjectStats {self.subject_id}>'
+
+class ArchivedScoreSummary(db.Model):
+    __tablename__ = 'archived_score_summaries'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    percentage_sum = db.Column(db.Float, nullable=False, default=0.0)
+    best_percentage = db.Column(db.Float, nullable=False, default=0.0)
+    last_attempt_at = db.Column(db.DateTime, nullable=True)
+    def __repr__(self):
+        return f'<ArchivedScoreSummary {self.user_id}-{self.quiz_id}>'
+
+class Event(db.Model):
+    __tablename__ = 'events'
+    id = db.Column(db.Integer, primary_key=True)  # Append-only; projections checkpoint on this id
+    kind = db.Column(db.String(50), nullable=False)  # e.g. 'quiz.submitted'
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    actor_id = db.Column(db.Integer, nullable=True)  # User who caused the event, if any
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    def __repr__(self):
+        return f'<Event {self.id} {self.kind}>'
+
+class EventCount(db.Model):
+    __tablename__ = 'event_counts'
+    day = db.Column(db.Date, primary_key=True)
+    kind = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    def __repr__(self):
+        return f'<EventCount {self.day} {self.kind}={self.count}>'
+
+class LeaderboardEntry(db.Model):
+    __tablename__ = 'leaderboard_entries'
+    quiz_id = db.Column(db.Integer, primary_key=True)  # No FK: rebuilt from events, quizzes may be gone
+    user_id = db.Column(db.Integer, primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    best_percentage = db.Column(db.Float, nullable=False, default=0.0)
+    best_at = db.Column(db.DateTime, nullable=True)
+    def __repr__(self):
+        return f'<LeaderboardEntry {self.quiz_id}-{self.user_id}>'
+
+class Blob(db.Model):
+    __tablename__ = 'blobs'
+    sha256 = db.Column(db.String(64), primary_key=True)  # Content hash; also the file name in MEDIA_ROOT
+    size = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    def __repr__(self):
+        return f'<Blob {self.sha256[:12]}>'
+
+class BlobVariant(db.Model):
+    __tablename__ = 'blob_variants'
+    source_sha = db.Column(db.String(64), db.ForeignKey('blobs.sha256'), primary_key=True)
+    variant = db.Column(db.String(20), primary_key=True)  # Key of utils.media.VARIANTS
+    sha256 = db.Column(db.String(64), db.ForeignKey('blobs.sha256'), nullable=True)  # Set once generated
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, ready or failed
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    def __repr__(self):
+        return f'<BlobVariant {self.source_sha[:12]} {self.variant}>'
+
+class Attachment(db.Model):
+    __tablename__ = 'attachments'
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), nullable=False, index=True)
+    option = db.Column(db.Integer, nullable=True)  # None for the statement, 1-4 for an option
+    blob_sha = db.Column(db.String(64), db.ForeignKey('blobs.sha256'), nullable=False)
+    def __repr__(self):
+        return f'<Attachment {self.question_id}:{self.option} {self.blob_sha[:12]}>'
+
+class QuestionSignature(db.Model):
+    __tablename__ = 'question_signatures'
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)  # MinHash values, little-endian uint32
+    def __repr__(self):
+        return f'<QuestionSignature {self.question_id}>'
+
+class QuestionBucket(db.Model):
+    __tablename__ = 'question_buckets'
+    key = db.Column(db.BigInteger, primary_key=True)  # LSH key; each band has its own key space
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True, index=True)
+    def __repr__(self):
+        return f'<QuestionBucket {self.key} {self.question_id}>'
+
+class DuplicateMember(db.Model):
+    """A question's cluster in the last near-duplicate report (rebuilt by a job)"""
+    __tablename__ = 'duplicate_members'
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    cluster = db.Column(db.Integer, nullable=False, index=True)
+    similarity = db.Column(db.Float, nullable=False)  # Highest pair similarity in the cluster
+    def __repr__(self):
+        return f'<DuplicateMember {self.question_id} in {self.cluster}>'
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)  # Task registered with utils.jobs.task
+    queue = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments
+    status = db.Column(db.String(10), nullable=False, default='queued', index=True)  # queued, running, succeeded, failed or cancelled
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Pushed back between retries
+    progress = db.Column(db.Float, nullable=True)  # 0-1, reported by the running task
+    message = db.Column(db.String(200), nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON return value
+    error = db.Column(db.Text, nullable=True)  # Traceback of the latest failure
+    worker = db.Column(db.String(100), nullable=True)  # host:pid of the `flask worker` running it
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    actor_id = db.Column(db.Integer, nullable=True)  # User who enqueued it, if any
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
@@ -0,0 +1,37 @@
+"""make scores autoincrement
+
+Revision ID: 7ef06ca41ba9
+Revises: 1a4b1e7a5eab
+Create Date: 2026-10-19 10:02:11.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7ef06ca41ba9'
+down_revision = '1a4b1e7a5eab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite only honours AUTOINCREMENT when the table is created, so rebuild it
+    with op.batch_alter_table('scores', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+
+    # Archived attempts are gone from the table but were all folded into the
+    # rollups first, so the rollup high-water mark is a floor for new ids
+    op.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'scores', 0 "
+               "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'scores')")
+    op.execute("UPDATE sqlite_sequence SET seq = max(seq, "
+               "COALESCE((SELECT CAST(value AS INTEGER) FROM app_state WHERE key = 'rollup_scores_hwm'), 0)) "
+               "WHERE name = 'scores'")
+
+
+def downgrade():
+    with op.batch_alter_table('scores', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
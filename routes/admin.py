@@ -1,10 +1,31 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from database.models import User, Subject, Chapter, Quiz, Question, Score, db
-from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, current_app, Response, stream_with_context
+from database.models import User, Subject, Chapter, Quiz, Question, Attachment, Score, CollusionFlag, QuizStats, ChapterStats, SubjectStats, ArchivedScoreSummary, EventCount, LeaderboardEntry, Job, db
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from utils import cloning
+from utils.live_monitor import live_monitor
+from utils.rollups import summarize, HWM_KEY
+from utils.app_state import get_state
+from utils.fragment_cache import bump_catalog_version
+from utils.score_store import iter_scores
+from utils.events import event_log
+from utils.projections import PROJECTIONS
+from utils import read_models
+from utils.media import store_image, MediaError
+from utils.duplicates import find_similar, duplicate_clusters, REPORT_KEY as DUPLICATES_REPORT_KEY
+from utils.rate_limit import rate_limiter
+from utils.admission import admission
+from utils import jobs
+from datetime import datetime, timedelta
 from functools import wraps
+import csv
+import io
+import json
 
 admin_bp = Blueprint('admin', __name__)
 
+MAX_FORM_QUESTIONS = 200  # Questions one create-quiz form may carry
+
 def admin_required(f):
     """Decorator to ensure only admin can access routes"""
     @wraps(f)
@@ -25,14 +46,16 @@ def dashboard():
         'total_chapters': Chapter.query.count(),
         'total_quizzes': Quiz.query.count(),
         'total_questions': Question.query.count(),
-        'total_attempts': Score.query.count()
+        'total_attempts': Score.query.count() + (
+            db.session.query(func.sum(ArchivedScoreSummary.attempts)).scalar() or 0
+        )
     }
     
     # Recent activities
-    recent_users = User.query.filter_by(is_admin=False).order_by(User.created_at.desc()).limit(5).all()
-    recent_attempts = Score.query.order_by(Score.time_stamp_of_attempt.desc()).limit(5).all()
+    recent_users = read_models.student_rows(newest_first=True, limit=5)
+    recent_attempts = read_models.attempt_rows(limit=5)
     
-    subjects = Subject.query.all()
+    subjects = read_models.subject_rows()
 
     # Pass everything to the dashboard template
     return render_template('admin/dashboard.html',
@@ -41,12 +64,25 @@ def dashboard():
                            recent_attempts=recent_attempts,
                            subjects=subjects)
 
+@admin_bp.route('/live')
+@admin_required
+def live():
+    """Live exam monitor (updates streamed over SSE)"""
+    return render_template('admin/live.html')
+
+@admin_bp.route('/live/stream')
+@admin_required
+def live_stream():
+    """Server-Sent Events stream of live attempt statistics"""
+    return Response(live_monitor.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @admin_bp.route('/subjects')
 @admin_required
 def subjects():
     """Manage subjects"""
-    subjects = Subject.query.all()
-    return render_template('admin/subjects.html', subjects=subjects)
+    # Called from inside the cached fragment, so hits skip the query
+    return render_template('admin/subjects.html', load_subjects=read_models.subject_rows)
 
 @admin_bp.route('/subjects/add', methods=['POST'])
 @admin_required
@@ -57,7 +93,9 @@ def add_subject():
     
     subject = Subject(name=name, description=description)
     db.session.add(subject)
+    bump_catalog_version()
     db.session.commit()
+    event_log.record('subject.created', session['user_id'], subject_id=subject.id, name=name)
     
     flash('Subject added successfully!', 'success')
     return redirect(url_for('admin.subjects'))
@@ -65,12 +103,30 @@ def add_subject():
 @admin_bp.route('/subjects/<int:subject_id>/delete', methods=['POST'])
 @admin_required
 def delete_subject(subject_id):
-    """Delete subject"""
+    """Delete subject (in the background, with everything under it)"""
     subject = Subject.query.get_or_404(subject_id)
-    db.session.delete(subject)
-    db.session.commit()
+    job_id = jobs.enqueue('subjects.delete', session['user_id'], subject_id=subject.id)
+    
+    flash(f'Deleting "{subject.name}" in the background (job #{job_id}).', 'info')
+    return redirect(url_for('admin.subjects'))
+
+@admin_bp.route('/subjects/<int:subject_id>/clone', methods=['POST'])
+@admin_required
+def clone_subject(subject_id):
+    """Copy a subject with all chapters, quizzes and questions"""
+    subject = Subject.query.get_or_404(subject_id)
+    name = request.form.get('name') or f'{subject.name} (Copy)'
+    
+    try:
+        bump_catalog_version()
+        new_id = cloning.clone_subject(subject_id, name=name)
+        jobs.enqueue('questions.index', session['user_id'])
+        event_log.record('subject.cloned', session['user_id'], subject_id=subject_id, new_subject_id=new_id)
+        flash(f'Subject cloned as "{name}"!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Error cloning subject. Please try again.', 'error')
     
-    flash('Subject deleted successfully!', 'success')
     return redirect(url_for('admin.subjects'))
 
 @admin_bp.route('/chapters/<int:subject_id>')
@@ -78,8 +134,9 @@ def delete_subject(subject_id):
 def chapters(subject_id):
     """Manage chapters for a subject"""
     subject = Subject.query.get_or_404(subject_id)
-    chapters = Chapter.query.filter_by(subject_id=subject_id).all()
-    return render_template('admin/chapters.html', subject=subject, chapters=chapters)
+    chapters = Chapter.query.filter_by(subject_id=subject_id)
+    all_subjects = db.session.query(Subject.id, Subject.name).order_by(Subject.name)
+    return render_template('admin/chapters.html', subject=subject, chapters=chapters, all_subjects=all_subjects)
 
 @admin_bp.route('/chapters/add', methods=['POST'])
 @admin_required
@@ -95,7 +152,9 @@ def add_chapter():
     try:
         chapter = Chapter(name=name, description=description, subject_id=subject_id)
         db.session.add(chapter)
+        bump_catalog_version()
         db.session.commit()
+        event_log.record('chapter.created', session['user_id'], chapter_id=chapter.id, subject_id=subject.id, name=name)
         
         flash(f'Chapter "{name}" added successfully to {subject.name}!', 'success')
     except Exception as e:
@@ -113,7 +172,9 @@ def delete_chapter(chapter_id):
     
     try:
         db.session.delete(chapter)
+        bump_catalog_version()
         db.session.commit()
+        event_log.record('chapter.deleted', session['user_id'], chapter_id=chapter_id, subject_id=subject_id)
         flash('Chapter deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -121,13 +182,112 @@ def delete_chapter(chapter_id):
     
     return redirect(url_for('admin.chapters', subject_id=subject_id))
 
+@admin_bp.route('/chapters/<int:chapter_id>/clone', methods=['POST'])
+@admin_required
+def clone_chapter(chapter_id):
+    """Copy a chapter with its quizzes and questions into a subject"""
+    chapter = Chapter.query.get_or_404(chapter_id)
+    target = Subject.query.get_or_404(request.form.get('subject_id', chapter.subject_id))
+    name = request.form.get('name') or (
+        f'{chapter.name} (Copy)' if target.id == chapter.subject_id else chapter.name
+    )
+    
+    try:
+        bump_catalog_version()
+        new_id = cloning.clone_chapter(chapter_id, target.id, name=name)
+        jobs.enqueue('questions.index', session['user_id'])
+        event_log.record('chapter.cloned', session['user_id'], chapter_id=chapter_id,
+                         new_chapter_id=new_id, subject_id=target.id)
+        flash(f'Chapter cloned to {target.name}!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Error cloning chapter. Please try again.', 'error')
+    
+    return redirect(url_for('admin.chapters', subject_id=target.id))
+
+@admin_bp.route('/chapters/<int:chapter_id>/move', methods=['POST'])
+@admin_required
+def move_chapter(chapter_id):
+    """Move a chapter to another subject"""
+    chapter = Chapter.query.get_or_404(chapter_id)
+    target = Subject.query.get_or_404(request.form['subject_id'])
+    bump_catalog_version()
+    cloning.move_chapter(chapter.id, target.id)
+    event_log.record('chapter.moved', session['user_id'], chapter_id=chapter.id, subject_id=target.id)
+    
+    flash(f'Chapter moved to {target.name}!', 'success')
+    return redirect(url_for('admin.chapters', subject_id=target.id))
+
 @admin_bp.route('/quizzes/<int:chapter_id>')
 @admin_required
 def quizzes(chapter_id):
     """Manage quizzes for a chapter"""
     chapter = Chapter.query.get_or_404(chapter_id)
     quizzes = Quiz.query.filter_by(chapter_id=chapter_id).all()
-    return render_template('admin/quizzes.html', chapter=chapter, quizzes=quizzes)
+    all_chapters = db.session.query(Chapter.id, Chapter.name, Subject.name).join(Subject).order_by(Subject.name, Chapter.name).all()
+    return render_template('admin/quizzes.html', chapter=chapter, quizzes=quizzes, all_chapters=all_chapters)
+
+@admin_bp.route('/quizzes/<int:quiz_id>/clone', methods=['POST'])
+@admin_required
+def clone_quiz(quiz_id):
+    """Copy a quiz and its questions into a chapter"""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    target = Chapter.query.get_or_404(request.form.get('chapter_id', quiz.chapter_id))
+    title = request.form.get('title') or (
+        f'{quiz.title} (Copy)' if target.id == quiz.chapter_id else quiz.title
+    )
+    
+    try:
+        bump_catalog_version()
+        new_id = cloning.clone_quiz(quiz_id, target.id, title=title)
+        jobs.enqueue('questions.index', session['user_id'])
+        event_log.record('quiz.cloned', session['user_id'], quiz_id=quiz_id, new_quiz_id=new_id, chapter_id=target.id)
+        flash(f'Quiz cloned to {target.name}!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Error cloning quiz. Please try again.', 'error')
+    
+    return redirect(url_for('admin.quizzes', chapter_id=target.id))
+
+@admin_bp.route('/quizzes/<int:quiz_id>/move', methods=['POST'])
+@admin_required
+def move_quiz(quiz_id):
+    """Move a quiz to another chapter"""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    target = Chapter.query.get_or_404(request.form['chapter_id'])
+    bump_catalog_version()
+    cloning.move_quiz(quiz.id, target.id)
+    event_log.record('quiz.moved', session['user_id'], quiz_id=quiz.id, chapter_id=target.id)
+    
+    flash(f'Quiz moved to {target.name}!', 'success')
+    return redirect(url_for('admin.quizzes', chapter_id=target.id))
+
+@admin_bp.route('/quizzes/<int:quiz_id>/collusion')
+@admin_required
+def collusion_report(quiz_id):
+    """Suspiciously similar answer patterns during the quiz's live window"""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    score_a, score_b = aliased(Score), aliased(Score)
+    user_a, user_b = aliased(User), aliased(User)
+    flags = db.session.query(
+        CollusionFlag, score_a, score_b, user_a.full_name, user_b.full_name
+    ).join(score_a, score_a.id == CollusionFlag.score_a_id).join(
+        score_b, score_b.id == CollusionFlag.score_b_id
+    ).join(user_a, user_a.id == score_a.user_id).join(
+        user_b, user_b.id == score_b.user_id
+    ).filter(CollusionFlag.quiz_id == quiz_id).order_by(
+        CollusionFlag.similarity.desc(), CollusionFlag.shared_wrong.desc()
+    ).all()
+    return render_template('admin/collusion.html', quiz=quiz, flags=flags)
+
+@admin_bp.route('/quizzes/<int:quiz_id>/collusion/run', methods=['POST'])
+@admin_required
+def run_collusion_detection(quiz_id):
+    """Recompute collusion flags for a quiz"""
+    Quiz.query.get_or_404(quiz_id)
+    job_id = jobs.enqueue('collusion.detect', session['user_id'], quiz_id=quiz_id)
+    flash(f'Collusion check started (job #{job_id}); reload this page once it has finished.', 'info')
+    return redirect(url_for('admin.collusion_report', quiz_id=quiz_id))
 
 @admin_bp.route('/create_quiz/<int:chapter_id>', methods=['GET', 'POST'])
 @admin_required
@@ -153,8 +313,12 @@ def create_quiz(chapter_id):
         db.session.add(quiz)
         db.session.flush()
 
-        # Add questions
-        question_count = int(request.form.get('question_count', 1))
+        # Add questions inline: they are typed into this form, so there are few, and the
+        # admin needs validation errors (e.g. a bad image) now. Indexing and image
+        # variants, the slow part, run as jobs once the quiz is committed.
+        question_count = min(int(request.form.get('question_count', 1)), MAX_FORM_QUESTIONS)
+        uploaded = set()
+        added, warnings = [], []
         for i in range(1, question_count + 1):
             question_text = request.form.get(f'question_{i}')
             if question_text:
@@ -173,21 +337,265 @@ def create_quiz(chapter_id):
                     option4=option4,
                     correct_option=correct_option
                 )
+                for match in find_similar(question_text, (option1, option2, option3, option4), limit=1):
+                    warnings.append(f'Question {i} is {match.similarity:.0%} similar to a question in "{match.quiz_title}".')
+                
+                # Optional images for the statement (option None) and each option
+                for option in (None, 1, 2, 3, 4):
+                    upload = request.files.get(f'image_{i}' if option is None else f'option{option}_image_{i}')
+                    if upload and upload.filename:
+                        try:
+                            sha256 = store_image(upload.stream)
+                        except MediaError as e:
+                            db.session.rollback()
+                            flash(f'Question {i}: {e}', 'error')
+                            return redirect(url_for('admin.create_quiz', chapter_id=chapter_id))
+                        question.attachments.append(Attachment(option=option, blob_sha=sha256))
+                        uploaded.add(sha256)
                 db.session.add(question)
+                added.append(question)
 
+        bump_catalog_version()
         db.session.commit()
+        event_log.record('quiz.created', session['user_id'], quiz_id=quiz.id, chapter_id=chapter_id,
+                         questions=question_count)
+        if added:
+            jobs.enqueue('questions.index', session['user_id'], question_ids=[question.id for question in added])
+        if uploaded:
+            jobs.enqueue('media.derivatives', session['user_id'], sha256s=sorted(uploaded))
         flash('Quiz and questions added successfully!', 'success')
+        for warning in warnings:
+            flash(f'{warning} Check the duplicates report.', 'warning')
         return redirect(url_for('admin.quizzes', chapter_id=chapter_id))
 
     return render_template('admin/create_quiz.html', chapter=chapter)
 
+@admin_bp.route('/questions/similar')
+@admin_required
+def similar_questions():
+    """Near-duplicates of a draft question, for warnings while it is typed"""
+    statement = request.args.get('statement', '').strip()
+    if not statement:
+        return jsonify([])
+    options = [request.args.get(f'option{n}', '') for n in range(1, 5)]
+    return jsonify([match._asdict() for match in find_similar(statement, options)])
+
+@admin_bp.route('/duplicates')
+@admin_required
+def duplicates():
+    """Clusters of near-duplicate questions across the whole bank, as last computed"""
+    return render_template('admin/duplicates.html', clusters=duplicate_clusters(),
+                           refreshed_at=get_state(DUPLICATES_REPORT_KEY))
+
+@admin_bp.route('/duplicates/refresh', methods=['POST'])
+@admin_required
+def refresh_duplicates():
+    """Recompute the near-duplicate report (in the background)"""
+    job_id = jobs.enqueue('duplicates.report', session['user_id'])
+    flash(f'Duplicate report refresh started (job #{job_id}).', 'info')
+    return redirect(url_for('admin.duplicates'))
+
+@admin_bp.route('/reports')
+@admin_required
+def reports():
+    """Per-subject statistics, read from the rollup tables only"""
+    rows = db.session.query(Subject.id, Subject.name, SubjectStats).outerjoin(
+        SubjectStats, SubjectStats.subject_id == Subject.id
+    ).order_by(Subject.name).all()
+    items = [(name, url_for('admin.subject_report', subject_id=sid), summarize(stats)) for sid, name, stats in rows]
+    return render_template('admin/reports.html', heading='All Subjects', level='Subject',
+                           items=items, refreshed_upto=get_state(HWM_KEY))
+
+@admin_bp.route('/reports/subject/<int:subject_id>')
+@admin_required
+def subject_report(subject_id):
+    """Per-chapter statistics for a subject"""
+    subject = Subject.query.get_or_404(subject_id)
+    rows = db.session.query(Chapter.id, Chapter.name, ChapterStats).outerjoin(
+        ChapterStats, ChapterStats.chapter_id == Chapter.id
+    ).filter(Chapter.subject_id == subject_id).order_by(Chapter.name).all()
+    items = [(name, url_for('admin.chapter_report', chapter_id=cid), summarize(stats)) for cid, name, stats in rows]
+    return render_template('admin/reports.html', heading=subject.name, level='Chapter',
+                           items=items, refreshed_upto=get_state(HWM_KEY))
+
+@admin_bp.route('/reports/chapter/<int:chapter_id>')
+@admin_required
+def chapter_report(chapter_id):
+    """Per-quiz statistics for a chapter"""
+    chapter = Chapter.query.get_or_404(chapter_id)
+    rows = db.session.query(Quiz.id, Quiz.title, QuizStats).outerjoin(
+        QuizStats, QuizStats.quiz_id == Quiz.id
+    ).filter(Quiz.chapter_id == chapter_id).order_by(Quiz.title).all()
+    items = [(title, None, summarize(stats)) for _, title, stats in rows]
+    return render_template('admin/reports.html', heading=chapter.name, level='Quiz',
+                           items=items, refreshed_upto=get_state(HWM_KEY))
+
+@admin_bp.route('/reports/refresh', methods=['POST'])
+@admin_required
+def refresh_reports():
+    """Fold new attempts into the rollup tables (in the background)"""
+    job_id = jobs.enqueue('reports.refresh', session['user_id'], full=bool(request.form.get('full')))
+    flash(f'Statistics refresh started (job #{job_id}).', 'info')
+    return redirect(request.referrer or url_for('admin.reports'))
+
+@admin_bp.route('/export/scores.csv')
+@admin_required
+def export_scores():
+    """CSV of all attempts, live and archived (optional ?from=&to= dates)"""
+    try:
+        since = datetime.strptime(request.args['from'], '%Y-%m-%d') if request.args.get('from') else None
+        until = datetime.strptime(request.args['to'], '%Y-%m-%d') if request.args.get('to') else None
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.', 'error')
+        return redirect(url_for('admin.reports'))
+    titles = dict(db.session.query(Quiz.id, Quiz.title))
+    usernames = dict(db.session.query(User.id, User.username))
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['score_id', 'username', 'quiz', 'attempted_at', 'total_scored',
+                         'total_questions', 'percentage', 'time_taken', 'ability', 'archived'])
+        for count, row in enumerate(iter_scores(since, until), start=1):
+            writer.writerow([row.id, usernames.get(row.user_id, row.user_id), titles.get(row.quiz_id, row.quiz_id),
+                             row.time_stamp_of_attempt.strftime('%Y-%m-%d %H:%M:%S'), row.total_scored,
+                             row.total_questions, row.percentage if row.total_questions else '',
+                             row.time_taken or '', '' if row.ability is None else row.ability,
+                             int(row.archived)])
+            if count % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=scores.csv'})
+
+@admin_bp.route('/activity')
+@admin_required
+def activity():
+    """Daily event counts from the event log projections"""
+    days = [(datetime.utcnow() - timedelta(days=n)).date() for n in range(13, -1, -1)]
+    counts = {}
+    for day, kind, count in db.session.query(EventCount.day, EventCount.kind, EventCount.count).filter(
+            EventCount.day >= days[0]):
+        counts.setdefault(kind, {})[day] = count
+    checkpoints = {name: get_state(f'projection:{name}', 0) for name in PROJECTIONS}
+    return render_template('admin/activity.html', days=days, counts=dict(sorted(counts.items())),
+                           checkpoints=checkpoints, pending=event_log.pending())
+
+@admin_bp.route('/activity/replay', methods=['POST'])
+@admin_required
+def replay_events():
+    """Apply new events to the projections (or rebuild them from scratch) in the background"""
+    job_id = jobs.enqueue('events.replay', session['user_id'], from_scratch=bool(request.form.get('from_scratch')))
+    flash(f'Projection update started (job #{job_id}).', 'info')
+    return redirect(request.referrer or url_for('admin.activity'))
+
+@admin_bp.route('/quizzes/<int:quiz_id>/leaderboard')
+@admin_required
+def leaderboard(quiz_id):
+    """Best attempt per student, from the leaderboard projection"""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    entries = db.session.query(LeaderboardEntry, User.full_name).outerjoin(
+        User, User.id == LeaderboardEntry.user_id
+    ).filter(LeaderboardEntry.quiz_id == quiz_id).order_by(
+        LeaderboardEntry.best_percentage.desc(), LeaderboardEntry.best_at
+    ).limit(50).all()
+    return render_template('admin/leaderboard.html', quiz=quiz, entries=entries)
+
+@admin_bp.route('/cache/stats')
+@admin_required
+def cache_stats():
+    """Fragment cache counters for this worker process"""
+    cache = current_app.jinja_env.fragment_cache
+    return jsonify(cache.stats() if cache else {})
+
+@admin_bp.route('/admission/stats')
+@admin_required
+def admission_stats():
+    """Write latency, admission decisions and rate-limit refusals of this worker"""
+    return jsonify(admission.stats() | {'rate_limited': rate_limiter.stats()})
+
+@admin_bp.route('/jobs')
+@admin_required
+def job_list():
+    """Background jobs, newest first (optional ?status=)"""
+    status = request.args.get('status')
+    query = Job.query.options(db.defer(Job.payload))
+    if status:
+        query = query.filter(Job.status == status)
+    recent = query.order_by(Job.id.desc()).limit(100).all()
+    counts = {}
+    for queue, job_status, count in db.session.query(Job.queue, Job.status, func.count()).group_by(Job.queue, Job.status):
+        counts.setdefault(queue, {})[job_status] = count
+    seen = jobs.worker_last_seen()
+    worker_alive = seen is not None and datetime.utcnow() - seen < timedelta(minutes=1)
+    return render_template('admin/jobs.html', jobs=recent, counts=counts, status=status,
+                           limits=current_app.config['JOB_QUEUES'], inline=current_app.config['JOB_RUN_INLINE'],
+                           worker_seen=seen, worker_alive=worker_alive)
+
+@admin_bp.route('/jobs/<int:job_id>')
+@admin_required
+def job_status(job_id):
+    """Status and progress of one job, for polling"""
+    job = Job.query.get_or_404(job_id)
+    return jsonify({
+        'id': job.id, 'name': job.name, 'queue': job.queue, 'status': job.status,
+        'attempts': job.attempts, 'max_attempts': job.max_attempts,
+        'progress': job.progress, 'message': job.message,
+        'result': json.loads(job.result) if job.result else None, 'error': job.error,
+        'created_at': job.created_at, 'started_at': job.started_at, 'finished_at': job.finished_at,
+        'run_after': job.run_after
+    })
+
+@admin_bp.route('/jobs/<int:job_id>/retry', methods=['POST'])
+@admin_required
+def retry_job(job_id):
+    """Queue a failed or cancelled job again"""
+    if jobs.retry(job_id):
+        flash(f'Job #{job_id} queued again.', 'success')
+    else:
+        flash(f'Job #{job_id} cannot be retried: only failed or cancelled jobs can, and not once their upload is deleted.', 'error')
+    return redirect(request.referrer or url_for('admin.job_list'))
+
+@admin_bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_job(job_id):
+    """Cancel a job that has not started"""
+    if jobs.cancel(job_id):
+        flash(f'Job #{job_id} cancelled.', 'success')
+    else:
+        flash(f'Job #{job_id} has already started and cannot be cancelled.', 'error')
+    return redirect(request.referrer or url_for('admin.job_list'))
+
 @admin_bp.route('/users')
 @admin_required
 def users():
     """Manage users"""
-    users = User.query.filter_by(is_admin=False).all()
+    users = read_models.student_rows()
     return render_template('admin/users.html', users=users)
 
+@admin_bp.route('/users/import', methods=['POST'])
+@admin_required
+def import_users():
+    """Bulk-create student accounts from an uploaded CSV roster"""
+    roster = request.files.get('roster')
+    if not roster or not roster.filename:
+        flash('Please choose a CSV file to import.', 'error')
+        return redirect(url_for('admin.users'))
+    
+    content = roster.read()
+    try:
+        content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        flash('The roster must be a UTF-8 encoded CSV file.', 'error')
+        return redirect(url_for('admin.users'))
+    # Passwords stay out of the jobs table; the file is deleted when the job ends
+    job_id = jobs.enqueue('users.import', session['user_id'], upload=jobs.save_upload(io.BytesIO(content)))
+    flash(f'Importing the roster in the background (job #{job_id}); see Jobs for the result.', 'info')
+    return redirect(url_for('admin.users'))
+
 @admin_bp.route('/users/<int:user_id>/delete', methods=['POST'])
 @admin_required
 def delete_user(user_id):
@@ -195,6 +603,7 @@ def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
+    event_log.record('user.deleted', session['user_id'], user_id=user_id)
     
     flash('User deleted successfully!', 'success')
     return redirect(url_for('admin.users'))
@@ -216,8 +625,8 @@ def search():
     """Search across users, subjects, and quizzes"""
     query = request.args.get('q', '')
     results = {
-        'users': User.query.filter(User.username.ilike(f'%{query}%')).all() if query else [],
-        'subjects': Subject.query.filter(Subject.name.ilike(f'%{query}%')).all() if query else [],
-        'quizzes': Quiz.query.filter(Quiz.title.ilike(f'%{query}%')).all() if query else []
+        'users': read_models.student_rows(search=query) if query else [],
+        'subjects': read_models.subject_rows(search=query) if query else [],
+        'quizzes': read_models.quiz_rows(search=query) if query else []
     }
     return render_template('admin/search.html', query=query, results=results)
\ No newline at end of file
@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
 from database.models import User, db
 from datetime import datetime
+from utils.security import hash_password, verify_password, verify_dummy, needs_rehash
+from utils.events import event_log
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -13,12 +15,20 @@ def login():
         
         # Find user in database
         user = User.query.filter_by(username=username).first()
+        iterations = current_app.config['PASSWORD_HASH_ITERATIONS']
         
-        if user and user.password == password:  # In production, use proper password hashing
+        # Unknown usernames take as long as wrong passwords
+        if verify_password(user.password, password) if user else verify_dummy(password, iterations):
+            # Upgrade legacy plain-text passwords and hashes with an old cost factor
+            if needs_rehash(user.password, iterations):
+                user.password = hash_password(password, iterations)
+                db.session.commit()
+            
             session['user_id'] = user.id
             session['username'] = user.username
             session['is_admin'] = user.is_admin
             session['full_name'] = user.full_name
+            event_log.record('user.login', user.id, is_admin=user.is_admin)
             
             if user.is_admin:
                 flash('Welcome, Quiz Master!', 'success')
@@ -27,6 +37,7 @@ def login():
                 flash(f'Welcome, {user.full_name}!', 'success')
                 return redirect(url_for('user.dashboard'))
         else:
+            event_log.record('user.login_failed', user.id if user else None, username=username)
             flash('Invalid username or password!', 'error')
     
     return render_template('auth/login.html')
@@ -50,7 +61,7 @@ def register():
         # Create new user
         new_user = User(
             username=username,
-            password=password,  # In production, hash the password
+            password=hash_password(password, current_app.config['PASSWORD_HASH_ITERATIONS']),
             full_name=full_name,
             qualification=qualification,
             dob=dob,
@@ -59,6 +70,7 @@ def register():
         
         db.session.add(new_user)
         db.session.commit()
+        event_log.record('user.registered', new_user.id, username=username)
         
         flash('Registration successful! Please login.', 'success')
         return redirect(url_for('auth.login'))
@@ -68,6 +80,8 @@ def register():
 @auth_bp.route('/logout')
 def logout():
     """Logout user"""
+    if 'user_id' in session:
+        event_log.record('user.logout', session['user_id'])
     session.clear()
     flash('You have been logged out.', 'info')
     return redirect(url_for('auth.login'))
\ No newline at end of file
@@ -0,0 +1,25 @@
+from flask import Blueprint, send_file, session, abort
+from database.models import Blob, db
+from utils.media import blob_path
+import re
+
+media_bp = Blueprint('media', __name__)
+
+SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+@media_bp.route('/<sha256>')
+def blob(sha256):
+    """Serve a stored file; the URL is the content hash, so it never changes"""
+    if 'user_id' not in session:
+        abort(403)
+    if not SHA256.match(sha256):
+        abort(404)
+    stored = db.session.get(Blob, sha256)
+    if stored is None:
+        abort(404)
+
+    # conditional=True answers If-None-Match with 304 and Range with 206
+    response = send_file(blob_path(sha256), mimetype=stored.content_type, conditional=True,
+                         etag=sha256, max_age=31536000)
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
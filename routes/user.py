@@ -1,5 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from database.models import User, Subject, Chapter, Quiz, Question, Score, db
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, current_app
+from database.models import User, Subject, Chapter, Quiz, Question, Score, AttemptAnswer, Recommendation, ArchivedScoreSummary, db
+from sqlalchemy import func
+from utils.irt import item_bank_for_quiz, calibrated_quizzes
+from utils.live_monitor import live_monitor
+from utils.events import event_log
+from utils.score_store import user_scores
+from utils.read_models import attempt_rows
+from utils.media import paper_media
 from datetime import datetime
 from functools import wraps
 
@@ -22,30 +29,48 @@ def dashboard():
     user_id = session['user_id']
     
     # Get user statistics
-    total_attempts = Score.query.filter_by(user_id=user_id).count()
-    recent_attempts = Score.query.filter_by(user_id=user_id).order_by(Score.time_stamp_of_attempt.desc()).limit(5).all()
+    recent_attempts = attempt_rows(user_id=user_id, limit=5)
     
-    # Calculate average score
-    scores = Score.query.filter_by(user_id=user_id).all()
+    # Calculate average score (archived attempts only survive as summary rows)
+    total_attempts, live_sum = db.session.query(
+        func.count(Score.id),
+        func.coalesce(func.sum(Score.total_scored * 100.0 / Score.total_questions), 0.0)
+    ).filter(Score.user_id == user_id).one()
+    archived_attempts, archived_sum = db.session.query(
+        func.coalesce(func.sum(ArchivedScoreSummary.attempts), 0),
+        func.coalesce(func.sum(ArchivedScoreSummary.percentage_sum), 0.0)
+    ).filter(ArchivedScoreSummary.user_id == user_id).one()
+    total_attempts += archived_attempts
     avg_score = 0
-    if scores:
-        avg_score = sum([score.percentage for score in scores]) / len(scores)
+    if total_attempts:
+        avg_score = (live_sum + archived_sum) / total_attempts
     
     # Get available subjects and quizzes
-    available_subjects = Subject.query.all()
+    # The subject list is rendered inside a cached fragment, so pass the query lazily
+    available_subjects = Subject.query.order_by(Subject.id)
     total_quizzes = Quiz.query.count()
     
+    # Precomputed by `flask build-recommendations`
+    recommendations = db.session.query(
+        Quiz.id, Quiz.title, Chapter.name, Subject.name
+    ).select_from(Recommendation).join(
+        Quiz, Quiz.id == Recommendation.quiz_id
+    ).join(Chapter).join(Subject).filter(
+        Recommendation.user_id == user_id
+    ).order_by(Recommendation.rank).limit(5).all()
+    
     stats = {
         'total_attempts': total_attempts,
         'average_score': round(avg_score, 2),
-        'available_subjects': len(available_subjects),
+        'available_subjects': available_subjects.count(),
         'total_quizzes': total_quizzes
     }
     
     return render_template('user/dashboard.html', 
                          stats=stats, 
                          recent_attempts=recent_attempts,
-                         subjects=available_subjects)
+                         subjects=available_subjects,
+                         recommendations=recommendations)
 
 @user_bp.route('/quiz-list')
 @login_required
@@ -68,8 +93,12 @@ def start_quiz(quiz_id):
     # Store quiz start time in session
     session['quiz_start_time'] = datetime.now().isoformat()
     session['current_quiz_id'] = quiz_id
+    live_monitor.record_start(quiz, session['user_id'])
+    event_log.record('quiz.started', session['user_id'], quiz_id=quiz.id, adaptive=False)
     
-    return render_template('user/quiz_attempt.html', quiz=quiz, questions=questions)
+    # Images are referenced by content hash, so ones shared across quizzes are fetched once
+    media = paper_media([question.id for question in questions])
+    return render_template('user/quiz_attempt.html', quiz=quiz, questions=questions, media=media)
 
 @user_bp.route('/quiz/<int:quiz_id>/submit', methods=['POST'])
 @login_required
@@ -82,11 +111,15 @@ def submit_quiz(quiz_id):
     # Calculate score
     correct_answers = 0
     total_questions = len(questions)
+    answers = []
     
     for question in questions:
         user_answer = request.form.get(f'question_{question.id}')
-        if user_answer and int(user_answer) == question.correct_option:
+        chosen = int(user_answer) if user_answer else None
+        is_correct = chosen == question.correct_option
+        if is_correct:
             correct_answers += 1
+        answers.append(AttemptAnswer(question_id=question.id, chosen_option=chosen, is_correct=is_correct))
     
     # Calculate time taken
     start_time = datetime.fromisoformat(session.get('quiz_start_time', datetime.now().isoformat()))
@@ -99,10 +132,14 @@ def submit_quiz(quiz_id):
         user_id=user_id,
         total_scored=correct_answers,
         total_questions=total_questions,
-        time_taken=time_taken
+        time_taken=time_taken,
+        answers=answers
     )
     db.session.add(score)
     db.session.commit()
+    live_monitor.record_submit(quiz, user_id, score.percentage)
+    event_log.record('quiz.submitted', user_id, quiz_id=quiz.id, score_id=score.id, adaptive=False,
+                     total_scored=correct_answers, total_questions=total_questions, percentage=score.percentage)
     
     # Clear session data
     session.pop('quiz_start_time', None)
@@ -111,6 +148,100 @@ def submit_quiz(quiz_id):
     flash(f'Quiz submitted! You scored {correct_answers}/{total_questions}', 'success')
     return redirect(url_for('user.quiz_result', score_id=score.id))
 
+@user_bp.route('/quiz/<int:quiz_id>/adaptive/start')
+@login_required
+def start_adaptive_quiz(quiz_id):
+    """Start an adaptive attempt using the calibrated questions of a quiz"""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    bank = item_bank_for_quiz(quiz_id)
+    
+    if bank is None:
+        flash('Adaptive mode is not available for this quiz yet.', 'info')
+        return redirect(url_for('user.quizzes_by_chapter', chapter_id=quiz.chapter_id))
+    
+    # Adaptive state lives in the session: administered items and correctness
+    session['adaptive'] = {
+        'quiz_id': quiz_id,
+        'items': [],
+        'choices': [],
+        'correct': [],
+        'current': bank.next_item(0.0),
+        'start_time': datetime.now().isoformat()
+    }
+    live_monitor.record_start(quiz, session['user_id'])
+    event_log.record('quiz.started', session['user_id'], quiz_id=quiz.id, adaptive=True)
+    return redirect(url_for('user.adaptive_quiz', quiz_id=quiz.id))
+
+@user_bp.route('/quiz/<int:quiz_id>/adaptive', methods=['GET', 'POST'])
+@login_required
+def adaptive_quiz(quiz_id):
+    """Serve one adaptive question at a time and update the ability estimate"""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    state = session.get('adaptive')
+    bank = item_bank_for_quiz(quiz_id)
+    
+    if not state or state['quiz_id'] != quiz_id or bank is None:
+        return redirect(url_for('user.start_adaptive_quiz', quiz_id=quiz_id))
+    
+    if request.method == 'POST':
+        question = Question.query.get_or_404(state['current'])
+        user_answer = request.form.get('answer')
+        chosen = int(user_answer) if user_answer else None
+        state['items'].append(question.id)
+        state['choices'].append(chosen)
+        state['correct'].append(chosen == question.correct_option)
+        
+        theta, se = bank.estimate(state['items'], state['correct'])
+        max_items = min(current_app.config['ADAPTIVE_MAX_ITEMS'], len(bank))
+        answered = len(state['items'])
+        done = answered >= max_items or (
+            answered >= current_app.config['ADAPTIVE_MIN_ITEMS']
+            and se <= current_app.config['ADAPTIVE_TARGET_SE']
+        )
+        state['current'] = None if done else bank.next_item(theta, state['items'])
+        session['adaptive'] = state
+        
+        if state['current'] is None:
+            return _finish_adaptive_quiz(quiz, state, theta)
+        return redirect(url_for('user.adaptive_quiz', quiz_id=quiz_id))
+    
+    question = Question.query.get_or_404(state['current'])
+    return render_template('user/adaptive_attempt.html',
+                         quiz=quiz,
+                         question=question,
+                         media=paper_media([question.id]),
+                         number=len(state['items']) + 1)
+
+def _finish_adaptive_quiz(quiz, state, theta):
+    """Store the adaptive attempt as a regular score with its ability estimate"""
+    start_time = datetime.fromisoformat(state['start_time'])
+    time_taken = str(datetime.now() - start_time).split('.')[0]
+    correct_answers = sum(state['correct'])
+    total_questions = len(state['items'])
+    
+    score = Score(
+        quiz_id=quiz.id,
+        user_id=session['user_id'],
+        total_scored=correct_answers,
+        total_questions=total_questions,
+        time_taken=time_taken,
+        ability=round(theta, 3),
+        answers=[
+            AttemptAnswer(question_id=qid, chosen_option=chosen, is_correct=right)
+            for qid, chosen, right in zip(state['items'], state['choices'], state['correct'])
+        ]
+    )
+    db.session.add(score)
+    db.session.commit()
+    live_monitor.record_submit(quiz, score.user_id, score.percentage)
+    event_log.record('quiz.submitted', score.user_id, quiz_id=quiz.id, score_id=score.id, adaptive=True,
+                     total_scored=correct_answers, total_questions=total_questions,
+                     percentage=score.percentage, ability=score.ability)
+    session.pop('adaptive', None)
+    
+    flash(f'Adaptive quiz finished! You scored {correct_answers}/{total_questions}', 'success')
+    return redirect(url_for('user.quiz_result', score_id=score.id))
+
 @user_bp.route('/quiz/result/<int:score_id>')
 @login_required
 def quiz_result(score_id):
@@ -129,9 +260,10 @@ def quiz_result(score_id):
 def results():
     """Display all user's quiz results"""
     user_id = session['user_id']
-    scores = Score.query.filter_by(user_id=user_id).order_by(Score.time_stamp_of_attempt.desc()).all()
+    scores = user_scores(user_id)
+    titles = dict(db.session.query(Quiz.id, Quiz.title).filter(Quiz.id.in_({s.quiz_id for s in scores})))
     
-    return render_template('user/results.html', scores=scores)
+    return render_template('user/results.html', scores=scores, titles=titles)
 
 @user_bp.route('/profile')
 @login_required
@@ -145,8 +277,9 @@ def profile():
 def quizzes_by_chapter(chapter_id):
     """Display quizzes under a specific chapter"""
     chapter = Chapter.query.get_or_404(chapter_id)
-    quizzes = Quiz.query.filter_by(chapter_id=chapter_id).all()
-    return render_template('user/quizzes_by_chapter.html', chapter=chapter, quizzes=quizzes)
+    quizzes = Quiz.query.filter_by(chapter_id=chapter_id)
+    return render_template('user/quizzes_by_chapter.html', chapter=chapter, quizzes=quizzes,
+                           calibrated=calibrated_quizzes(chapter_id))
 
 
 @user_bp.route('/subject/<int:subject_id>/chapters')
@@ -154,6 +287,6 @@ def quizzes_by_chapter(chapter_id):
 def subject_chapters(subject_id):
     """Display chapters and quizzes for a subject"""
     subject = Subject.query.get_or_404(subject_id)
-    chapters = Chapter.query.filter_by(subject_id=subject_id).all()
+    chapters = Chapter.query.filter_by(subject_id=subject_id)
     
     return render_template('user/subject_chapters.html', subject=subject, chapters=chapters)
\ No newline at end of file
@@ -39,6 +39,7 @@ def create_sample_data():
         # Import after ensuring app is properly set up
         from app import app, db
         from database.models import User, Subject, Chapter, Quiz, Question
+        from utils.security import hash_password
         
         with app.app_context():
             # Create tables
@@ -49,7 +50,7 @@ def create_sample_data():
             if not admin:
                 admin = User(
                     username='admin@quizmaster.com',
-                    password='admin123',
+                    password=hash_password('admin123'),
                     full_name='Quiz Master Admin',
                     qualification='Administrator',
                     dob=date(1990, 1, 1),
@@ -77,6 +78,7 @@ def create_sample_data():
             
             for user_data in sample_users:
                 if not User.query.filter_by(username=user_data['username']).first():
+                    user_data['password'] = hash_password(user_data['password'])
                     user = User(**user_data, is_admin=False)
                     db.session.add(user)
             
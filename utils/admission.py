@@ -0,0 +1,170 @@
+"""Admission control driven by database write latency.
+
+Every INSERT/UPDATE/DELETE statement, and every commit of a session that
+wrote, is timed (lock waits included) into an exponentially weighted
+moving average that decays while no writes happen. While the average, or
+the time the oldest unfinished write has been waiting, is above
+``ADMISSION_LATENCY_MS`` the database writer is saturated. Non-critical requests then queue for one of
+``ADMISSION_CONCURRENCY`` slots and are shed with 503 if none frees up
+within ``ADMISSION_QUEUE_TIMEOUT`` seconds. Endpoints in
+``ADMISSION_CRITICAL`` (logging in, submitting answers) are always
+admitted.
+
+The average and the slots are per worker process; each process sees the
+same database, so they agree closely enough.
+"""
+import math
+import threading
+import time
+from collections import Counter
+
+from flask import request, g, Response
+from sqlalchemy import event
+
+from database.models import db
+
+
+class AdmissionController:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._average = 0.0  # Seconds
+        self._updated = None
+        self._in_flight = {}  # Connection or session id -> start of its unfinished write
+        self._counts = Counter()
+        self._slots = None
+        self._tau = 2.0
+        self._threshold = 0.1
+        self._timeout = 0.5
+        self._critical = frozenset()
+
+    def init_app(self, app):
+        self._tau = app.config['ADMISSION_EWMA_SECONDS']
+        self._threshold = app.config['ADMISSION_LATENCY_MS'] / 1000
+        self._timeout = app.config['ADMISSION_QUEUE_TIMEOUT']
+        self._critical = frozenset(app.config['ADMISSION_CRITICAL'])
+        self._slots = threading.BoundedSemaphore(app.config['ADMISSION_CONCURRENCY'])
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_execute)
+            event.listen(db.engine, 'handle_error', self._handle_error)
+        # The session is shared by all apps; listen once
+        if not event.contains(db.session, 'after_commit', self._after_commit):
+            event.listen(db.session, 'after_flush', self._mark_written)
+            event.listen(db.session, 'do_orm_execute', self._orm_execute)
+            event.listen(db.session, 'before_commit', self._before_commit)
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+        if app.config['ADMISSION_ENABLED']:
+            app.before_request(self._admit)
+            app.teardown_request(self._release)
+
+    def _begin(self, key):
+        with self._lock:
+            self._in_flight[key] = time.perf_counter()
+
+    def _end(self, key):
+        with self._lock:
+            started = self._in_flight.pop(key, None)
+        if started is not None:
+            self.observe(time.perf_counter() - started)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+            self._begin(id(conn))
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._end(id(conn))
+
+    def _handle_error(self, context):
+        # A failed write (e.g. "database is locked") still took that long
+        if context.connection is not None:
+            self._end(id(context.connection))
+
+    def _mark_written(self, session, *args):
+        session.info['admission_written'] = True
+
+    def _orm_execute(self, state):
+        if state.is_insert or state.is_update or state.is_delete:
+            self._mark_written(state.session)
+
+    def _before_commit(self, session):
+        self._begin(id(session))
+
+    def _after_commit(self, session):
+        # The flush inside commit marks the session, so check afterwards
+        if session.info.pop('admission_written', False):
+            self._end(id(session))
+        else:
+            with self._lock:
+                self._in_flight.pop(id(session), None)
+
+    def _after_rollback(self, session):
+        session.info.pop('admission_written', None)
+        with self._lock:
+            self._in_flight.pop(id(session), None)
+
+    def observe(self, seconds):
+        """Fold one write's duration into the moving average"""
+        now = time.monotonic()
+        with self._lock:
+            if self._updated is None:
+                self._average = seconds
+            else:
+                # Weight by elapsed time, so the average spans seconds rather than a number of writes
+                weight = max(1 - math.exp(-(now - self._updated) / self._tau), 0.05)
+                self._average += weight * (seconds - self._average)
+            self._updated = now
+
+    def write_latency(self):
+        """Current average write latency in seconds, decayed for the time since the last write"""
+        with self._lock:
+            if self._updated is None:
+                return 0.0
+            return self._average * math.exp(-(time.monotonic() - self._updated) / self._tau)
+
+    def waiting(self):
+        """Seconds the oldest unfinished write has been running"""
+        with self._lock:
+            oldest = min(self._in_flight.values(), default=None)
+        return 0.0 if oldest is None else time.perf_counter() - oldest
+
+    def overloaded(self):
+        return max(self.write_latency(), self.waiting()) > self._threshold
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def _admit(self):
+        if request.endpoint in self._critical or not self.overloaded():
+            self._count('admitted')
+            return None
+        if self._slots.acquire(timeout=self._timeout):
+            g.admission_slot = True
+            self._count('queued')
+            return None
+        self._count('shed')
+        return Response('The server is busy. Please try again in a moment.\n', 503,
+                        {'Retry-After': '1'}, mimetype='text/plain')
+
+    def _release(self, exc=None):
+        if g.pop('admission_slot', False):
+            self._slots.release()
+
+    def stats(self):
+        """Write latency and admission decisions of this process"""
+        latency, waiting = self.write_latency(), self.waiting()
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            'write_latency_ms': round(latency * 1000, 2),
+            'oldest_write_ms': round(waiting * 1000, 2),
+            'threshold_ms': round(self._threshold * 1000, 2),
+            'overloaded': max(latency, waiting) > self._threshold,
+            'admitted': counts.get('admitted', 0),
+            'queued': counts.get('queued', 0),
+            'shed': counts.get('shed', 0),
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,16 @@
+"""Small key/value store for application-wide markers (high-water marks, versions)."""
+from database.models import db, AppState
+
+
+def get_state(key, default=None):
+    state = AppState.query.get(key)
+    return state.value if state else default
+
+
+def set_state(key, value):
+    """Stage a new value; committed with the caller's transaction"""
+    state = AppState.query.get(key)
+    if state is None:
+        db.session.add(AppState(key=key, value=str(value)))
+    else:
+        state.value = str(value)
@@ -0,0 +1,146 @@
+"""Server-side cloning and moving of quizzes, chapters and subjects.
+
+Copies are made with set-based ``INSERT ... SELECT`` statements inside the
+current transaction; no ORM objects are loaded. New primary keys are
+assigned as ``max(id) + row_number()`` over the source rows ordered by id,
+so child rows (down to question attachments) can be re-parented by
+joining against the same mapping. Attachments only reference blobs, so
+images are shared by the copies, not duplicated. Copied questions record
+the original they descend from in ``source_question_id``, so the
+near-duplicate report can tell intentional copies from real duplicates.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, insert, update, func, literal
+
+from database.models import db, Subject, Chapter, Quiz, Question, Attachment
+
+subjects = Subject.__table__
+chapters = Chapter.__table__
+quizzes = Quiz.__table__
+questions = Question.__table__
+attachments = Attachment.__table__
+
+
+def _next_base(conn, table):
+    return conn.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+
+
+def _id_map(table, condition, base):
+    """Subquery mapping old ids matching ``condition`` to freshly allocated ids"""
+    return select(
+        table.c.id.label('old_id'),
+        (literal(base) + func.row_number().over(order_by=table.c.id)).label('new_id')
+    ).where(condition).subquery()
+
+
+def _copy_questions(conn, quiz_map, now):
+    question_map = _id_map(questions, questions.c.quiz_id.in_(select(quiz_map.c.old_id)),
+                           _next_base(conn, questions))
+    conn.execute(insert(questions).from_select(
+        ['id', 'quiz_id', 'question_statement', 'option1', 'option2', 'option3', 'option4',
+         'correct_option', 'source_question_id', 'created_at'],
+        select(question_map.c.new_id, quiz_map.c.new_id, questions.c.question_statement, questions.c.option1,
+               questions.c.option2, questions.c.option3, questions.c.option4, questions.c.correct_option,
+               func.coalesce(questions.c.source_question_id, questions.c.id), literal(now))
+        .join(question_map, question_map.c.old_id == questions.c.id)
+        .join(quiz_map, quiz_map.c.old_id == questions.c.quiz_id)
+    ))
+    conn.execute(insert(attachments).from_select(
+        ['question_id', 'option', 'blob_sha'],
+        select(question_map.c.new_id, attachments.c.option, attachments.c.blob_sha)
+        .join(question_map, question_map.c.old_id == attachments.c.question_id)
+        .order_by(attachments.c.id)
+    ))
+
+
+def _copy_quizzes(conn, condition, chapter_id, now, chapter_map=None, title=None):
+    """Copy quizzes matching ``condition`` (and their questions)
+
+    New quizzes go to ``chapter_id``, or to the mapped chapter when a
+    ``chapter_map`` from a chapter copy is given.
+    """
+    quiz_map = _id_map(quizzes, condition, _next_base(conn, quizzes))
+    source = select(
+        quiz_map.c.new_id,
+        chapter_map.c.new_id if chapter_map is not None else literal(chapter_id),
+        literal(title) if title else quizzes.c.title,
+        quizzes.c.date_of_quiz, quizzes.c.time_duration, quizzes.c.remarks,
+        quizzes.c.live_from, quizzes.c.live_to, literal(now)
+    ).join(quiz_map, quiz_map.c.old_id == quizzes.c.id)
+    if chapter_map is not None:
+        source = source.join(chapter_map, chapter_map.c.old_id == quizzes.c.chapter_id)
+    conn.execute(insert(quizzes).from_select(
+        ['id', 'chapter_id', 'title', 'date_of_quiz', 'time_duration', 'remarks',
+         'live_from', 'live_to', 'created_at'],
+        source
+    ))
+    _copy_questions(conn, quiz_map, now)
+    return quiz_map
+
+
+def _copy_chapters(conn, condition, subject_id, now, name=None):
+    """Copy chapters matching ``condition`` with all their quizzes into a subject"""
+    chapter_map = _id_map(chapters, condition, _next_base(conn, chapters))
+    conn.execute(insert(chapters).from_select(
+        ['id', 'name', 'description', 'subject_id', 'created_at'],
+        select(chapter_map.c.new_id, literal(name) if name else chapters.c.name,
+               chapters.c.description, literal(subject_id), literal(now))
+        .join(chapter_map, chapter_map.c.old_id == chapters.c.id)
+    ))
+    source_chapters = select(chapters.c.id).where(condition)
+    _copy_quizzes(conn, quizzes.c.chapter_id.in_(source_chapters), None, now, chapter_map=chapter_map)
+    return chapter_map
+
+
+def _new_id(conn, old_id, id_map):
+    return conn.execute(select(id_map.c.new_id).where(id_map.c.old_id == old_id)).scalar()
+
+
+def clone_quiz(quiz_id, chapter_id, title=None):
+    """Copy a quiz and its questions into ``chapter_id``; returns the new quiz id"""
+    conn = db.session.connection()
+    now = datetime.utcnow()
+    condition = quizzes.c.id == quiz_id
+    quiz_map = _copy_quizzes(conn, condition, chapter_id, now, title=title)
+    new_id = _new_id(conn, quiz_id, quiz_map)
+    db.session.commit()
+    return new_id
+
+
+def clone_chapter(chapter_id, subject_id, name=None):
+    """Copy a chapter with all quizzes and questions; returns the new chapter id"""
+    conn = db.session.connection()
+    now = datetime.utcnow()
+    chapter_map = _copy_chapters(conn, chapters.c.id == chapter_id, subject_id, now, name=name)
+    new_id = _new_id(conn, chapter_id, chapter_map)
+    db.session.commit()
+    return new_id
+
+
+def clone_subject(subject_id, name=None):
+    """Copy a whole subject tree; returns the new subject id"""
+    conn = db.session.connection()
+    now = datetime.utcnow()
+    new_id = _next_base(conn, subjects) + 1
+    conn.execute(insert(subjects).from_select(
+        ['id', 'name', 'description', 'created_at'],
+        select(literal(new_id), literal(name) if name else subjects.c.name,
+               subjects.c.description, literal(now))
+        .where(subjects.c.id == subject_id)
+    ))
+    _copy_chapters(conn, chapters.c.subject_id == subject_id, new_id, now)
+    db.session.commit()
+    return new_id
+
+
+def move_quiz(quiz_id, chapter_id):
+    """Re-parent a quiz (questions and scores follow by foreign key)"""
+    db.session.execute(update(quizzes).where(quizzes.c.id == quiz_id).values(chapter_id=chapter_id))
+    db.session.commit()
+
+
+def move_chapter(chapter_id, subject_id):
+    """Re-parent a chapter with everything under it"""
+    db.session.execute(update(chapters).where(chapters.c.id == chapter_id).values(subject_id=subject_id))
+    db.session.commit()
@@ -0,0 +1,126 @@
+"""Answer-similarity collusion detection for live quiz windows.
+
+Each attempt is reduced to the set of (question, wrong option) pairs it
+chose. Identical wrong answers are far rarer than identical right ones, so
+two attempts sharing many of them are suspicious. MinHash signatures plus
+LSH banding surface candidate pairs without comparing every attempt to
+every other; candidates are then checked with the exact Jaccard similarity.
+
+Buckets shared by more than ``MAX_BUCKET`` attempts (a common mistake, or
+a leaked answer key) are too large to compare pairwise. Within them only
+identical wrong-answer sets are paired, each with the earliest attempt of
+its group, so a key shared by a whole class is still reported.
+"""
+import logging
+from datetime import datetime, timezone
+from itertools import chain
+
+import numpy as np
+
+from database.models import db, AttemptAnswer, CollusionFlag, Quiz, Score
+from utils.minhash import signatures as minhash_signatures, band_keys
+
+MIN_WRONG = 3  # Attempts with fewer wrong answers carry no signal
+MAX_BUCKET = 50  # Larger buckets are only searched for identical answer sets
+SIMILARITY_THRESHOLD = 0.6
+
+logger = logging.getLogger(__name__)
+
+
+def _candidate_pairs(signatures):
+    """Attempt index pairs that share at least one LSH band bucket"""
+    n = signatures.shape[1]
+    pairs = []
+    oversized = set()
+    for keys in band_keys(signatures):
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for bucket in np.split(order, boundaries):
+            if 1 < len(bucket) <= MAX_BUCKET:
+                i, j = np.triu_indices(len(bucket), k=1)
+                left, right = bucket[i], bucket[j]
+                pairs.append(np.minimum(left, right) * n + np.maximum(left, right))
+            elif len(bucket) > MAX_BUCKET:
+                oversized.update(bucket.tolist())
+                # Identical signatures: pair every attempt with the group's earliest one
+                bucket = np.sort(bucket)
+                _, group, counts = np.unique(signatures[:, bucket].T, axis=0, return_inverse=True, return_counts=True)
+                group = group.ravel()
+                for g in np.flatnonzero(counts > 1):
+                    members = bucket[group == g]
+                    pairs.append(members[0] * n + members[1:])
+    if oversized:
+        logger.info('%d attempts fell in buckets of more than %d; only identical answer sets were compared',
+                    len(oversized), MAX_BUCKET)
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    encoded = np.unique(np.concatenate(pairs))
+    return np.column_stack([encoded // n, encoded % n])
+
+
+def _to_utc(local):
+    """Naive server-local time (as quiz windows are entered) to naive UTC, like attempt timestamps"""
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def detect_collusion(quiz_id):
+    """Recompute the collusion flags of a quiz and return how many were stored"""
+    quiz = Quiz.query.get(quiz_id)
+    if quiz is None:
+        return 0
+
+    query = db.session.query(
+        AttemptAnswer.score_id, AttemptAnswer.question_id, AttemptAnswer.chosen_option
+    ).join(Score).filter(
+        Score.quiz_id == quiz_id,
+        AttemptAnswer.is_correct.is_(False),
+        AttemptAnswer.chosen_option.isnot(None)
+    )
+    if quiz.live_from and quiz.live_to:
+        query = query.filter(Score.time_stamp_of_attempt.between(_to_utc(quiz.live_from), _to_utc(quiz.live_to)))
+    data = np.fromiter(chain.from_iterable(query), dtype=np.int64).reshape(-1, 3)
+
+    CollusionFlag.query.filter_by(quiz_id=quiz_id).delete()
+    if not len(data):
+        db.session.commit()
+        return 0
+
+    # Group tokens by attempt, keeping only attempts with enough wrong answers
+    data = data[np.argsort(data[:, 0], kind='stable')]
+    score_ids, starts, counts = np.unique(data[:, 0], return_index=True, return_counts=True)
+    keep = np.repeat(counts >= MIN_WRONG, counts)
+    data = data[keep]
+    if not len(data):
+        db.session.commit()
+        return 0
+    score_ids, starts = np.unique(data[:, 0], return_index=True)
+    tokens = data[:, 1] * 8 + data[:, 2]
+
+    signatures = minhash_signatures(tokens, starts)
+    candidates = _candidate_pairs(signatures)
+
+    # Exact check on the (few) candidates
+    bounds = np.append(starts, len(tokens))
+    token_sets = {}
+    now = datetime.utcnow()
+    flags = []
+    for i, j in candidates.tolist():
+        for idx in (i, j):
+            if idx not in token_sets:
+                token_sets[idx] = set(tokens[bounds[idx]:bounds[idx + 1]].tolist())
+        shared = len(token_sets[i] & token_sets[j])
+        similarity = shared / len(token_sets[i] | token_sets[j])
+        if similarity >= SIMILARITY_THRESHOLD:
+            flags.append({
+                'quiz_id': quiz_id,
+                'score_a_id': int(score_ids[i]),
+                'score_b_id': int(score_ids[j]),
+                'similarity': round(similarity, 4),
+                'shared_wrong': shared,
+                'detected_at': now,
+            })
+    if flags:
+        db.session.execute(CollusionFlag.__table__.insert(), flags)
+    db.session.commit()
+    return len(flags)
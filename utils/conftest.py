@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+
+from app import create_app
+from database.models import db, User, Subject, Chapter, Quiz
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a fresh in-memory database, with its app context pushed"""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'PASSWORD_HASH_ITERATIONS': 1000,
+        'RATE_LIMIT_ENABLED': False,
+        'SCORE_ARCHIVE_DIR': str(tmp_path / 'score_archive'),
+        'JOB_UPLOAD_DIR': str(tmp_path / 'job_uploads'),
+        'MEDIA_ROOT': str(tmp_path / 'media'),
+    })
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def quizzes(app):
+    """Factory adding ``n`` quizzes to one chapter; returns their ids"""
+    def add(n):
+        subject = Subject(name='Subject')
+        db.session.add(subject)
+        db.session.flush()
+        chapter = Chapter(name='Chapter', subject_id=subject.id)
+        db.session.add(chapter)
+        db.session.flush()
+        added = [Quiz(chapter_id=chapter.id, title=f'Quiz {i}', time_duration='00:30', date_of_quiz=date(2024, 1, 1))
+                 for i in range(n)]
+        db.session.add_all(added)
+        db.session.commit()
+        return [quiz.id for quiz in added]
+    return add
+
+
+@pytest.fixture
+def students(app):
+    """Factory adding ``n`` students; returns their ids"""
+    def add(n):
+        added = [User(username=f'student{i}@example.com', password='x', full_name=f'Student {i}',
+                      qualification='BSc', dob=date(2000, 1, 1)) for i in range(n)]
+        db.session.add_all(added)
+        db.session.commit()
+        return [user.id for user in added]
+    return add
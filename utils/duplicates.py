@@ -0,0 +1,275 @@
+"""Near-duplicate detection for the question bank.
+
+A question is reduced to the character shingles of its normalized
+statement and options. Its MinHash signature and LSH band keys are kept in
+``question_signatures`` and ``question_buckets``, so looking up the
+near-duplicates of a question is one indexed read of its band keys plus an
+exact Jaccard check of a bounded number of candidates, whatever the size
+of the bank.
+
+``index_questions()`` signs every question that has no signature yet, so
+it picks up questions however they were added (created, cloned, imported).
+Copies made by ``utils.cloning`` share a lineage (the original's id, see
+``Question.source_question_id``) and are never reported as duplicates of
+each other.
+
+The bank-wide cluster report scans every bucket, so it is not computed per
+request: ``refresh_duplicate_report()`` (run by the ``duplicates.report``
+job) stores it in ``duplicate_members`` and the report page reads that.
+"""
+import re
+from collections import namedtuple, Counter
+from datetime import datetime
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import select, func, union_all
+
+from database.models import db, Chapter, Quiz, Question, QuestionSignature, QuestionBucket, DuplicateMember
+from utils.app_state import set_state
+from utils.minhash import NUM_HASHES, BANDS, signatures as minhash_signatures, band_keys
+
+SHINGLE = 5  # Bytes per shingle; packed into one integer token
+SIMILARITY_THRESHOLD = 0.7
+MAX_CANDIDATES = 50  # Per lookup, those sharing the most bands
+MAX_BUCKET = 100  # Larger buckets are boilerplate ("Which of the following..."), not copies
+INDEX_BATCH = 5000
+REPORT_KEY = 'duplicates_report_at'  # app_state: when the stored cluster report was built
+_SEPARATOR = ord('|')
+# Gives every band its own key space so a single key column can be searched
+_BAND_SALT = (np.arange(BANDS, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15))[:, None]
+
+Match = namedtuple('Match', 'question_id quiz_id quiz_title statement similarity')
+Cluster = namedtuple('Cluster', 'similarity questions')
+
+signatures = QuestionSignature.__table__
+buckets = QuestionBucket.__table__
+lineage = func.coalesce(Question.source_question_id, Question.id)
+
+
+def _text(statement, options):
+    """Normalized statement and options, separated by ``|``"""
+    return '|'.join(
+        ' '.join(re.findall(r'\w+', (part or '').lower())).ljust(SHINGLE) for part in (statement, *options)
+    ).encode()
+
+
+def _shingle(texts):
+    """Shingle tokens of many question texts at once, as ``(tokens, starts)``
+
+    Shingles spanning a separator are dropped, so reordering options does
+    not change the set.
+    """
+    data = np.frombuffer(b'|'.join(texts) + b'|', dtype=np.uint8).astype(np.int64)
+    windows = len(data) - SHINGLE + 1
+    tokens = np.zeros(windows, dtype=np.int64)
+    valid = np.ones(windows, dtype=bool)
+    for offset in range(SHINGLE):
+        tokens = tokens << 8 | data[offset:offset + windows]
+        valid &= data[offset:offset + windows] != _SEPARATOR
+    ends = np.cumsum([len(text) + 1 for text in texts])
+    owners = np.searchsorted(ends, np.arange(windows), side='right')[valid]
+    return tokens[valid], np.searchsorted(owners, np.arange(len(texts)))
+
+
+def _shingle_sets(texts):
+    tokens, starts = _shingle(texts)
+    bounds = np.append(starts, len(tokens))
+    return [set(tokens[bounds[i]:bounds[i + 1]].tolist()) for i in range(len(texts))]
+
+
+def _sign(texts):
+    """MinHash signatures (NUM_HASHES x texts) and signed bucket keys (BANDS x texts)"""
+    result = minhash_signatures(*_shingle(texts))
+    # SQLite integers are signed
+    return result, (band_keys(result) ^ _BAND_SALT).view(np.int64)
+
+
+def index_questions(question_ids=None, rebuild=False, progress=None):
+    """Sign questions that are not indexed yet (all, or only ``question_ids``); returns count
+
+    ``rebuild`` drops the whole index first, e.g. after changing the shingling.
+    ``progress(done, total)`` is called after every batch.
+    """
+    if rebuild:
+        db.session.execute(buckets.delete())
+        db.session.execute(signatures.delete())
+        db.session.commit()
+
+    indexed, total = 0, None
+    while True:
+        query = db.session.query(
+            Question.id, Question.question_statement,
+            Question.option1, Question.option2, Question.option3, Question.option4
+        ).outerjoin(QuestionSignature, QuestionSignature.question_id == Question.id).filter(
+            QuestionSignature.question_id.is_(None)
+        )
+        if question_ids is not None:
+            query = query.filter(Question.id.in_(list(question_ids)))
+        if progress is not None and total is None:
+            total = query.count()
+        rows = query.order_by(Question.id).limit(INDEX_BATCH).all()
+        if not rows:
+            break
+
+        values, keys = _sign([_text(row[1], row[2:]) for row in rows])
+        values = values.astype('<u4')
+        db.session.execute(signatures.insert(), [
+            {'question_id': row[0], 'signature': values[:, i].tobytes()} for i, row in enumerate(rows)
+        ])
+        # Inserting in key order keeps the bucket index writes sequential
+        owners = np.tile(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)), BANDS)
+        keys = keys.ravel()
+        order = np.argsort(keys, kind='stable')
+        db.session.execute(buckets.insert(), [
+            {'key': key, 'question_id': question_id}
+            for key, question_id in zip(keys[order].tolist(), owners[order].tolist())
+        ])
+        db.session.commit()
+        indexed += len(rows)
+        if progress is not None:
+            progress(indexed, total)
+    return indexed
+
+
+def find_similar(statement, options=(), exclude_quiz_id=None, limit=5, question_id=None):
+    """Indexed questions at least ``SIMILARITY_THRESHOLD`` similar, most similar first
+
+    Clones of one original are reported once, as their best match. When
+    looking up an existing ``question_id``, its own copies are left out.
+    """
+    text = _text(statement, options)
+    _, keys = _sign([text])
+    # At most MAX_BUCKET + 1 members per band: fuller buckets are boilerplate and skipped,
+    # so a lookup reads a bounded number of rows however common its wording is
+    bands = [select(buckets.c.key, buckets.c.question_id).where(buckets.c.key == key).limit(MAX_BUCKET + 1).subquery()
+             for key in keys[:, 0].tolist()]
+    members = db.session.execute(union_all(*(select(band) for band in bands))).all()
+    sizes = Counter(key for key, _ in members)
+    hits = Counter(question_id for key, question_id in members if sizes[key] <= MAX_BUCKET)
+    candidates = [question_id for question_id, _ in hits.most_common(MAX_CANDIDATES)]
+    if not candidates:
+        return []
+
+    query = db.session.query(
+        Question.id, Question.question_statement, Question.option1, Question.option2,
+        Question.option3, Question.option4, Quiz.id, Quiz.title, lineage
+    ).join(Quiz, Quiz.id == Question.quiz_id).filter(Question.id.in_(candidates))
+    if exclude_quiz_id is not None:
+        query = query.filter(Quiz.id != exclude_quiz_id)
+    if question_id is not None:
+        own = db.session.query(lineage).filter(Question.id == question_id).scalar_subquery()
+        query = query.filter(lineage != own)
+    rows = query.all()
+    if not rows:
+        return []
+
+    # Exact Jaccard similarity; the query text is shingled with the candidates
+    token_sets = _shingle_sets([text] + [_text(row[1], row[2:6]) for row in rows])
+    best = {}
+    for row, tokens in zip(rows, token_sets[1:]):
+        similarity = len(token_sets[0] & tokens) / len(token_sets[0] | tokens)
+        # Per lineage, the most similar copy (the original on ties)
+        if similarity >= SIMILARITY_THRESHOLD and (row[8] not in best or (similarity, -row[0]) > best[row[8]][0]):
+            best[row[8]] = ((similarity, -row[0]), Match(row[0], row[6], row[7], row[1], round(similarity, 4)))
+    matches = sorted((match for _, match in best.values()), key=lambda match: match.similarity, reverse=True)
+    return matches[:limit]
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _clusters(threshold):
+    """Groups of near-duplicate questions across the whole bank as ``(similarity, question ids)``
+
+    Candidate pairs come from shared LSH buckets; their similarity is
+    estimated from the stored signatures and pairs above ``threshold`` are
+    joined into clusters.
+    """
+    shared = select(buckets.c.key).group_by(buckets.c.key).having(func.count().between(2, MAX_BUCKET)).subquery()
+    rows = db.session.execute(
+        select(buckets.c.key, buckets.c.question_id).join(shared, shared.c.key == buckets.c.key).order_by(buckets.c.key)
+    )
+    data = np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+    if not len(data):
+        return []
+
+    # Every pair within a bucket, encoded as a single integer and deduplicated
+    ids = np.unique(data[:, 1])
+    n = len(ids)
+    members = np.searchsorted(ids, data[:, 1])
+    pairs = []
+    for bucket in np.split(members, np.flatnonzero(np.diff(data[:, 0])) + 1):
+        i, j = np.triu_indices(len(bucket), k=1)
+        left, right = bucket[i], bucket[j]
+        pairs.append(np.minimum(left, right) * n + np.maximum(left, right))
+    encoded = np.unique(np.concatenate(pairs))
+    left, right = encoded // n, encoded % n
+
+    # Clones of the same original are intentional copies, not duplicates
+    roots = ids.copy()
+    for offset in range(0, n, INDEX_BATCH):
+        for question_id, root in db.session.query(Question.id, lineage).filter(
+            Question.id.in_(ids[offset:offset + INDEX_BATCH].tolist())
+        ):
+            roots[np.searchsorted(ids, question_id)] = root
+    keep = roots[left] != roots[right]
+    left, right = left[keep], right[keep]
+
+    stored = np.zeros((n, NUM_HASHES), dtype=np.uint32)
+    for offset in range(0, n, INDEX_BATCH):
+        for question_id, signature in db.session.query(QuestionSignature.question_id, QuestionSignature.signature).filter(
+            QuestionSignature.question_id.in_(ids[offset:offset + INDEX_BATCH].tolist())
+        ):
+            stored[np.searchsorted(ids, question_id)] = np.frombuffer(signature, dtype='<u4')
+    similarity = (stored[left] == stored[right]).mean(axis=1)
+    keep = similarity >= threshold
+    left, right, similarity = left[keep].tolist(), right[keep].tolist(), similarity[keep].tolist()
+
+    parent = list(range(n))
+    for i, j in zip(left, right):
+        parent[_find(parent, j)] = _find(parent, i)
+    groups, best = {}, {}
+    for i in set(left) | set(right):
+        groups.setdefault(_find(parent, i), []).append(int(ids[i]))
+    for i, value in zip(left, similarity):
+        root = _find(parent, i)
+        best[root] = max(best.get(root, 0.0), value)
+
+    return [(best[root], sorted(group)) for root, group in groups.items()]
+
+
+def refresh_duplicate_report(threshold=SIMILARITY_THRESHOLD):
+    """Rebuild the stored cluster report; returns the number of clusters"""
+    clusters = _clusters(threshold)
+    db.session.query(DuplicateMember).delete()
+    if clusters:
+        db.session.execute(DuplicateMember.__table__.insert(), [
+            {'question_id': question_id, 'cluster': cluster, 'similarity': round(similarity, 4)}
+            for cluster, (similarity, group) in enumerate(clusters, start=1) for question_id in group
+        ])
+    set_state(REPORT_KEY, datetime.utcnow().isoformat(timespec='seconds'))
+    db.session.commit()
+    return len(clusters)
+
+
+def duplicate_clusters():
+    """The stored near-duplicate clusters with question details, largest first"""
+    rows = db.session.query(
+        DuplicateMember.cluster, DuplicateMember.similarity,
+        Question.id, Question.question_statement, Quiz.id.label('quiz_id'), Quiz.title.label('quiz_title'),
+        Chapter.id.label('chapter_id'), Chapter.name.label('chapter_name')
+    ).join(Question, Question.id == DuplicateMember.question_id).join(Quiz, Quiz.id == Question.quiz_id).join(
+        Chapter, Chapter.id == Quiz.chapter_id
+    ).order_by(DuplicateMember.cluster, Question.id)
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.cluster, (row.similarity, []))[1].append(row)
+    # Questions deleted since the report was built simply drop out
+    clusters = [Cluster(similarity, questions) for similarity, questions in groups.values() if len(questions) > 1]
+    clusters.sort(key=lambda cluster: (len(cluster.questions), cluster.similarity), reverse=True)
+    return clusters
@@ -0,0 +1,93 @@
+"""Append-only event log.
+
+Routes call ``event_log.record(kind, actor_id, **payload)`` after their own
+commit succeeds. Events go into an in-process buffer that a background
+thread writes to the ``events`` table in one multi-row insert, either every
+``EVENT_FLUSH_INTERVAL`` seconds or as soon as ``EVENT_BATCH_SIZE`` events
+are waiting. Rows are never updated or deleted; projections in
+``utils.projections`` replay them.
+
+Buffered events are lost if the process dies before a flush, so the log is
+for analytics, not for anything that must be exact.
+"""
+import atexit
+import json
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from database.models import db, Event
+
+logger = logging.getLogger(__name__)
+
+
+class EventLog:
+    def __init__(self):
+        self.batch_size = 500
+        self.interval = 1.0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._engine = None
+        self._thread = None
+
+    def init_app(self, app):
+        self.batch_size = app.config['EVENT_BATCH_SIZE']
+        self.interval = app.config['EVENT_FLUSH_INTERVAL']
+        with app.app_context():
+            self._engine = db.engine
+        atexit.register(self.flush)
+
+    def record(self, kind, actor_id=None, **payload):
+        row = {
+            'kind': kind,
+            'occurred_at': datetime.utcnow(),
+            'actor_id': actor_id,
+            'payload': json.dumps(payload, default=str),
+        }
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write buffered events now; returns how many were written"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows or self._engine is None:
+            return 0
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(insert(Event.__table__), rows)
+        except Exception:
+            # Put them back in front so a transient failure (e.g. a locked database) loses nothing
+            with self._lock:
+                self._buffer[:0] = rows
+            raise
+        return len(rows)
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Event log flush failed; will retry')
+
+    def _ensure_thread(self):
+        # Started lazily so that each forked worker gets its own flusher
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='event-log', daemon=True)
+            self._thread.start()
+
+
+event_log = EventLog()
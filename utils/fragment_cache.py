@@ -0,0 +1,191 @@
+"""Catalog-versioned template fragment caching.
+
+Templates wrap catalog markup in ``{% cache 'name', key... %}...{% endcache %}``.
+Cache keys include the global catalog version stored in ``app_state``; the
+admin add/delete/clone/move routes bump it, so stale fragments simply stop
+being looked up. Fragments live in a per-process LRU bounded by bytes, with
+an optional on-disk directory shared between workers.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from flask import g
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import update, cast, Integer, String
+
+from database.models import db, AppState
+from utils.app_state import get_state
+
+CATALOG_VERSION_KEY = 'catalog_version'
+
+
+def catalog_version():
+    """Current catalog version, read at most once per request"""
+    if 'catalog_version' not in g:
+        g.catalog_version = get_state(CATALOG_VERSION_KEY, '0')
+    return g.catalog_version
+
+
+def bump_catalog_version():
+    """Invalidate all catalog fragments; committed with the caller's transaction"""
+    result = db.session.execute(
+        update(AppState).where(AppState.key == CATALOG_VERSION_KEY).values(
+            value=cast(cast(AppState.value, Integer) + 1, String)
+        )
+    )
+    if not result.rowcount:
+        db.session.add(AppState(key=CATALOG_VERSION_KEY, value='1'))
+    g.pop('catalog_version', None)
+
+
+class FragmentCache:
+    """LRU of rendered fragments bounded by total size, plus optional disk tier"""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_version = None
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, version, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{version}-{digest}.html')
+
+    def _prune_disk(self, version):
+        """Drop on-disk fragments from older catalog versions
+
+        Other workers share the directory, so their in-flight ``.tmp`` files
+        and fragments of a version this process has not seen yet are left alone.
+        """
+        if self._disk_version == version:
+            return
+        self._disk_version = version
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            stem, _, ext = name.partition('.')
+            file_version = stem.split('-', 1)[0]
+            if ext != 'html' or not file_version.isdigit() or int(file_version) >= int(version):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def get(self, version, key):
+        full_key = f'{version}:{key}'
+        with self._lock:
+            value = self._entries.get(full_key)
+            if value is not None:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return value
+        if self.directory:
+            self._prune_disk(version)
+            try:
+                with open(self._path(version, key), encoding='utf-8') as f:
+                    value = f.read()
+            except OSError:
+                value = None
+            if value is not None:
+                self._store(full_key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, version, key, value):
+        self._store(f'{version}:{key}', value)
+        if self.directory:
+            # The disk tier is best effort: a failed write must not fail the request
+            tmp = None
+            try:
+                fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(value)
+                os.replace(tmp, self._path(version, key))
+            except OSError:
+                if tmp is not None:
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+
+    def _store(self, full_key, value):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(full_key, None)
+            if old is not None:
+                self._size -= len(old.encode('utf-8'))
+            self._entries[full_key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.encode('utf-8'))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+            }
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache 'name', key... %}...{% endcache %}`` keyed on the catalog version"""
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        version = catalog_version()
+        key = ':'.join(str(part) for part in parts)
+        value = cache.get(version, key)
+        if value is None:
+            value = str(caller())
+            cache.set(version, key, value)
+        return Markup(value)
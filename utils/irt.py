@@ -0,0 +1,259 @@
+"""Item response theory helpers for adaptive quizzes.
+
+Calibration fits 2PL/3PL parameters for every question from the recorded
+attempt answers by marginal maximum likelihood (EM over a fixed ability
+grid). The online side keeps an ``ItemBank`` per quiz with the
+probability and information tables precomputed on a fixed ability grid, so
+picking the next item or updating the ability estimate is a handful of
+vector operations.
+"""
+from datetime import datetime
+from itertools import chain
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from database.models import db, AttemptAnswer, ItemCalibration, Question, Quiz
+from utils.fragment_cache import bump_catalog_version
+
+# Ability grid used for EAP estimation and the precomputed information tables
+THETA_GRID = np.linspace(-4.0, 4.0, 81)
+MIN_RESPONSES = 20  # Questions answered fewer times than this are not calibrated
+A_BOUNDS, B_BOUNDS, C_BOUNDS = (0.2, 4.0), (-4.0, 4.0), (0.001, 0.35)
+LOG_A_SD = 0.5  # Lognormal prior on discrimination
+B_SD = 3.0  # Weak normal prior on difficulty
+C_PRIOR = (5.0, 17.0)  # Beta prior on the 3PL guessing parameter (mean ~0.23, four options)
+MAX_HALVINGS = 10
+
+# Cache of item banks keyed by quiz id -> (calibration stamp, bank)
+_banks = {}
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _item_objective(r, n, a, b, c, guessing):
+    """Penalised marginal log likelihood per item from expected counts on THETA_GRID"""
+    p = c[:, None] + (1 - c[:, None]) * _sigmoid(a[:, None] * (THETA_GRID - b[:, None]))
+    p = np.clip(p, 1e-9, 1 - 1e-9)
+    value = (r * np.log(p) + (n - r) * np.log1p(-p)).sum(axis=1)
+    value -= np.log(a) ** 2 / (2 * LOG_A_SD ** 2) + np.log(a) + b ** 2 / (2 * B_SD ** 2)
+    if guessing:
+        alpha, beta = C_PRIOR
+        value += (alpha - 1) * np.log(c) + (beta - 1) * np.log1p(-c)
+    return value
+
+
+def _bounded(a, b, c, guessing):
+    return (np.clip(a, *A_BOUNDS), np.clip(b, *B_BOUNDS),
+            np.clip(c, *C_BOUNDS) if guessing else c)
+
+
+def _m_step(r, n, a, b, c, guessing, steps=5):
+    """Joint Fisher scoring of each item's parameters with step halving"""
+    size = 3 if guessing else 2
+    for _ in range(steps):
+        s = _sigmoid(a[:, None] * (THETA_GRID - b[:, None]))
+        p = np.clip(c[:, None] + (1 - c[:, None]) * s, 1e-9, 1 - 1e-9)
+        w = 1.0 / (p * (1 - p))
+        ds = (1 - c[:, None]) * s * (1 - s)
+        derivs = [ds * (THETA_GRID - b[:, None]), -ds * a[:, None]]
+        if guessing:
+            derivs.append(1 - s)
+        residual = (r - n * p) * w
+        grad = np.stack([(residual * d).sum(axis=1) for d in derivs], axis=1)
+        info = np.empty((len(a), size, size))
+        for i in range(size):
+            for j in range(i + 1):
+                info[:, i, j] = info[:, j, i] = (n * w * derivs[i] * derivs[j]).sum(axis=1)
+
+        # Priors keep items with few or extreme responses finite
+        grad[:, 0] -= (np.log(a) / LOG_A_SD ** 2 + 1) / a
+        info[:, 0, 0] += 1 / (LOG_A_SD * a) ** 2
+        grad[:, 1] -= b / B_SD ** 2
+        info[:, 1, 1] += 1 / B_SD ** 2
+        if guessing:
+            alpha, beta = C_PRIOR
+            grad[:, 2] += (alpha - 1) / c - (beta - 1) / (1 - c)
+            info[:, 2, 2] += (alpha - 1) / c ** 2 + (beta - 1) / (1 - c) ** 2
+        step = np.linalg.solve(info + np.eye(size) * 1e-9, grad[..., None])[..., 0]
+
+        # Halve the step of every item whose objective would get worse
+        current = _item_objective(r, n, a, b, c, guessing)
+        scale = np.ones(len(a))
+        for _ in range(MAX_HALVINGS):
+            na, nb, nc = _bounded(a + scale * step[:, 0], b + scale * step[:, 1],
+                                  c + scale * step[:, 2] if guessing else c, guessing)
+            worse = _item_objective(r, n, na, nb, nc, guessing) < current
+            if not worse.any():
+                break
+            scale[worse] /= 2
+        a, b = np.where(worse, a, na), np.where(worse, b, nb)
+        if guessing:
+            c = np.where(worse, c, nc)
+    return a, b, c
+
+
+def calibrate(person, item, correct, n_persons, n_items, model='2PL', iterations=40, tolerance=1e-4):
+    """Marginal maximum likelihood (EM) fit of item parameters
+
+    ``person``, ``item`` and ``correct`` are parallel arrays, one entry per
+    response. Abilities are integrated out over THETA_GRID with a standard
+    normal prior, which also fixes the scale. Returns ``(a, b, c)`` arrays
+    of length ``n_items``.
+    """
+    guessing = model == '3PL'
+    correct = correct.astype(bool)
+    counts = np.bincount(item, minlength=n_items).astype(np.float64)
+    p_values = np.bincount(item, weights=correct, minlength=n_items) / np.maximum(counts, 1)
+
+    a = np.ones(n_items)
+    c = np.full(n_items, C_PRIOR[0] / sum(C_PRIOR) if guessing else 0.0)
+    p_values = np.clip((p_values - c) / (1 - c), 0.02, 0.98)
+    b = np.clip(-np.log(p_values / (1 - p_values)), *B_BOUNDS)
+    log_prior = -0.5 * THETA_GRID ** 2
+    # Person x item response indicators (repeat answers simply add up)
+    shape = (n_persons, n_items)
+    right = csr_matrix((correct.astype(np.float64), (person, item)), shape=shape)
+    wrong = csr_matrix(((~correct).astype(np.float64), (person, item)), shape=shape)
+    right_t, answered_t = right.T.tocsr(), (right + wrong).T.tocsr()
+
+    for _ in range(iterations):
+        # E step: each person's posterior over the ability grid
+        p = np.clip(c[:, None] + (1 - c[:, None]) * _sigmoid(a[:, None] * (THETA_GRID - b[:, None])),
+                    1e-9, 1 - 1e-9)
+        log_post = log_prior + right @ np.log(p) + wrong @ np.log1p(-p)
+        post = np.exp(log_post - log_post.max(axis=1, keepdims=True))
+        post /= post.sum(axis=1, keepdims=True)
+
+        # Expected responses (n) and correct responses (r) per item and grid point
+        n = answered_t @ post
+        r = right_t @ post
+
+        # M step
+        new_a, new_b, new_c = _m_step(r, n, a, b, c, guessing)
+        change = max(np.abs(new_a - a).max(), np.abs(new_b - b).max(), np.abs(new_c - c).max())
+        a, b, c = new_a, new_b, new_c
+        if change < tolerance:
+            break
+
+    return a, b, c
+
+
+def calibrate_items(model='2PL', min_responses=MIN_RESPONSES):
+    """Offline job: refit ItemCalibration rows from all recorded answers"""
+    rows = db.session.query(
+        AttemptAnswer.score_id, AttemptAnswer.question_id, AttemptAnswer.is_correct
+    )
+    data = np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 3)
+    if not len(data):
+        return 0
+    person_ids, person = np.unique(data[:, 0], return_inverse=True)
+    question_ids, item = np.unique(data[:, 1], return_inverse=True)
+    counts = np.bincount(item, minlength=len(question_ids))
+
+    # Drop items without enough responses before fitting
+    keep = counts[item] >= min_responses
+    if not keep.any():
+        return 0
+    person, item, correct = person[keep], item[keep], data[keep, 2]
+    question_ids, item = np.unique(question_ids[item], return_inverse=True)
+    person_ids, person = np.unique(person_ids[person], return_inverse=True)
+
+    a, b, c = calibrate(person, item, correct, len(person_ids), len(question_ids), model=model)
+    counts = np.bincount(item, minlength=len(question_ids))
+
+    now = datetime.utcnow()
+    ItemCalibration.query.delete()
+    db.session.bulk_insert_mappings(ItemCalibration, [
+        {
+            'question_id': int(qid),
+            'model': model,
+            'discrimination': float(a[i]),
+            'difficulty': float(b[i]),
+            'guessing': float(c[i]),
+            'responses': int(counts[i]),
+            'calibrated_at': now,
+        }
+        for i, qid in enumerate(question_ids)
+    ])
+    bump_catalog_version()  # Quiz lists only offer adaptive mode for calibrated quizzes
+    db.session.commit()
+    _banks.clear()
+    return len(question_ids)
+
+
+class ItemBank:
+    """Calibrated items with probability/information tables on THETA_GRID"""
+
+    def __init__(self, question_ids, a, b, c):
+        self.question_ids = np.asarray(question_ids, dtype=np.int64)
+        self.position = {int(qid): i for i, qid in enumerate(self.question_ids)}
+        a, b, c = (np.asarray(x, dtype=np.float64)[:, None] for x in (a, b, c))
+        p = c + (1 - c) * _sigmoid(a * (THETA_GRID[None, :] - b))
+        p = np.clip(p, 1e-6, 1 - 1e-6)
+        # Item-major log likelihood rows for the posterior update
+        self.log_p = np.log(p).astype(np.float32)
+        self.log_q = np.log1p(-p).astype(np.float32)
+        # Grid-major information rows for next-item selection
+        info = a ** 2 * ((1 - p) / p) * ((p - c) / (1 - c)) ** 2
+        self.info = np.ascontiguousarray(info.T, dtype=np.float32)
+        self.log_prior = (-0.5 * THETA_GRID ** 2).astype(np.float32)
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def estimate(self, question_ids, correct):
+        """EAP ability estimate and posterior standard deviation"""
+        log_post = self.log_prior.copy()
+        for qid, right in zip(question_ids, correct):
+            pos = self.position.get(qid)
+            if pos is not None:
+                log_post += self.log_p[pos] if right else self.log_q[pos]
+        post = np.exp(log_post - log_post.max())
+        post /= post.sum()
+        theta = float(post @ THETA_GRID)
+        se = float(np.sqrt(post @ (THETA_GRID - theta) ** 2))
+        return theta, se
+
+    def next_item(self, theta, administered=()):
+        """Question id with maximum information at ``theta`` not yet used"""
+        row = self.info[int(np.abs(THETA_GRID - theta).argmin())]
+        used = [self.position[qid] for qid in administered if qid in self.position]
+        if used:
+            if len(used) >= len(row):
+                return None
+            row = row.copy()
+            row[used] = -1.0
+        return int(self.question_ids[int(row.argmax())])
+
+
+def calibrated_quizzes(chapter_id):
+    """Lazy query of the ids of a chapter's quizzes with calibrated questions"""
+    return db.session.query(Question.quiz_id).join(
+        ItemCalibration, ItemCalibration.question_id == Question.id
+    ).join(Quiz, Quiz.id == Question.quiz_id).filter(Quiz.chapter_id == chapter_id).distinct()
+
+
+def item_bank_for_quiz(quiz_id):
+    """Return the cached ItemBank for a quiz, rebuilding it after recalibration"""
+    stamp = db.session.query(db.func.max(ItemCalibration.calibrated_at)).join(
+        Question, Question.id == ItemCalibration.question_id
+    ).filter(Question.quiz_id == quiz_id).scalar()
+    if stamp is None:
+        return None
+    cached = _banks.get(quiz_id)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    rows = db.session.query(
+        ItemCalibration.question_id, ItemCalibration.discrimination,
+        ItemCalibration.difficulty, ItemCalibration.guessing
+    ).join(Question, Question.id == ItemCalibration.question_id).filter(
+        Question.quiz_id == quiz_id
+    ).order_by(ItemCalibration.question_id).all()
+    data = np.array(rows, dtype=np.float64)
+    bank = ItemBank(data[:, 0].astype(np.int64), data[:, 1], data[:, 2], data[:, 3])
+    _banks[quiz_id] = (stamp, bank)
+    return bank
@@ -0,0 +1,382 @@
+"""Durable background jobs.
+
+Routes call ``enqueue(name, actor_id, **payload)`` and return right away;
+the job waits as a row in the ``jobs`` table until a ``flask worker``
+process claims it and runs the task in its process pool. Tasks are plain
+functions registered with ``@task`` (see ``utils.tasks``); a running task
+may call ``progress(done, total, message)``.
+
+``JOB_QUEUES`` maps each queue to how many of its jobs may run at once,
+counted across every worker process, so e.g. only one rebuild of the
+question index ever runs. A task that raises is retried after
+``JOB_RETRY_BACKOFF`` seconds, doubling per attempt, until it has been
+tried ``max_attempts`` times. A job whose worker stops sending heartbeats
+for ``JOB_STALE_SECONDS`` counts as a failed attempt too.
+
+Files a job needs (e.g. an uploaded roster, which holds passwords) do not
+go into the payload: ``save_upload`` writes them to ``JOB_UPLOAD_DIR`` and
+the job gets the path as ``upload``. The file is deleted once the job has
+succeeded, failed for good or been cancelled.
+
+With ``JOB_RUN_INLINE`` jobs run inside ``enqueue`` instead, for
+development without a worker.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import random
+import shutil
+import signal
+import socket
+import tempfile
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import OperationalError
+
+from database.models import db, Job
+from utils.app_state import get_state, set_state
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 1.0  # How often an idle worker looks for new jobs
+HEARTBEAT_SECONDS = 10.0
+PROGRESS_SECONDS = 0.5  # Minimum interval between progress reports of one job
+MAX_BACKOFF_SECONDS = 3600
+WORKER_SEEN_KEY = 'jobs:worker_seen'
+
+Task = namedtuple('Task', 'function queue max_attempts')
+JobContext = namedtuple('JobContext', 'id actor_id attempt')
+
+TASKS = {}
+
+jobs = Job.__table__
+
+# Set in pool processes
+_app = None
+_updates = None
+_current = None
+_last_report = 0.0
+
+
+def task(name, queue='default', max_attempts=3):
+    """Register a function as the task ``name``; it is called with the job's payload"""
+    def register(function):
+        TASKS[name] = Task(function, queue, max_attempts)
+        return function
+    return register
+
+
+def _tasks():
+    # Tasks import this module for @task, so load them on first use
+    import utils.tasks  # noqa: F401
+    return TASKS
+
+
+def enqueue(name, actor_id=None, **payload):
+    """Add a job for task ``name`` and commit it; returns the job id"""
+    registered = _tasks()[name]
+    job = Job(name=name, queue=registered.queue, max_attempts=registered.max_attempts,
+              payload=json.dumps(payload, default=str), actor_id=actor_id, run_after=datetime.utcnow())
+    db.session.add(job)
+    db.session.commit()
+    if current_app.config['JOB_RUN_INLINE']:
+        _run_inline(job.id)
+    return job.id
+
+
+def save_upload(stream):
+    """Store an uploaded file privately for a job; returns the path to pass as ``upload``"""
+    directory = current_app.config['JOB_UPLOAD_DIR']
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.upload')  # Readable by this user only
+    with os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(stream, f)
+    return path
+
+
+def _discard_upload(payload):
+    path = json.loads(payload).get('upload')
+    directory = os.path.abspath(current_app.config['JOB_UPLOAD_DIR'])
+    # Only ever delete files save_upload created
+    if path and os.path.dirname(os.path.abspath(path)) == directory:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def current_job():
+    """``JobContext`` of the job running in this process, or None"""
+    return _current
+
+
+def progress(done, total=None, message=None):
+    """Report how far the running job is; ``done`` is a fraction when ``total`` is omitted"""
+    global _last_report
+    if _updates is None or _current is None:
+        return
+    fraction = min(max(done / total if total else done, 0.0), 1.0)
+    now = time.monotonic()
+    if fraction < 1.0 and now - _last_report < PROGRESS_SECONDS:
+        return
+    _last_report = now
+    _updates.put((_current.id, fraction, message and str(message)[:200]))
+
+
+def retry(job_id):
+    """Queue a failed or cancelled job again with a fresh set of attempts"""
+    job = db.session.get(Job, job_id)
+    if job is None or job.status not in ('failed', 'cancelled') or 'upload' in json.loads(job.payload):
+        # A job's upload is deleted once it has ended
+        return False
+    job.status, job.attempts, job.run_after = 'queued', 0, datetime.utcnow()
+    job.progress = job.message = job.finished_at = None
+    db.session.commit()
+    return True
+
+
+def cancel(job_id):
+    """Cancel a job that has not started yet"""
+    payload = db.session.execute(
+        update(jobs).where(jobs.c.id == job_id, jobs.c.status == 'queued')
+        .values(status='cancelled', finished_at=datetime.utcnow()).returning(jobs.c.payload)
+    ).scalar()
+    db.session.commit()
+    if payload is None:
+        return False
+    _discard_upload(payload)
+    return True
+
+
+def worker_last_seen():
+    """When a worker last sent a heartbeat, or None"""
+    seen = get_state(WORKER_SEEN_KEY)
+    return datetime.fromisoformat(seen) if seen else None
+
+
+def _claim(queue, limit, worker, job_id=None):
+    """Atomically mark the next due job of ``queue`` as running, within its concurrency limit"""
+    now = datetime.utcnow()
+    pending, active = jobs.alias('pending'), jobs.alias('active')
+    if job_id is None:
+        candidate = select(pending.c.id).where(
+            pending.c.status == 'queued', pending.c.queue == queue, pending.c.run_after <= now
+        ).order_by(pending.c.run_after, pending.c.id).limit(1).scalar_subquery()
+        running = select(func.count()).select_from(active).where(
+            active.c.status == 'running', active.c.queue == queue
+        ).scalar_subquery()
+        condition = (jobs.c.id == candidate) & (running < limit)
+    else:
+        condition = (jobs.c.id == job_id) & (jobs.c.status == 'queued')
+    row = db.session.execute(
+        update(jobs).where(condition).values(
+            status='running', attempts=jobs.c.attempts + 1, worker=worker,
+            started_at=now, heartbeat_at=now, progress=None, message=None
+        ).returning(jobs.c.id, jobs.c.name, jobs.c.payload, jobs.c.actor_id, jobs.c.attempts)
+    ).first()
+    db.session.commit()
+    return tuple(row) if row else None
+
+
+def _finish(job_id, worker, ok, value):
+    """Record how a run ended: success, a retry after backoff, or failure"""
+    now = datetime.utcnow()
+    job = db.session.get(Job, job_id)
+    if job is None or job.status != 'running' or job.worker != worker:
+        # Reclaimed as stale meanwhile
+        db.session.rollback()
+        return
+    job.heartbeat_at = None
+    if ok:
+        job.status, job.result, job.progress, job.finished_at = 'succeeded', value, 1.0, now
+    elif job.attempts < job.max_attempts:
+        # Exponential backoff with a little jitter so failures do not retry in lockstep
+        delay = min(current_app.config['JOB_RETRY_BACKOFF'] * 2 ** (job.attempts - 1), MAX_BACKOFF_SECONDS)
+        job.status, job.error, job.run_after = 'queued', value, now + timedelta(seconds=delay * random.uniform(1, 1.1))
+    else:
+        job.status, job.error, job.finished_at = 'failed', value, now
+    db.session.commit()
+    if job.status != 'queued':
+        _discard_upload(job.payload)
+
+
+def _call(job):
+    """Run a claimed job's task; returns ``(ok, result JSON or traceback)``"""
+    global _current
+    job_id, name, payload, actor_id, attempt = job
+    _current = JobContext(job_id, actor_id, attempt)
+    try:
+        result = _tasks()[name].function(**json.loads(payload))
+        return True, json.dumps(result, default=str)
+    except Exception:
+        db.session.rollback()
+        logger.exception('Job %s (%s) failed', job_id, name)
+        return False, traceback.format_exc()
+    finally:
+        _current = None
+        from utils.events import event_log
+        event_log.flush()
+
+
+def _run_inline(job_id):
+    worker = f'inline:{os.getpid()}'
+    job = _claim(None, None, worker, job_id=job_id)
+    if job is not None:
+        _finish(job_id, worker, *_call(job))
+
+
+def _init_process(config, updates):
+    global _app, _updates
+    # Ctrl-C goes to the whole process group; let the supervisor decide when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app import create_app
+    _app = create_app(config)
+    _updates = updates
+
+
+def _execute(job):
+    with _app.app_context():
+        return _call(job)
+
+
+class Supervisor:
+    """Claims due jobs, runs them in a process pool and records the outcome"""
+
+    def __init__(self, app, queues=None):
+        self.app = app
+        self.limits = {name: limit for name, limit in app.config['JOB_QUEUES'].items()
+                       if not queues or name in queues}
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.updates = multiprocessing.Queue()  # Progress reports from the pool
+        self.running = {}  # Future -> (job id, queue)
+        self.finished = []  # (job id, ok, value) not yet recorded
+        self.stopping = False
+        self._pool = None
+        self._heartbeat = 0.0
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=sum(self.limits.values()), initializer=_init_process,
+                                   initargs=(dict(self.app.config), self.updates))
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        """Work until SIGINT/SIGTERM, then let running jobs finish"""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        self._pool = self._new_pool()
+        with self.app.app_context():
+            try:
+                while not self.stopping:
+                    self._start_jobs()
+                    if self.running:
+                        done, _ = wait(self.running, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+                        self._collect(done)
+                    else:
+                        time.sleep(POLL_SECONDS)
+                    self._maintain()
+                    self._record()
+                if self.running:
+                    print(f"Waiting for {len(self.running)} running job(s)...")
+                while self.running or self.finished:
+                    done, _ = wait(self.running, timeout=POLL_SECONDS)
+                    self._collect(done)
+                    self._maintain()
+                    self._record()
+            finally:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _start_jobs(self):
+        for queue, limit in self.limits.items():
+            while sum(q == queue for _, q in self.running.values()) < limit:
+                try:
+                    job = _claim(queue, limit, self.name)
+                except OperationalError:
+                    # Locked by a long write; try again next pass
+                    db.session.rollback()
+                    return
+                if job is None:
+                    break
+                try:
+                    future = self._pool.submit(_execute, job)
+                except BrokenProcessPool:
+                    self.finished.append((job[0], False, 'Worker pool was restarted before the job started\n'))
+                    self._pool = self._new_pool()
+                    return
+                self.running[future] = (job[0], queue)
+
+    def _collect(self, done):
+        broken = False
+        for future in done:
+            job_id, _ = self.running.pop(future)
+            error = future.exception()
+            if error is None:
+                ok, value = future.result()
+            else:
+                # The process running it died (killed, out of memory...)
+                broken |= isinstance(error, BrokenProcessPool)
+                ok, value = False, f'{type(error).__name__}: {error}\n'
+            self.finished.append((job_id, ok, value))
+        if broken and not self.running:
+            self._pool.shutdown(wait=False)
+            self._pool = self._new_pool()
+
+    def _record(self):
+        """Write the outcome of finished jobs; kept for the next pass while the database is locked"""
+        while self.finished:
+            try:
+                _finish(self.finished[0][0], self.name, *self.finished[0][1:])
+            except OperationalError:
+                db.session.rollback()
+                return
+            self.finished.pop(0)
+
+    def _maintain(self):
+        """Write progress reports; send heartbeats and reclaim stale jobs every so often"""
+        latest = {}
+        while True:
+            try:
+                job_id, fraction, message = self.updates.get_nowait()
+            except queue_module.Empty:
+                break
+            latest[job_id] = (fraction, message)
+        now = datetime.utcnow()
+        try:
+            for job_id, (fraction, message) in latest.items():
+                db.session.execute(update(jobs).where(
+                    jobs.c.id == job_id, jobs.c.status == 'running', jobs.c.worker == self.name
+                ).values(progress=fraction, message=message, heartbeat_at=now))
+            db.session.commit()
+
+            if time.monotonic() - self._heartbeat < HEARTBEAT_SECONDS:
+                return
+            self._heartbeat = time.monotonic()
+            db.session.execute(update(jobs).where(jobs.c.status == 'running', jobs.c.worker == self.name)
+                               .values(heartbeat_at=now))
+            set_state(WORKER_SEEN_KEY, now.isoformat())
+            db.session.commit()
+
+            stale = now - timedelta(seconds=self.app.config['JOB_STALE_SECONDS'])
+            for job_id, worker in db.session.query(Job.id, Job.worker).filter(
+                    Job.status == 'running', Job.heartbeat_at < stale).all():
+                _finish(job_id, worker, False, f'Worker {worker} stopped sending heartbeats\n')
+        except Exception:
+            # Typically a long write transaction holding the lock; reports are resent next time
+            db.session.rollback()
+            logger.warning('Could not update job progress', exc_info=True)
+            for job_id, (fraction, message) in latest.items():
+                self.updates.put((job_id, fraction, message))
+
+
+def run_worker(app, queues=None):
+    Supervisor(app, queues).run()
@@ -0,0 +1,151 @@
+"""In-memory live-exam monitor feeding the admin Server-Sent Events page.
+
+Quiz routes append start/submit events to a bounded ring buffer. A single
+background thread per worker process aggregates the buffer once per second
+into a JSON snapshot, and every connected admin stream just waits for the
+next snapshot. No database polling is involved, so each worker only sees
+the attempts it served itself. Only quizzes whose live window contains the
+current time are shown; the window is remembered from the latest event.
+"""
+import json
+import threading
+import time
+from collections import deque
+from datetime import timezone
+
+BUFFER_SIZE = 50000
+INTERVAL = 1.0  # Seconds between snapshots
+MINUTES = 10  # Per-minute history shown for starts/submits
+SCORE_WINDOW = 15 * 60  # Seconds of submits in the rolling score histogram
+IN_FLIGHT_TIMEOUT = 3 * 3600  # Started attempts older than this are abandoned
+
+
+def _epoch(local):
+    """Naive server-local time (as quiz windows are entered) to a UTC epoch timestamp"""
+    return local.astimezone(timezone.utc).timestamp() if local else None
+
+
+class LiveMonitor:
+    def __init__(self):
+        self._events = deque(maxlen=BUFFER_SIZE)
+        self._in_flight = {}  # (quiz_id, user_id) -> start timestamp
+        self._quizzes = {}  # quiz_id -> (title, live from, live to)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._snapshot = None
+        self._version = 0
+        self._subscribers = 0
+        self._thread = None
+
+    def record_start(self, quiz, user_id):
+        now = time.time()
+        info = (quiz.title, _epoch(quiz.live_from), _epoch(quiz.live_to))
+        with self._lock:
+            self._events.append((now, 'start', quiz.id, None))
+            self._in_flight[(quiz.id, user_id)] = now
+            self._quizzes[quiz.id] = info
+
+    def record_submit(self, quiz, user_id, percentage):
+        now = time.time()
+        info = (quiz.title, _epoch(quiz.live_from), _epoch(quiz.live_to))
+        with self._lock:
+            self._events.append((now, 'submit', quiz.id, percentage))
+            self._in_flight.pop((quiz.id, user_id), None)
+            self._quizzes[quiz.id] = info
+
+    def _build_snapshot(self):
+        now = time.time()
+        minute_now = int(now // 60)
+        with self._lock:
+            events = list(self._events)
+            cutoff = now - IN_FLIGHT_TIMEOUT
+            for key in [k for k, started in self._in_flight.items() if started < cutoff]:
+                del self._in_flight[key]
+            in_flight = list(self._in_flight)
+            titles = {
+                quiz_id: title for quiz_id, (title, live_from, live_to) in self._quizzes.items()
+                if (live_from is None or live_from <= now) and (live_to is None or now <= live_to)
+            }
+
+        quizzes = {}
+
+        def entry(quiz_id):
+            if quiz_id not in quizzes:
+                quizzes[quiz_id] = {
+                    'quiz_id': quiz_id,
+                    'title': titles[quiz_id],
+                    'started': [0] * MINUTES,
+                    'submitted': [0] * MINUTES,
+                    'in_flight': 0,
+                    'histogram': [0] * 10,
+                }
+            return quizzes[quiz_id]
+
+        # Events are appended in time order, so walk backwards and stop early
+        horizon = min(now - SCORE_WINDOW, (minute_now - MINUTES + 1) * 60)
+        for ts, kind, quiz_id, percentage in reversed(events):
+            if ts < horizon:
+                break
+            if quiz_id not in titles:
+                continue
+            stats = entry(quiz_id)
+            slot = MINUTES - 1 - (minute_now - int(ts // 60))
+            if kind == 'start':
+                if slot >= 0:
+                    stats['started'][slot] += 1
+            else:
+                if slot >= 0:
+                    stats['submitted'][slot] += 1
+                if ts >= now - SCORE_WINDOW:
+                    stats['histogram'][min(int(percentage // 10), 9)] += 1
+
+        for quiz_id, _ in in_flight:
+            if quiz_id in titles:
+                entry(quiz_id)['in_flight'] += 1
+
+        return json.dumps({
+            'generated_at': now,
+            'quizzes': sorted(quizzes.values(), key=lambda q: -q['in_flight']),
+        })
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._subscribers:
+                    self._changed.wait()
+            snapshot = self._build_snapshot()
+            with self._changed:
+                self._snapshot = snapshot
+                self._version += 1
+                self._changed.notify_all()
+            time.sleep(INTERVAL)
+
+    def _ensure_thread(self):
+        # Started lazily so that each forked worker gets its own loop
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='live-monitor', daemon=True)
+            self._thread.start()
+
+    def stream(self, heartbeat=15.0):
+        """Generator of SSE messages, one per snapshot"""
+        with self._changed:
+            self._subscribers += 1
+            self._ensure_thread()
+            self._changed.notify_all()
+        try:
+            version = 0
+            while True:
+                with self._changed:
+                    self._changed.wait_for(lambda: self._version != version, timeout=heartbeat)
+                    snapshot, latest = self._snapshot, self._version
+                if latest == version:
+                    yield ': keep-alive\n\n'
+                    continue
+                version = latest
+                yield f'data: {snapshot}\n\n'
+        finally:
+            with self._changed:
+                self._subscribers -= 1
+
+
+live_monitor = LiveMonitor()
@@ -0,0 +1,239 @@
+"""Content-addressed storage for question images.
+
+Files live under ``MEDIA_ROOT`` named by their SHA-256 (``ab/cd/abcd...``),
+so an image uploaded to many quizzes is stored, and downloaded by
+browsers, exactly once. Every blob URL is its hash, which makes responses
+safe to cache forever.
+
+Resized variants (``VARIANTS``) are generated once by a ``media.derivatives``
+background job after upload and stored as blobs of their own. Until a
+variant is ready, quiz papers fall back to the original. Variants left
+pending for any other reason are picked up by ``flask build-derivatives``.
+
+New files are written to a temporary name first and only moved to their
+hash path once the transaction adding their ``Blob`` row commits; on
+rollback they are deleted. ``flask sweep-media`` removes anything left
+over after a crash.
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import time
+
+from flask import current_app
+from PIL import Image
+from sqlalchemy import event
+
+from database.models import db, Attachment, Blob, BlobVariant
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {'thumb': 320, 'medium': 960}  # Max width in pixels
+PAPER_VARIANT = 'medium'
+FORMATS = {'PNG': 'image/png', 'JPEG': 'image/jpeg', 'GIF': 'image/gif', 'WEBP': 'image/webp'}
+CHUNK = 64 * 1024
+STAGED_KEY = 'media_staged'  # Session info: {temporary path: blob path} to publish on commit
+SHA256_NAME = re.compile(r'[0-9a-f]{64}')
+
+
+class MediaError(ValueError):
+    pass
+
+
+def blob_path(sha256, root=None):
+    root = root or current_app.config['MEDIA_ROOT']
+    return os.path.join(root, sha256[:2], sha256[2:4], sha256)
+
+
+def init_app(app):
+    # The session is shared by all apps; listen once
+    if not event.contains(db.session, 'after_commit', _publish_staged):
+        event.listen(db.session, 'after_commit', _publish_staged)
+        event.listen(db.session, 'after_transaction_end', _discard_staged)
+
+
+def _publish_staged(session):
+    for tmp, path in session.info.pop(STAGED_KEY, {}).items():
+        try:
+            if os.path.exists(path):
+                os.remove(tmp)  # The same content was staged twice
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+        except OSError:
+            logger.exception('Could not publish media file %s', path)
+
+
+def _discard_staged(session, transaction):
+    # Still staged when the outermost transaction ends: it was not committed
+    if transaction.parent is None:
+        for tmp in session.info.pop(STAGED_KEY, {}):
+            _remove(tmp)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write(stream, max_bytes, root=None):
+    """Hash ``stream`` into a temporary file; returns ``(sha256, size, readable path)``
+
+    Unless the blob is already stored, the file is staged on the session:
+    it moves to its hash path when the session commits and is deleted if
+    the transaction ends otherwise.
+    """
+    root = root or current_app.config['MEDIA_ROOT']
+    os.makedirs(root, exist_ok=True)
+    digest, size = hashlib.sha256(), 0
+    fd, tmp = tempfile.mkstemp(dir=root, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(CHUNK), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise MediaError(f'File is larger than {max_bytes // (1024 * 1024)}MB')
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        _remove(tmp)
+        raise
+    sha256 = digest.hexdigest()
+    path = blob_path(sha256, root)
+    if os.path.exists(path):
+        os.remove(tmp)  # Already stored: deduplicated
+        return sha256, size, path
+    db.session.info.setdefault(STAGED_KEY, {})[tmp] = path
+    return sha256, size, tmp
+
+
+def _unstage(tmp):
+    if db.session.info.get(STAGED_KEY, {}).pop(tmp, None) is not None:
+        _remove(tmp)
+
+
+def store_image(stream):
+    """Store an uploaded image and queue its variants; returns the blob hash
+
+    The ``Blob`` and pending ``BlobVariant`` rows are added to the session;
+    the caller commits and then enqueues a ``media.derivatives`` job.
+    """
+    sha256, size, path = _write(stream, current_app.config['MEDIA_MAX_BYTES'])
+    if db.session.get(Blob, sha256):
+        return sha256
+    try:
+        with Image.open(path) as image:
+            image.verify()
+            kind, (width, height) = image.format, image.size
+    except Exception:
+        _unstage(path)
+        raise MediaError('Unsupported or corrupt image')
+    if kind not in FORMATS:
+        _unstage(path)
+        raise MediaError(f'Unsupported image format {kind}')
+
+    db.session.add(Blob(sha256=sha256, size=size, content_type=FORMATS[kind], width=width, height=height))
+    for variant, max_width in VARIANTS.items():
+        if width <= max_width:
+            # Already small enough: the variant is the original itself
+            db.session.add(BlobVariant(source_sha=sha256, variant=variant, sha256=sha256, status='ready'))
+        else:
+            db.session.add(BlobVariant(source_sha=sha256, variant=variant, status='pending'))
+    return sha256
+
+
+def _render_variant(source, max_width):
+    with Image.open(blob_path(source.sha256)) as image:
+        kind = image.format
+        image.thumbnail((max_width, max_width * 10), Image.LANCZOS)
+        if kind == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        out = io.BytesIO()
+        image.save(out, format=kind, **({'quality': 85, 'optimize': True} if kind == 'JPEG' else {}))
+        size = image.size
+    out.seek(0)
+    sha256, length, _ = _write(out, float('inf'))
+    if not db.session.get(Blob, sha256):
+        db.session.add(Blob(sha256=sha256, size=length, content_type=source.content_type,
+                            width=size[0], height=size[1]))
+    return sha256
+
+
+def build_derivatives(sha256s=None, progress=None):
+    """Generate pending variants (all, or only for the given sources); returns count built
+
+    ``progress(done, total)`` is called after every variant.
+    """
+    query = BlobVariant.query.filter_by(status='pending')
+    if sha256s is not None:
+        query = query.filter(BlobVariant.source_sha.in_(list(sha256s)))
+    built = 0
+    pending_variants = query.all()
+    for done, pending in enumerate(pending_variants, start=1):
+        try:
+            pending.sha256 = _render_variant(db.session.get(Blob, pending.source_sha), VARIANTS[pending.variant])
+            pending.status = 'ready'
+            built += 1
+        except Exception:
+            logger.exception('Could not build %s variant of %s', pending.variant, pending.source_sha)
+            pending.status = 'failed'
+        db.session.commit()
+        if progress is not None:
+            progress(done, len(pending_variants))
+    return built
+
+
+def sweep_orphans(min_age=3600):
+    """Delete stored files without a ``Blob`` row and abandoned uploads; returns how many
+
+    Files younger than ``min_age`` seconds are left alone, as they may
+    belong to a request still in progress.
+    """
+    root = current_app.config['MEDIA_ROOT']
+    cutoff = time.time() - min_age
+    stale, blobs = [], {}
+    # List files before reading rows: a file is only published after its row is committed
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            if name.endswith('.upload') and directory == root:
+                stale.append(path)
+            elif SHA256_NAME.fullmatch(name) and path == blob_path(name, root):
+                blobs[name] = path
+    known = set()
+    names = list(blobs)
+    for start in range(0, len(names), 500):
+        known.update(db.session.scalars(db.select(Blob.sha256).where(Blob.sha256.in_(names[start:start + 500]))))
+    stale.extend(path for name, path in blobs.items() if name not in known)
+    for path in stale:
+        _remove(path)
+    return len(stale)
+
+
+def paper_media(question_ids):
+    """``{(question_id, option): [(display_sha, original_sha), ...]}`` for a quiz paper
+
+    ``option`` is None for the statement. Display hashes point at the
+    ``PAPER_VARIANT`` when it is ready, else at the original.
+    """
+    rows = db.session.query(
+        Attachment.question_id, Attachment.option, Attachment.blob_sha, BlobVariant.sha256
+    ).outerjoin(BlobVariant, db.and_(
+        BlobVariant.source_sha == Attachment.blob_sha,
+        BlobVariant.variant == PAPER_VARIANT,
+        BlobVariant.status == 'ready'
+    )).filter(Attachment.question_id.in_(list(question_ids))).order_by(Attachment.id).all()
+    media = {}
+    for question_id, option, original, display in rows:
+        media.setdefault((question_id, option), []).append((display or original, original))
+    return media
@@ -0,0 +1,35 @@
+"""MinHash signatures and LSH band keys shared by the similarity detectors.
+
+Sets are given as one flat array of non-negative integer tokens plus the
+offset at which each set starts (as for ``np.minimum.reduceat``). The hash
+family is drawn from a fixed seed, so signatures and band keys are stable
+across processes and can be stored.
+"""
+import numpy as np
+
+NUM_HASHES = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 Jaccard collide with high probability
+PRIME = (1 << 31) - 1
+
+_rng = np.random.default_rng(0)
+_A = _rng.integers(1, PRIME, NUM_HASHES, dtype=np.int64)
+_B = _rng.integers(0, PRIME, NUM_HASHES, dtype=np.int64)
+
+
+def signatures(tokens, starts):
+    """MinHash signature matrix (NUM_HASHES x sets); values fit in 31 bits"""
+    tokens = np.asarray(tokens, dtype=np.int64) % PRIME
+    result = np.empty((NUM_HASHES, len(starts)), dtype=np.int64)
+    for k in range(NUM_HASHES):
+        result[k] = np.minimum.reduceat((_A[k] * tokens + _B[k]) % PRIME, starts)
+    return result
+
+
+def band_keys(signatures):
+    """LSH bucket key of every band and set (BANDS x sets, uint64)"""
+    rows = NUM_HASHES // BANDS
+    keys = np.zeros((BANDS, signatures.shape[1]), dtype=np.uint64)
+    for band in range(BANDS):
+        for row in signatures[band * rows:(band + 1) * rows].astype(np.uint64):
+            keys[band] = keys[band] * np.uint64(1000003) ^ row
+    return keys
@@ -0,0 +1,126 @@
+"""Derived tables rebuilt by replaying the event log.
+
+Each projection consumes events in id order and keeps its position in
+``app_state`` (``projection:<name>``), so ``replay()`` normally only reads
+events added since the last run. ``replay(from_scratch=True)`` clears the
+projection's tables and re-applies the whole log. A batch and its
+checkpoint are committed together, so an interrupted replay resumes
+cleanly.
+
+To add a projection, subclass ``Projection``, implement ``reset`` and
+``apply`` and list it in ``PROJECTIONS``.
+"""
+import json
+from collections import Counter, namedtuple
+
+from sqlalchemy import func, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database.models import db, Event, EventCount, LeaderboardEntry
+from utils.app_state import get_state, set_state
+from utils.events import event_log
+
+EventRecord = namedtuple('EventRecord', 'id kind occurred_at actor_id payload')
+
+
+class Projection:
+    name = None
+    kinds = None  # Event kinds to receive; None for all
+
+    def reset(self):
+        raise NotImplementedError
+
+    def apply(self, events):
+        raise NotImplementedError
+
+
+class DailyCounts(Projection):
+    """Number of events of each kind per day"""
+    name = 'daily_counts'
+
+    def reset(self):
+        EventCount.query.delete()
+
+    def apply(self, events):
+        counts = Counter((event.occurred_at.date(), event.kind) for event in events)
+        table = EventCount.__table__
+        statement = sqlite_insert(table)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.kind],
+            set_={'count': table.c.count + statement.excluded.count}
+        ), [{'day': day, 'kind': kind, 'count': count} for (day, kind), count in counts.items()])
+
+
+class QuizLeaderboard(Projection):
+    """Best percentage and attempt count per quiz and student"""
+    name = 'quiz_leaderboard'
+    kinds = ('quiz.submitted',)
+
+    def reset(self):
+        LeaderboardEntry.query.delete()
+
+    def apply(self, events):
+        entries = {}
+        for event in events:
+            key = (event.payload['quiz_id'], event.actor_id)
+            percentage = event.payload['percentage']
+            entry = entries.setdefault(key, {'quiz_id': key[0], 'user_id': key[1], 'attempts': 0,
+                                             'best_percentage': -1.0, 'best_at': None})
+            entry['attempts'] += 1
+            if percentage > entry['best_percentage']:
+                entry['best_percentage'], entry['best_at'] = percentage, event.occurred_at
+        table = LeaderboardEntry.__table__
+        statement = sqlite_insert(table)
+        improved = statement.excluded.best_percentage > table.c.best_percentage
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.quiz_id, table.c.user_id],
+            set_={
+                'attempts': table.c.attempts + statement.excluded.attempts,
+                'best_percentage': func.max(table.c.best_percentage, statement.excluded.best_percentage),
+                'best_at': case((improved, statement.excluded.best_at), else_=table.c.best_at),
+            }
+        ), list(entries.values()))
+
+
+PROJECTIONS = {projection.name: projection for projection in (DailyCounts(), QuizLeaderboard())}
+
+
+def replay(names=None, from_scratch=False, batch_size=5000):
+    """Bring projections up to date; returns ``{name: events applied}``"""
+    # Include what this process has recorded but not yet written
+    event_log.flush()
+    upto = db.session.query(func.max(Event.id)).scalar() or 0
+
+    applied = {}
+    for name in names or PROJECTIONS:
+        projection = PROJECTIONS[name]
+        key = f'projection:{name}'
+        if from_scratch:
+            projection.reset()
+            checkpoint = 0
+        else:
+            checkpoint = int(get_state(key, 0))
+
+        applied[name] = 0
+        while True:
+            query = db.session.query(
+                Event.id, Event.kind, Event.occurred_at, Event.actor_id, Event.payload
+            ).filter(Event.id > checkpoint, Event.id <= upto)
+            if projection.kinds:
+                query = query.filter(Event.kind.in_(projection.kinds))
+            rows = query.order_by(Event.id).limit(batch_size).all()
+            if not rows:
+                break
+            projection.apply([
+                EventRecord(id_, kind, occurred_at, actor_id, json.loads(payload))
+                for id_, kind, occurred_at, actor_id, payload in rows
+            ])
+            checkpoint = rows[-1][0]
+            set_state(key, checkpoint)
+            db.session.commit()
+            applied[name] += len(rows)
+
+        # Skip past events of other kinds as well
+        set_state(key, upto)
+        db.session.commit()
+    return applied
@@ -0,0 +1,152 @@
+"""Token-bucket rate limiting shared by all worker processes.
+
+Buckets live in a small SQLite file next to the application database
+(``RATE_LIMIT_DB``), not in the application database itself, so
+throttling never competes with the writer it protects. Taking a token is
+a single upsert that refills the bucket for the time elapsed and consumes
+one token if available, so concurrent workers cannot overdraw a bucket.
+A request takes a token from each of its buckets in one transaction that
+is rolled back if any bucket is empty, so refused requests drain nothing.
+
+``RATE_LIMITS`` maps an endpoint to the scopes it is limited by, each as
+``(capacity, seconds)``: up to ``capacity`` requests in a burst, refilled
+at ``capacity / seconds`` per second. Scopes are:
+
+``ip``        the client address
+``user``      the logged-in user, or the username being logged in as from
+              this client address, so guessing from elsewhere cannot lock
+              the account's owner out
+``endpoint``  everyone together
+
+Only POST requests are counted.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from flask import request, session, Response
+
+PRUNE_EVERY = 1000  # Takes between removals of idle buckets
+IDLE_SECONDS = 3600  # Buckets untouched this long are full again and can be dropped
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    allowed INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# Refill for the elapsed time (capped at capacity), then take a token if one is left
+_TAKE = """
+INSERT INTO buckets (key, tokens, updated, allowed) VALUES (:key, :capacity - 1, :now, 1)
+ON CONFLICT(key) DO UPDATE SET
+    tokens = min(:capacity, tokens + (:now - updated) * :rate)
+             - (min(:capacity, tokens + (:now - updated) * :rate) >= 1),
+    allowed = min(:capacity, tokens + (:now - updated) * :rate) >= 1,
+    updated = :now
+RETURNING allowed, tokens
+"""
+
+
+class RateLimiter:
+    def __init__(self):
+        self._local = threading.local()
+        self._path = None
+        self._limits = {}
+        self._takes = 0
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._path = app.config['RATE_LIMIT_DB']
+        self._limits = app.config['RATE_LIMITS']
+        if app.config['RATE_LIMIT_ENABLED'] and self._limits:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            app.before_request(self._check_request)
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # Losing buckets in a crash only resets them
+            conn.execute(_SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, seconds):
+        """Take a token from bucket ``key``; returns ``(allowed, retry_after_seconds)``"""
+        refused, retry_after = self.take_all([(key, capacity, seconds)])
+        return refused is None, retry_after
+
+    def take_all(self, buckets):
+        """Take a token from every ``(key, capacity, seconds)`` bucket, or from none of them
+
+        Returns ``(refused, retry_after_seconds)`` with the index of the first
+        empty bucket, or ``None`` if every token was taken.
+        """
+        conn = self._connection()
+        now = time.time()
+        refused, retry_after = None, 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for index, (key, capacity, seconds) in enumerate(buckets):
+                rate = capacity / seconds
+                (allowed, tokens), = conn.execute(
+                    _TAKE, {'key': key, 'capacity': capacity, 'rate': rate, 'now': now}).fetchall()
+                if not allowed:
+                    refused, retry_after = index, (1 - tokens) / rate
+                    break
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        # Refilling is a function of time alone, so undoing the refused bucket's update loses nothing
+        conn.execute('ROLLBACK' if refused is not None else 'COMMIT')
+
+        with self._lock:
+            self._takes += 1
+            prune = self._takes % PRUNE_EVERY == 0
+        if prune:
+            conn.execute('DELETE FROM buckets WHERE updated < ?', (now - IDLE_SECONDS,))
+        return refused, retry_after
+
+    def _identity(self, scope):
+        if scope == 'ip':
+            return request.remote_addr
+        if scope == 'user':
+            if session.get('user_id'):
+                return session['user_id']
+            username = request.form.get('username', '').lower()
+            return f'{username}@{request.remote_addr}' if username else None
+        return ''
+
+    def _check_request(self):
+        limits = self._limits.get(request.endpoint)
+        if not limits or request.method != 'POST':
+            return None
+        scopes, buckets = [], []
+        for scope, (capacity, seconds) in limits.items():
+            identity = self._identity(scope)
+            if identity is not None:
+                scopes.append(scope)
+                buckets.append((f'{request.endpoint}:{scope}:{identity}', capacity, seconds))
+        refused, retry_after = self.take_all(buckets)
+        if refused is None:
+            return None
+        with self._lock:
+            self._counts[(request.endpoint, scopes[refused])] += 1
+        return Response('Too many requests. Please wait a moment and try again.\n', 429,
+                        {'Retry-After': str(int(retry_after) + 1)}, mimetype='text/plain')
+
+    def stats(self):
+        """Requests refused by this process, per endpoint and scope"""
+        with self._lock:
+            return {f'{endpoint}:{scope}': count for (endpoint, scope), count in self._counts.items()}
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,59 @@
+"""Column-only read models for listing pages.
+
+Each function selects just the columns a listing renders, joining the
+names it would otherwise reach through relationships, and returns plain
+result rows (tuples with attribute access). Nothing is added to the
+session identity map and no lazy loads can fire from the templates.
+"""
+from sqlalchemy import select, func
+
+from database.models import db, User, Subject, Chapter, Quiz, Score
+
+
+def _percentage():
+    # Same rounding as Score.percentage
+    return func.round(Score.total_scored * 100.0 / Score.total_questions, 2).label('percentage')
+
+
+def student_rows(search=None, newest_first=False, limit=None):
+    """Non-admin users: id, username, full_name, qualification, created_at"""
+    statement = select(User.id, User.username, User.full_name, User.qualification, User.created_at).where(
+        User.is_admin.is_(False)
+    )
+    if search:
+        statement = statement.where(User.username.ilike(f'%{search}%'))
+    statement = statement.order_by(User.created_at.desc() if newest_first else User.id).limit(limit)
+    return db.session.execute(statement).all()
+
+
+def subject_rows(search=None):
+    """Subjects: id, name, description"""
+    statement = select(Subject.id, Subject.name, Subject.description).order_by(Subject.id)
+    if search:
+        statement = statement.where(Subject.name.ilike(f'%{search}%'))
+    return db.session.execute(statement).all()
+
+
+def quiz_rows(search=None):
+    """Quizzes: id, title, chapter_name, subject_name"""
+    statement = select(
+        Quiz.id, Quiz.title, Chapter.name.label('chapter_name'), Subject.name.label('subject_name')
+    ).join(Chapter, Chapter.id == Quiz.chapter_id).join(Subject, Subject.id == Chapter.subject_id).order_by(Quiz.id)
+    if search:
+        statement = statement.where(Quiz.title.ilike(f'%{search}%'))
+    return db.session.execute(statement).all()
+
+
+def attempt_rows(user_id=None, limit=None):
+    """Attempts, newest first: id, quiz_title, subject_name, full_name, total_scored,
+    total_questions, percentage, time_taken, time_stamp_of_attempt"""
+    statement = select(
+        Score.id, Quiz.title.label('quiz_title'), Subject.name.label('subject_name'), User.full_name,
+        Score.total_scored, Score.total_questions, _percentage(), Score.time_taken, Score.time_stamp_of_attempt
+    ).join(Quiz, Quiz.id == Score.quiz_id).join(Chapter, Chapter.id == Quiz.chapter_id).join(
+        Subject, Subject.id == Chapter.subject_id
+    ).join(User, User.id == Score.user_id)
+    if user_id is not None:
+        statement = statement.where(Score.user_id == user_id)
+    statement = statement.order_by(Score.time_stamp_of_attempt.desc()).limit(limit)
+    return db.session.execute(statement).all()
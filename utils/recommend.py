@@ -0,0 +1,101 @@
+"""Batch quiz recommendations from the user x quiz attempt matrix.
+
+The job builds a sparse matrix of which quizzes each student attempted
+(live attempts and archived ones, so archiving never makes a quiz "new"),
+factorizes it with a truncated SVD and scores every unseen quiz for every
+user in vectorized chunks. The top-N quizzes per user are written to the
+``recommendations`` table so the dashboard can read them in one query.
+"""
+from datetime import datetime
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import select, union
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import svds
+
+from database.models import db, User, Quiz, Score, ArchivedScoreSummary, Recommendation
+
+CHUNK_SIZE = 2000  # Users scored per dense block
+INSERT_BATCH = 10000
+
+
+def _top_n(scores, n):
+    """Column indices of the n best entries per row, best first"""
+    n = min(n, scores.shape[1])
+    top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def build_recommendations(top_n=10, factors=32):
+    """Recompute and store top-N quiz recommendations for every student"""
+    quiz_ids = np.array([qid for (qid,) in db.session.query(Quiz.id).order_by(Quiz.id)], dtype=np.int64)
+    user_ids = np.array([uid for (uid,) in db.session.query(User.id).filter_by(is_admin=False).order_by(User.id)], dtype=np.int64)
+    if not len(quiz_ids) or not len(user_ids):
+        return 0
+
+    # One row per (user, quiz) pair that was attempted at least once, live or archived
+    attempted = union(
+        select(Score.user_id, Score.quiz_id),
+        select(ArchivedScoreSummary.user_id, ArchivedScoreSummary.quiz_id)
+    )
+    pairs = np.fromiter(chain.from_iterable(db.session.execute(attempted)), dtype=np.int64).reshape(-1, 2)
+    rows = np.searchsorted(user_ids, pairs[:, 0])
+    cols = np.searchsorted(quiz_ids, pairs[:, 1])
+    valid = (rows < len(user_ids)) & (cols < len(quiz_ids))
+    valid[valid] &= (user_ids[rows[valid]] == pairs[valid, 0]) & (quiz_ids[cols[valid]] == pairs[valid, 1])
+    rows, cols = rows[valid], cols[valid]
+    matrix = csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                        shape=(len(user_ids), len(quiz_ids)))
+
+    # Down-weight very popular quizzes so the factors capture taste, not volume
+    popularity = np.asarray(matrix.sum(axis=0)).ravel()
+    weights = (1.0 / np.sqrt(np.maximum(popularity, 1.0))).astype(np.float32)
+    weighted = matrix.multiply(weights[None, :]).tocsr()
+
+    k = min(factors, min(weighted.shape) - 1)
+    item_factors = None
+    if k >= 1 and weighted.nnz:
+        _, _, vt = svds(weighted, k=k)
+        item_factors = vt.T.astype(np.float32)  # quizzes x k
+
+    now = datetime.utcnow()
+    fallback = _top_n(popularity[None, :], top_n)[0]
+    Recommendation.query.delete()
+
+    batch = []
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        block = matrix[start:start + CHUNK_SIZE]
+        if item_factors is not None:
+            scores = (weighted[start:start + CHUNK_SIZE] @ item_factors) @ item_factors.T
+        else:
+            scores = np.zeros(block.shape, dtype=np.float32)
+        # Small popularity prior breaks ties and covers users with no history
+        scores += popularity[None, :] * 1e-6
+        seen_rows, seen_cols = block.nonzero()
+        scores[seen_rows, seen_cols] = -np.inf
+        top = _top_n(scores, top_n)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+
+        # Users without history get the most popular quizzes instead
+        cold = np.diff(block.indptr) == 0
+        top[cold] = fallback
+        top_scores[cold] = popularity[fallback]
+
+        finite = np.isfinite(top_scores)
+        ranks = np.cumsum(finite, axis=1)
+        users = np.broadcast_to(user_ids[start:start + CHUNK_SIZE, None], top.shape)
+        batch.extend(
+            {'user_id': u, 'rank': r, 'quiz_id': q, 'score': v, 'generated_at': now}
+            for u, r, q, v in zip(users[finite].tolist(), ranks[finite].tolist(),
+                                  quiz_ids[top[finite]].tolist(), top_scores[finite].tolist())
+        )
+        if len(batch) >= INSERT_BATCH:
+            db.session.execute(Recommendation.__table__.insert(), batch)
+            batch = []
+
+    if batch:
+        db.session.execute(Recommendation.__table__.insert(), batch)
+    db.session.commit()
+    return len(user_ids)
@@ -0,0 +1,165 @@
+"""Materialized quiz/chapter/subject analytics.
+
+``refresh_rollups`` folds every ``scores`` row added since the stored
+high-water mark into ``quiz_stats`` with one grouped query, then re-derives
+the (much smaller) chapter and subject rollups from the quiz rows. Report
+pages only ever read the rollup tables. Deleted scores are not subtracted;
+run a full rebuild (``flask refresh-rollups --full``) to resync after bulk
+deletes. A full rebuild also re-reads the score archive, since archived
+attempts are no longer in ``scores``.
+"""
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import func, case, cast, Integer
+
+from database.models import db, Score, Quiz, Chapter, QuizStats, ChapterStats, SubjectStats
+from utils.app_state import get_state, set_state
+
+HWM_KEY = 'rollup_scores_hwm'
+PASS_PERCENTAGE = 50
+BUCKETS = 10
+
+
+def time_taken_seconds(column):
+    """SQL expression converting an 'H:MM:SS' string to seconds"""
+    first = func.instr(column, ':')
+    hours = cast(func.substr(column, 1, first - 1), Integer)
+    minutes = cast(func.substr(column, first + 1, 2), Integer)
+    seconds = cast(func.substr(column, -2), Integer)
+    return func.coalesce(hours * 3600 + minutes * 60 + seconds, 0)
+
+
+def _parse_histogram(value):
+    return [int(n) for n in value.split(',')]
+
+
+def _format_histogram(counts):
+    return ','.join(str(n) for n in counts)
+
+
+def _merge(target, attempts, passed, percentage_sum, time_taken_sum, histogram):
+    target.attempts = (target.attempts or 0) + attempts
+    target.passed = (target.passed or 0) + passed
+    target.percentage_sum = (target.percentage_sum or 0.0) + percentage_sum
+    target.time_taken_sum = (target.time_taken_sum or 0) + time_taken_sum
+    current = _parse_histogram(target.histogram) if target.histogram else [0] * BUCKETS
+    target.histogram = _format_histogram(a + b for a, b in zip(current, histogram))
+
+
+def refresh_rollups(full=False):
+    """Fold new scores into the rollups; returns the number of scores processed"""
+    upto = db.session.query(func.max(Score.id)).scalar() or 0
+    after = 0 if full else int(get_state(HWM_KEY, 0))
+    if full:
+        QuizStats.query.delete()
+    if upto <= after and not full:
+        return 0
+
+    percentage = Score.total_scored * 100.0 / Score.total_questions
+    bucket = case((percentage >= 100, BUCKETS - 1), else_=cast(percentage / 10, Integer))
+    rows = db.session.query(
+        Score.quiz_id,
+        bucket,
+        func.count(),
+        func.sum(case((percentage >= PASS_PERCENTAGE, 1), else_=0)),
+        func.sum(percentage),
+        func.sum(time_taken_seconds(Score.time_taken)),
+    ).filter(
+        Score.id > after, Score.id <= upto, Score.total_questions > 0
+    ).group_by(Score.quiz_id, bucket).all()
+
+    # Collapse the (quiz, bucket) groups into one delta per quiz
+    deltas = {}
+    for quiz_id, bucket_index, count, passed, percentage_sum, seconds in rows:
+        delta = deltas.setdefault(quiz_id, [0, 0, 0.0, 0, [0] * BUCKETS])
+        delta[0] += count
+        delta[1] += passed or 0
+        delta[2] += percentage_sum or 0.0
+        delta[3] += seconds or 0
+        delta[4][min(max(int(bucket_index), 0), BUCKETS - 1)] += count
+    if full:
+        _fold_archive(deltas)
+
+    existing = {s.quiz_id: s for s in QuizStats.query.filter(QuizStats.quiz_id.in_(list(deltas)))} if deltas else {}
+    processed = 0
+    for quiz_id, (count, passed, percentage_sum, seconds, histogram) in deltas.items():
+        stats = existing.get(quiz_id)
+        if stats is None:
+            stats = QuizStats(quiz_id=quiz_id)
+            db.session.add(stats)
+        _merge(stats, count, passed, percentage_sum, seconds, histogram)
+        processed += count
+    db.session.flush()
+
+    _rebuild_parent_rollups()
+    set_state(HWM_KEY, upto)
+    db.session.commit()
+    return processed
+
+
+def _fold_archive(deltas):
+    """Add archived attempts to the per-quiz deltas"""
+    from utils.score_archive import get_archive, NO_TIME  # score_archive imports this module
+    for partition in get_archive().partitions():
+        total = partition.column('total_questions')
+        valid = total > 0
+        quiz_ids, inverse = np.unique(partition.column('quiz_id')[valid], return_inverse=True)
+        percentage = partition.column('total_scored')[valid] * 100.0 / total[valid]
+        seconds = partition.column('time_taken')[valid]
+        seconds[seconds == NO_TIME] = 0
+        buckets = np.minimum((percentage // (100 / BUCKETS)).astype(np.int64), BUCKETS - 1)
+        counts = np.bincount(inverse, minlength=len(quiz_ids))
+        passed = np.bincount(inverse, weights=percentage >= PASS_PERCENTAGE, minlength=len(quiz_ids))
+        sums = np.bincount(inverse, weights=percentage, minlength=len(quiz_ids))
+        times = np.bincount(inverse, weights=seconds, minlength=len(quiz_ids))
+        histograms = np.zeros((len(quiz_ids), BUCKETS), dtype=np.int64)
+        np.add.at(histograms, (inverse, buckets), 1)
+        for i, quiz_id in enumerate(quiz_ids.tolist()):
+            delta = deltas.setdefault(quiz_id, [0, 0, 0.0, 0, [0] * BUCKETS])
+            delta[0] += int(counts[i])
+            delta[1] += int(passed[i])
+            delta[2] += float(sums[i])
+            delta[3] += int(times[i])
+            delta[4] = [a + int(b) for a, b in zip(delta[4], histograms[i])]
+
+
+def _rebuild_parent_rollups():
+    """Re-derive chapter and subject rollups from the quiz rollups"""
+    rows = db.session.query(QuizStats, Quiz.chapter_id, Chapter.subject_id).join(
+        Quiz, Quiz.id == QuizStats.quiz_id
+    ).join(Chapter, Chapter.id == Quiz.chapter_id).all()
+
+    chapters, subjects = {}, {}
+    for stats, chapter_id, subject_id in rows:
+        for parents, parent_id, model, key in ((chapters, chapter_id, ChapterStats, 'chapter_id'),
+                                               (subjects, subject_id, SubjectStats, 'subject_id')):
+            if parent_id not in parents:
+                parents[parent_id] = model(**{key: parent_id}, histogram=None)
+            _merge(parents[parent_id], stats.attempts, stats.passed, stats.percentage_sum,
+                   stats.time_taken_sum, _parse_histogram(stats.histogram))
+
+    ChapterStats.query.delete()
+    SubjectStats.query.delete()
+    db.session.add_all(list(chapters.values()) + list(subjects.values()))
+
+
+def summarize(stats):
+    """Display values for a rollup row (median is interpolated from the histogram)"""
+    if stats is None or not stats.attempts:
+        return None
+    histogram = _parse_histogram(stats.histogram)
+    half, seen, median = stats.attempts / 2, 0, 0.0
+    for index, count in enumerate(histogram):
+        if count and seen + count >= half:
+            median = (index + (half - seen) / count) * 100 / BUCKETS
+            break
+        seen += count
+    return {
+        'attempts': stats.attempts,
+        'mean': round(stats.percentage_sum / stats.attempts, 2),
+        'median': round(median, 2),
+        'pass_rate': round(stats.passed * 100 / stats.attempts, 2),
+        'histogram': histogram,
+        'avg_time': str(timedelta(seconds=stats.time_taken_sum // stats.attempts)),
+    }
@@ -0,0 +1,118 @@
+"""Bulk student roster import.
+
+A roster is a CSV file with ``username,password,full_name,qualification,dob``
+columns (dob as YYYY-MM-DD). Usernames already in the database are found with
+a single join against a temporary table, passwords are hashed in a process
+pool across all cores, and users are inserted in chunks inside one
+transaction.
+"""
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from sqlalchemy import text
+
+from database.models import db, User
+from utils.security import hash_password, DEFAULT_ITERATIONS
+
+REQUIRED_COLUMNS = ('username', 'password', 'full_name', 'qualification', 'dob')
+INSERT_CHUNK = 1000
+
+
+def parse_roster(stream):
+    """Read roster rows from a text stream, returning ``(rows, errors)``"""
+    reader = csv.DictReader(stream)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        return [], [f"Missing column(s): {', '.join(missing)}"]
+
+    rows, errors = [], []
+    for line, record in enumerate(reader, start=2):
+        values = {c: (record.get(c) or '').strip() for c in REQUIRED_COLUMNS}
+        if not all(values.values()):
+            errors.append(f"Line {line}: empty required field")
+            continue
+        try:
+            values['dob'] = datetime.strptime(values['dob'], '%Y-%m-%d').date()
+        except ValueError:
+            errors.append(f"Line {line}: invalid dob {values['dob']!r}")
+            continue
+        rows.append(values)
+    return rows, errors
+
+
+def _existing_usernames(usernames):
+    """Usernames from ``usernames`` that are already registered (one query)"""
+    conn = db.session.connection()
+    conn.execute(text("CREATE TEMP TABLE IF NOT EXISTS roster_usernames (username TEXT PRIMARY KEY)"))
+    conn.execute(text("DELETE FROM roster_usernames"))
+    conn.execute(text("INSERT INTO roster_usernames (username) VALUES (:username)"),
+                 [{'username': u} for u in usernames])
+    existing = conn.execute(text(
+        "SELECT u.username FROM users u JOIN roster_usernames r ON r.username = u.username"
+    )).scalars().all()
+    conn.execute(text("DELETE FROM roster_usernames"))
+    return set(existing)
+
+
+def import_roster(rows, iterations=DEFAULT_ITERATIONS, workers=None):
+    """Create users for roster rows, skipping usernames that already exist"""
+    unique = {}
+    for row in rows:
+        unique.setdefault(row['username'], row)
+    duplicates = len(rows) - len(unique)
+
+    existing = _existing_usernames(list(unique)) if unique else set()
+    new_rows = [row for name, row in unique.items() if name not in existing]
+    # Release the read lock before hashing: holding it would block every other
+    # writer meanwhile and rule out our own upgrade to a write lock afterwards
+    db.session.commit()
+
+    # Hashing dominates the import, so spread it across all cores
+    passwords = [row['password'] for row in new_rows]
+    if len(passwords) > 1:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(passwords) // (workers * 4))
+            hashes = list(pool.map(partial(hash_password, iterations=iterations), passwords, chunksize=chunksize))
+    else:
+        hashes = [hash_password(p, iterations) for p in passwords]
+
+    now = datetime.utcnow()
+    records = [
+        {
+            'username': row['username'],
+            'password': hashed,
+            'full_name': row['full_name'],
+            'qualification': row['qualification'],
+            'dob': row['dob'],
+            'is_admin': False,
+            'created_at': now,
+        }
+        for row, hashed in zip(new_rows, hashes)
+    ]
+    for start in range(0, len(records), INSERT_CHUNK):
+        db.session.execute(User.__table__.insert(), records[start:start + INSERT_CHUNK])
+    db.session.commit()
+
+    return {
+        'created': len(records),
+        'existing': len(existing),
+        'duplicates': duplicates,
+    }
+
+
+def import_roster_file(path_or_bytes, iterations=DEFAULT_ITERATIONS, workers=None):
+    """Parse and import a roster from a file path or uploaded bytes"""
+    if isinstance(path_or_bytes, bytes):
+        stream = io.StringIO(path_or_bytes.decode('utf-8-sig'))
+        rows, errors = parse_roster(stream)
+    else:
+        with open(path_or_bytes, newline='', encoding='utf-8-sig') as stream:
+            rows, errors = parse_roster(stream)
+    summary = import_roster(rows, iterations=iterations, workers=workers)
+    summary['errors'] = errors
+    return summary
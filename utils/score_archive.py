@@ -0,0 +1,272 @@
+"""Cold storage for historical scores.
+
+``archive_scores`` moves ``scores`` rows older than a horizon into one
+directory per calendar quarter (``2023q1/``) holding a ``.npy`` file per
+column plus ``meta.json``. Integer columns are frame-of-reference encoded
+(value minus the column minimum, stored in the narrowest unsigned dtype),
+so files stay small and can still be memory-mapped without decoding the
+whole partition. Rows are sorted by ``(user_id, timestamp)`` so a student's
+attempts are one contiguous slice found by binary search.
+
+A top-level ``manifest.json`` keeps per-partition min/max stats; readers
+prune partitions with it before opening any column file. Per-user/per-quiz
+totals stay queryable in ``archived_score_summaries``.
+"""
+import json
+import os
+import shutil
+import tempfile
+from itertools import chain
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, case, cast, and_, or_, select, Integer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database.models import db, Score, AttemptAnswer, CollusionFlag, ArchivedScoreSummary
+from utils.rollups import refresh_rollups, time_taken_seconds
+
+# Integer columns in storage order; ``ability`` is kept separately as float32
+INT_COLUMNS = ('id', 'user_id', 'quiz_id', 'ts', 'total_scored', 'total_questions', 'time_taken')
+MANIFEST = 'manifest.json'
+NO_TIME = -1  # time_taken sentinel for attempts without a recorded duration
+
+
+def _narrow(values):
+    """Frame-of-reference encode an int64 column; returns ``(encoded, offset)``"""
+    if not len(values):
+        return values.astype(np.uint8), 0
+    offset = int(values.min())
+    span = int(values.max()) - offset
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if span <= np.iinfo(dtype).max:
+            return (values - offset).astype(dtype), offset
+
+
+def _quarter(ts):
+    """Partition name (``YYYYqN``) for each epoch-seconds timestamp"""
+    months = ts.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    years, quarters = months // 12 + 1970, months % 12 // 3 + 1
+    return np.char.add(np.char.add(years.astype(str), 'q'), quarters.astype(str))
+
+
+class Partition:
+    """One quarter of archived scores; columns are memory-mapped on demand"""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self._columns = {}
+
+    @property
+    def rows(self):
+        return self.meta['rows']
+
+    def raw(self, name):
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._columns[name]
+
+    def column(self, name, index=slice(None)):
+        """Decoded values of a column for ``index`` (a slice or index array)"""
+        values = self.raw(name)[index]
+        if name == 'ability':
+            return np.asarray(values, dtype=np.float64)
+        return values.astype(np.int64) + self.meta['columns'][name]['offset']
+
+    def user_slice(self, user_id):
+        """Rows belonging to ``user_id`` (rows are sorted by user)"""
+        stats = self.meta['columns']['user_id']
+        if not stats['min'] <= user_id <= stats['max']:
+            return slice(0, 0)
+        encoded = self.raw('user_id')
+        key = np.array(user_id - stats['offset']).astype(encoded.dtype)
+        return slice(int(np.searchsorted(encoded, key, 'left')), int(np.searchsorted(encoded, key, 'right')))
+
+    def load(self):
+        """Every column fully decoded, for rewriting the partition"""
+        return {name: self.column(name) for name in INT_COLUMNS + ('ability',)}
+
+
+class ScoreArchive:
+    """Partition directory plus its manifest, re-read only when it changes
+
+    Opened partitions (and their memory maps) are kept until the manifest
+    changes, so repeated lookups skip the per-file setup cost.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._manifest = {}
+        self._manifest_mtime = None
+        self._open = {}
+
+    def manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return {}
+        if mtime != self._manifest_mtime:
+            with open(path, encoding='utf-8') as f:
+                self._manifest = json.load(f)
+            self._manifest_mtime = mtime
+            self._open = {}
+        return self._manifest
+
+    def partitions(self, since=None, until=None, user_id=None):
+        """Partitions that may hold matching rows, oldest first (epoch-second bounds)"""
+        selected = []
+        for name, stats in sorted(self.manifest().items()):
+            if since is not None and stats['ts'][1] < since:
+                continue
+            if until is not None and stats['ts'][0] >= until:
+                continue
+            if user_id is not None and not stats['user_id'][0] <= user_id <= stats['user_id'][1]:
+                continue
+            if name not in self._open:
+                self._open[name] = self.open(name)
+            selected.append(self._open[name])
+        return selected
+
+    def open(self, name):
+        path = os.path.join(self.directory, name)
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            return Partition(path, json.load(f))
+
+    def _write_partition(self, name, columns):
+        """Atomically replace partition ``name`` with ``columns``"""
+        order = np.lexsort((columns['ts'], columns['user_id']))
+        meta = {'rows': int(len(order)), 'columns': {}}
+        tmp = tempfile.mkdtemp(prefix=f'.{name}-', dir=self.directory)
+        for column in INT_COLUMNS:
+            values = columns[column][order]
+            encoded, offset = _narrow(values)
+            np.save(os.path.join(tmp, f'{column}.npy'), encoded)
+            meta['columns'][column] = {
+                'dtype': str(encoded.dtype),
+                'offset': offset,
+                'min': int(values.min()),
+                'max': int(values.max()),
+            }
+        np.save(os.path.join(tmp, 'ability.npy'), columns['ability'][order].astype(np.float32))
+        with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        target = os.path.join(self.directory, name)
+        if os.path.exists(target):
+            old = target + '.old'
+            shutil.rmtree(old, ignore_errors=True)
+            os.rename(target, old)
+            os.rename(tmp, target)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.rename(tmp, target)
+        # Manifest entry: enough stats to prune without opening the partition
+        entry = {column: [meta['columns'][column]['min'], meta['columns'][column]['max']]
+                 for column in ('ts', 'user_id', 'quiz_id')}
+        entry['rows'] = meta['rows']
+        return entry
+
+    def _write_manifest(self, manifest):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, os.path.join(self.directory, MANIFEST))
+
+    def append(self, columns):
+        """Merge new rows into their quarter partitions (repeated copies of an attempt are dropped)"""
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = dict(self.manifest())
+        names = _quarter(columns['ts'])
+        for name in np.unique(names).tolist():
+            mask = names == name
+            merged = {column: values[mask] for column, values in columns.items()}
+            if name in manifest:
+                current = self.open(name).load()
+                merged = {column: np.concatenate([current[column], merged[column]]) for column in merged}
+                identity = np.stack([merged[column].astype(np.int64) for column in ('id', 'user_id', 'quiz_id', 'ts')], axis=1)
+                _, first = np.unique(identity, axis=0, return_index=True)
+                merged = {column: values[first] for column, values in merged.items()}
+            manifest[name] = self._write_partition(name, merged)
+        self._write_manifest(manifest)
+
+
+_archives = {}
+
+
+def get_archive(directory=None):
+    """Shared ``ScoreArchive`` for a directory (defaults to ``SCORE_ARCHIVE_DIR``)"""
+    directory = directory or current_app.config['SCORE_ARCHIVE_DIR']
+    if directory not in _archives:
+        _archives[directory] = ScoreArchive(directory)
+    return _archives[directory]
+
+
+def _fetch_columns(condition):
+    """Scores matching ``condition`` as int64/float arrays, ordered by id"""
+    time_taken = case((Score.time_taken.is_(None), NO_TIME), else_=time_taken_seconds(Score.time_taken))
+    query = db.session.query(
+        Score.id, Score.user_id, Score.quiz_id,
+        cast(func.strftime('%s', Score.time_stamp_of_attempt), Integer),
+        Score.total_scored, Score.total_questions, time_taken,
+    ).filter(condition).order_by(Score.id)
+    matrix = np.fromiter(chain.from_iterable(query), dtype=np.int64).reshape(-1, len(INT_COLUMNS))
+    columns = {name: matrix[:, i] for i, name in enumerate(INT_COLUMNS)}
+
+    # Only adaptive attempts carry an ability estimate
+    ability = np.full(len(matrix), np.nan)
+    rated = db.session.query(Score.id, Score.ability).filter(condition, Score.ability.isnot(None)).all()
+    if rated:
+        ids, values = zip(*rated)
+        ability[np.searchsorted(columns['id'], ids)] = values
+    columns['ability'] = ability
+    return columns
+
+
+def _upsert_summaries(condition):
+    """Fold the rows about to be archived into the per-user/per-quiz totals (one statement)"""
+    percentage = Score.total_scored * 100.0 / Score.total_questions
+    grouped = select(
+        Score.user_id, Score.quiz_id, func.count(), func.sum(percentage),
+        func.max(percentage), func.max(Score.time_stamp_of_attempt)
+    ).where(condition, Score.total_questions > 0).group_by(Score.user_id, Score.quiz_id)
+    table = ArchivedScoreSummary.__table__
+    statement = sqlite_insert(table).from_select(
+        ['user_id', 'quiz_id', 'attempts', 'percentage_sum', 'best_percentage', 'last_attempt_at'], grouped
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.quiz_id],
+        set_={
+            'attempts': table.c.attempts + statement.excluded.attempts,
+            'percentage_sum': table.c.percentage_sum + statement.excluded.percentage_sum,
+            'best_percentage': func.max(table.c.best_percentage, statement.excluded.best_percentage),
+            'last_attempt_at': func.max(table.c.last_attempt_at, statement.excluded.last_attempt_at),
+        }
+    ))
+
+
+def archive_scores(before, directory=None):
+    """Move scores attempted before ``before`` into cold storage; returns rows moved"""
+    # Rollups must already include everything that is about to leave the table
+    refresh_rollups()
+
+    upto = db.session.query(func.max(Score.id)).filter(Score.time_stamp_of_attempt < before).scalar()
+    if not upto:
+        return 0
+    condition = and_(Score.time_stamp_of_attempt < before, Score.id <= upto)
+
+    # Files are written before the delete commits; readers and later runs
+    # de-duplicate identical attempts, so a crash in between only leaves harmless copies
+    columns = _fetch_columns(condition)
+    get_archive(directory).append(columns)
+
+    _upsert_summaries(condition)
+    archived = select(Score.id).where(condition)
+    AttemptAnswer.query.filter(AttemptAnswer.score_id.in_(archived)).delete(synchronize_session=False)
+    CollusionFlag.query.filter(or_(
+        CollusionFlag.score_a_id.in_(archived), CollusionFlag.score_b_id.in_(archived)
+    )).delete(synchronize_session=False)
+    Score.query.filter(condition).delete(synchronize_session=False)
+    db.session.commit()
+    return len(columns['id'])
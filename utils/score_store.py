@@ -0,0 +1,112 @@
+"""Read access to scores across the live table and the cold archive.
+
+Callers get ``ScoreRow`` tuples regardless of where a row lives. Archive
+partitions are pruned by date (and user) from the manifest first, so
+queries bounded to recent dates never open archive files.
+"""
+from calendar import timegm
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+
+from database.models import db, Score
+from utils.score_archive import get_archive, NO_TIME
+
+
+class ScoreRow(namedtuple('ScoreRow', 'id quiz_id user_id time_stamp_of_attempt total_scored '
+                                      'total_questions time_taken ability archived')):
+    __slots__ = ()
+
+    @property
+    def percentage(self):
+        return round((self.total_scored / self.total_questions) * 100, 2)
+
+
+LIVE_COLUMNS = (Score.id, Score.quiz_id, Score.user_id, Score.time_stamp_of_attempt,
+                Score.total_scored, Score.total_questions, Score.time_taken, Score.ability)
+
+
+def _epoch(value):
+    return None if value is None else timegm(value.timetuple())
+
+
+def _archived_rows(partition, index):
+    """Decode ``index`` of a partition into ``ScoreRow`` tuples"""
+    ts = partition.column('ts', index).astype('datetime64[s]').tolist()
+    ability = partition.column('ability', index)
+    time_taken = partition.column('time_taken', index)
+    return [
+        ScoreRow(id_, quiz_id, user_id, when, scored, total,
+                 None if seconds == NO_TIME else str(timedelta(seconds=seconds)),
+                 None if np.isnan(theta) else round(float(theta), 3), True)
+        for id_, quiz_id, user_id, when, scored, total, seconds, theta in zip(
+            partition.column('id', index).tolist(), partition.column('quiz_id', index).tolist(),
+            partition.column('user_id', index).tolist(), ts,
+            partition.column('total_scored', index).tolist(),
+            partition.column('total_questions', index).tolist(), time_taken.tolist(), ability
+        )
+    ]
+
+
+def _identity(row):
+    """Key telling copies of one attempt apart from different attempts with the same id
+
+    Archived timestamps have whole seconds. Ids alone are not enough on
+    databases from before ``scores`` used AUTOINCREMENT, where ids of
+    archived rows could be handed out again.
+    """
+    when = row.time_stamp_of_attempt
+    return row.id, row.user_id, row.quiz_id, when and when.replace(microsecond=0)
+
+
+def _in_range(partition, index, since, until):
+    """Narrow ``index`` (a slice) to rows with ``since <= ts < until``"""
+    ts = partition.column('ts', index)
+    keep = np.ones(len(ts), dtype=bool)
+    if since is not None:
+        keep &= ts >= since
+    if until is not None:
+        keep &= ts < until
+    return np.arange(index.start or 0, (index.start or 0) + len(ts))[keep]
+
+
+def user_scores(user_id, since=None, until=None):
+    """All attempts of a user, newest first"""
+    query = db.session.query(*LIVE_COLUMNS).filter(Score.user_id == user_id)
+    if since is not None:
+        query = query.filter(Score.time_stamp_of_attempt >= since)
+    if until is not None:
+        query = query.filter(Score.time_stamp_of_attempt < until)
+    rows = [ScoreRow(*row, archived=False) for row in query]
+
+    live = {_identity(row) for row in rows}
+    start, end = _epoch(since), _epoch(until)
+    for partition in get_archive().partitions(start, end, user_id=user_id):
+        index = _in_range(partition, partition.user_slice(user_id), start, end)
+        rows.extend(row for row in _archived_rows(partition, index) if _identity(row) not in live)
+    rows.sort(key=lambda row: row.time_stamp_of_attempt, reverse=True)
+    return rows
+
+
+def iter_scores(since=None, until=None, batch_size=5000):
+    """Every attempt in ``[since, until)``, oldest first, archive before live"""
+    start, end = _epoch(since), _epoch(until)
+    archived = set()
+    for partition in get_archive().partitions(start, end):
+        index = _in_range(partition, slice(0, partition.rows), start, end)
+        index = index[np.argsort(partition.column('ts', index), kind='stable')]
+        for offset in range(0, len(index), batch_size):
+            batch = _archived_rows(partition, index[offset:offset + batch_size])
+            archived.update(_identity(row) for row in batch)
+            yield from batch
+
+    query = db.session.query(*LIVE_COLUMNS).order_by(Score.time_stamp_of_attempt, Score.id)
+    if since is not None:
+        query = query.filter(Score.time_stamp_of_attempt >= since)
+    if until is not None:
+        query = query.filter(Score.time_stamp_of_attempt < until)
+    for row in query.yield_per(batch_size):
+        row = ScoreRow(*row, archived=False)
+        if not archived or _identity(row) not in archived:
+            yield row
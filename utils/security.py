@@ -0,0 +1,46 @@
+"""Password hashing helpers.
+
+Passwords are stored as Werkzeug PBKDF2 hashes. The iteration count is the
+cost factor and comes from ``PASSWORD_HASH_ITERATIONS``; hashes made with a
+different count (or legacy plain-text passwords) are upgraded on login.
+"""
+import hmac
+import secrets
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_ITERATIONS = 600000
+_HASH_PREFIX = 'pbkdf2:'
+_dummy_hashes = {}  # Iterations -> hash of a random password, see verify_dummy
+
+
+def hash_password(password, iterations=DEFAULT_ITERATIONS):
+    """Return a salted PBKDF2-SHA256 hash of ``password``"""
+    return generate_password_hash(password, method=f'pbkdf2:sha256:{iterations}')
+
+
+def verify_password(stored, password):
+    """Check ``password`` against a stored hash (or legacy plain-text value)"""
+    if stored.startswith(_HASH_PREFIX):
+        return check_password_hash(stored, password)
+    return hmac.compare_digest(stored.encode(), password.encode())
+
+
+def verify_dummy(password, iterations=DEFAULT_ITERATIONS):
+    """Do the work of a real check against a hash no password matches; always False
+
+    Used for unknown usernames, so response time does not reveal which exist.
+    """
+    dummy = _dummy_hashes.get(iterations)
+    if dummy is None:
+        dummy = _dummy_hashes[iterations] = hash_password(secrets.token_urlsafe(16), iterations)
+    check_password_hash(dummy, password)
+    return False
+
+
+def needs_rehash(stored, iterations=DEFAULT_ITERATIONS):
+    """True when the stored value is plain text or uses another cost factor"""
+    if not stored.startswith(_HASH_PREFIX):
+        return True
+    method = stored.split('$', 1)[0]
+    return method != f'pbkdf2:sha256:{iterations}'
@@ -0,0 +1,88 @@
+"""Background tasks run by ``flask worker`` (see ``utils.jobs``).
+
+Each task receives its job's payload as keyword arguments and returns a
+JSON-serializable summary that the jobs page shows. Tasks may be retried,
+so each one must be safe to run again after a failure.
+"""
+from flask import current_app
+
+from database.models import db, Subject
+from utils.collusion import detect_collusion
+from utils.duplicates import index_questions, refresh_duplicate_report
+from utils.events import event_log
+from utils.fragment_cache import bump_catalog_version
+from utils.jobs import task, progress, current_job
+from utils.media import build_derivatives
+from utils.projections import replay, PROJECTIONS
+from utils.rollups import refresh_rollups
+from utils.roster import import_roster_file
+
+MAX_ERRORS = 100  # Roster errors kept in the job result
+
+
+@task('subjects.delete')
+def delete_subject(subject_id):
+    """Delete a subject with its chapters, quizzes, questions and attempts"""
+    subject = db.session.get(Subject, subject_id)
+    if subject is None:
+        return {'deleted': False}
+    name = subject.name
+    db.session.delete(subject)
+    bump_catalog_version()
+    db.session.commit()
+    event_log.record('subject.deleted', current_job().actor_id, subject_id=subject_id)
+    return {'deleted': True, 'name': name}
+
+
+@task('questions.index', queue='index')
+def index_new_questions(question_ids=None):
+    """Add questions to the near-duplicate index (all unindexed ones by default)"""
+    indexed = index_questions(question_ids, progress=progress)
+    if not indexed:
+        return {'indexed': 0}
+    return {'indexed': indexed, 'clusters': refresh_duplicate_report()}
+
+
+@task('duplicates.report', queue='index')
+def rebuild_duplicate_report():
+    """Recompute the stored near-duplicate cluster report"""
+    return {'clusters': refresh_duplicate_report()}
+
+
+@task('media.derivatives', queue='media')
+def build_image_variants(sha256s=None):
+    """Generate the resized variants of uploaded images"""
+    return {'built': build_derivatives(sha256s, progress=progress)}
+
+
+@task('reports.refresh', queue='maintenance')
+def refresh_reports(full=False):
+    """Fold new attempts into the statistics rollups"""
+    return {'processed': refresh_rollups(full=full)}
+
+
+@task('events.replay', queue='maintenance')
+def replay_events(from_scratch=False):
+    """Bring the event log projections up to date, one projection at a time"""
+    applied = {}
+    for done, name in enumerate(PROJECTIONS, start=1):
+        applied.update(replay([name], from_scratch=from_scratch))
+        progress(done, len(PROJECTIONS), f'{name}: {applied[name]} events applied')
+    return applied
+
+
+@task('collusion.detect')
+def run_collusion_detection(quiz_id):
+    """Recompute the collusion flags of a quiz"""
+    return {'flagged': detect_collusion(quiz_id)}
+
+
+@task('users.import')
+def import_users(upload):
+    """Create student accounts from an uploaded roster CSV; existing usernames are skipped"""
+    summary = import_roster_file(upload, iterations=current_app.config['PASSWORD_HASH_ITERATIONS'])
+    event_log.record('users.imported', current_job().actor_id, created=summary['created'],
+                     existing=summary['existing'], duplicates=summary['duplicates'])
+    summary['error_count'] = len(summary['errors'])
+    summary['errors'] = summary['errors'][:MAX_ERRORS]
+    return summary
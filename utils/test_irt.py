@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from utils.irt import ItemBank, calibrate, A_BOUNDS, B_BOUNDS
+
+
+def simulate(model, seed, persons=1500, items=40, answered=1.0):
+    """Responses drawn from known parameters; each person answers a random share of the items"""
+    rng = np.random.default_rng(seed)
+    a = rng.lognormal(0.0, 0.3, items)
+    b = rng.normal(0.0, 1.0, items)
+    c = rng.beta(5, 17, items) if model == '3PL' else np.zeros(items)
+    theta = rng.normal(0.0, 1.0, persons)
+    person = np.repeat(np.arange(persons), items)
+    item = np.tile(np.arange(items), persons)
+    keep = rng.random(len(person)) < answered
+    person, item = person[keep], item[keep]
+    p = c[item] + (1 - c[item]) / (1 + np.exp(-a[item] * (theta[person] - b[item])))
+    correct = (rng.random(len(p)) < p).astype(np.int64)
+    return (a, b, c, theta), (person, item, correct, persons, items)
+
+
+def corr(x, y):
+    return np.corrcoef(x, y)[0, 1]
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('answered', [1.0, 0.5])
+def test_2pl_recovers_parameters(seed, answered):
+    (a, b, _, _), data = simulate('2PL', seed, answered=answered)
+    fa, fb, fc = calibrate(*data, model='2PL')
+    assert corr(a, fa) > 0.85
+    assert corr(b, fb) > 0.97
+    assert np.sqrt(np.mean((b - fb) ** 2)) < 0.25
+    assert not fc.any()
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_3pl_recovers_parameters(seed):
+    (a, b, c, _), data = simulate('3PL', seed, persons=3000)
+    fa, fb, fc = calibrate(*data, model='3PL')
+    # No item may end up stuck at a bound
+    assert not np.isin(fa, A_BOUNDS).any()
+    assert not np.isin(fb, B_BOUNDS).any()
+    assert corr(a, fa) > 0.7
+    assert corr(b, fb) > 0.9
+    assert np.sqrt(np.mean((b - fb) ** 2)) < 0.5
+    assert np.sqrt(np.mean((c - fc) ** 2)) < 0.12
+
+
+def test_eap_estimate_tracks_ability():
+    (a, b, c, theta), (person, item, correct, persons, items) = simulate('2PL', 3, persons=300)
+    bank = ItemBank(np.arange(items), a, b, c)
+    estimates = []
+    for who in range(persons):
+        mine = person == who
+        estimates.append(bank.estimate(item[mine].tolist(), correct[mine].tolist()))
+    theta_hat, se = np.array(estimates).T
+    assert corr(theta, theta_hat) > 0.9
+    assert (se > 0).all() and (se < 1).all()
+    # No responses: the prior mean
+    assert bank.estimate([], [])[0] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_next_item_skips_administered_items():
+    bank = ItemBank([10, 11, 12], [1.0, 1.5, 1.0], [-1.0, 0.0, 1.0], [0.0, 0.0, 0.0])
+    assert bank.next_item(0.0) == 11
+    assert bank.next_item(0.0, administered=[11]) in (10, 12)
+    assert bank.next_item(0.0, administered=[10, 11, 12]) is None
@@ -0,0 +1,90 @@
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.models import db, Job
+from utils.jobs import task, enqueue, save_upload, _claim, _finish, Supervisor
+
+
+@task('tests.noop', queue='index')
+def noop(**payload):
+    return payload
+
+
+def due(job_id):
+    """Make a job claimable now, skipping its backoff"""
+    db.session.get(Job, job_id).run_after = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_claim_takes_due_jobs_in_order_within_the_limit(app):
+    first, second = enqueue('tests.noop', n=1), enqueue('tests.noop', n=2)
+    later = enqueue('tests.noop', n=3)
+    db.session.get(Job, later).run_after = datetime.utcnow() + timedelta(hours=1)
+    db.session.commit()
+
+    claimed = _claim('index', 1, 'w:1')
+    assert claimed[0] == first and claimed[-1] == 1  # attempt number
+    assert _claim('index', 1, 'w:2') is None  # The queue's one slot is taken
+    assert _claim('default', 2, 'w:2') is None
+
+    _finish(first, 'w:1', True, json.dumps({'n': 1}))
+    assert db.session.get(Job, first).status == 'succeeded'
+    assert _claim('index', 1, 'w:2')[0] == second
+    assert _claim('index', 2, 'w:2') is None  # Not due yet
+
+
+def test_failed_job_retries_with_backoff_then_fails(app):
+    app.config['JOB_RETRY_BACKOFF'] = 10
+    job_id = enqueue('tests.noop')
+    for attempt, delay in ((1, 10), (2, 20)):
+        assert _claim('index', 1, 'w:1')[-1] == attempt
+        started = datetime.utcnow()
+        _finish(job_id, 'w:1', False, 'Traceback\n')
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.attempts, job.error) == ('queued', attempt, 'Traceback\n')
+        wait = (job.run_after - started).total_seconds()
+        assert delay <= wait <= delay * 1.1 + 1
+        assert _claim('index', 1, 'w:1') is None
+        due(job_id)
+
+    _claim('index', 1, 'w:1')
+    _finish(job_id, 'w:1', False, 'Traceback\n')
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.attempts) == ('failed', 3)
+    assert job.finished_at is not None
+
+
+def test_stale_job_is_reclaimed_and_late_result_ignored(app):
+    job_id = enqueue('tests.noop')
+    _claim('index', 1, 'gone:1')
+    stale = datetime.utcnow() - timedelta(seconds=app.config['JOB_STALE_SECONDS'] + 1)
+    db.session.get(Job, job_id).heartbeat_at = stale
+    db.session.commit()
+
+    supervisor = Supervisor(app)
+    supervisor._maintain()
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.attempts) == ('queued', 1)
+    assert 'gone:1 stopped sending heartbeats' in job.error
+
+    # The lost worker reporting in afterwards must not overwrite the retry
+    _finish(job_id, 'gone:1', True, '{}')
+    assert db.session.get(Job, job_id).status == 'queued'
+    due(job_id)
+    assert _claim('index', 1, supervisor.name)[-1] == 2
+
+
+@pytest.mark.parametrize('ok', [True, False])
+def test_upload_is_deleted_once_the_job_ends(app, ok):
+    path = save_upload(io.BytesIO(b'username,password\n'))
+    assert os.path.exists(path)
+    job_id = enqueue('tests.noop', upload=path)
+    db.session.get(Job, job_id).max_attempts = 1
+    db.session.commit()
+    _claim('index', 1, 'w:1')
+    _finish(job_id, 'w:1', ok, '{}')
+    assert not os.path.exists(path)
@@ -0,0 +1,28 @@
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from utils.live_monitor import LiveMonitor
+
+
+def quiz(quiz_id, opened, closes):
+    now = datetime.now()
+    return SimpleNamespace(id=quiz_id, title=f'Quiz {quiz_id}',
+                           live_from=now + timedelta(minutes=opened), live_to=now + timedelta(minutes=closes))
+
+
+def test_snapshot_shows_only_live_quizzes():
+    monitor = LiveMonitor()
+    live, closed, upcoming = quiz(1, -30, 30), quiz(2, -90, -10), quiz(3, 10, 60)
+    for q in (live, closed, upcoming):
+        monitor.record_start(q, user_id=7)
+        monitor.record_start(q, user_id=8)
+        monitor.record_submit(q, 8, 85.0)
+    monitor.record_start(SimpleNamespace(id=4, title='Quiz 4', live_from=None, live_to=None), user_id=7)
+
+    snapshot = {q['quiz_id']: q for q in json.loads(monitor._build_snapshot())['quizzes']}
+    assert sorted(snapshot) == [1, 4]
+    assert sum(snapshot[1]['started']) == 2
+    assert sum(snapshot[1]['submitted']) == 1
+    assert snapshot[1]['in_flight'] == 1
+    assert snapshot[1]['histogram'][8] == 1
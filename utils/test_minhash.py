@@ -0,0 +1,42 @@
+import numpy as np
+
+from utils.minhash import NUM_HASHES, BANDS, signatures, band_keys
+
+
+def sign(*sets):
+    tokens = np.concatenate([np.asarray(s, dtype=np.int64) for s in sets])
+    starts = np.cumsum([0] + [len(s) for s in sets[:-1]])
+    return signatures(tokens, starts)
+
+
+def test_signature_agreement_estimates_jaccard():
+    rng = np.random.default_rng(0)
+    errors = []
+    for overlap in range(0, 201, 25):
+        shared = rng.choice(1 << 40, 200 + (200 - overlap), replace=False)
+        left, right = shared[:200], np.concatenate([shared[:overlap], shared[200:]])
+        jaccard = overlap / (400 - overlap)
+        sig = sign(left, right)
+        errors.append(np.mean(sig[:, 0] == sig[:, 1]) - jaccard)
+    assert sig.shape == (NUM_HASHES, 2)
+    assert abs(np.mean(errors)) < 0.05
+    assert np.max(np.abs(errors)) < 0.2
+
+
+def test_signatures_are_stable_and_order_free():
+    tokens = np.arange(1000, 1100)
+    assert (sign(tokens) == sign(tokens[::-1])).all()
+    assert (band_keys(sign(tokens)) == band_keys(sign(tokens.copy()))).all()
+    assert sign(tokens).max() < (1 << 31)
+
+
+def test_band_keys_collide_for_near_duplicates_only():
+    rng = np.random.default_rng(1)
+    base = rng.choice(1 << 40, 100, replace=False)
+    near = base.copy()
+    near[:3] = rng.choice(1 << 40, 3)  # Jaccard ~0.94
+    unrelated = rng.choice(1 << 40, 100, replace=False)
+    keys = band_keys(sign(base, near, unrelated))
+    assert keys.shape == (BANDS, 3)
+    assert (keys[:, 0] == keys[:, 1]).any()
+    assert not (keys[:, 0] == keys[:, 2]).any()
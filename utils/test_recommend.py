@@ -0,0 +1,37 @@
+from database.models import db, Score, ArchivedScoreSummary, Recommendation
+from utils.recommend import build_recommendations
+
+
+def attempt(user_id, quiz_id):
+    db.session.add(Score(quiz_id=quiz_id, user_id=user_id, total_scored=1, total_questions=2, time_taken='0:01:00'))
+
+
+def recommended(user_id):
+    return [r.quiz_id for r in Recommendation.query.filter_by(user_id=user_id).order_by(Recommendation.rank)]
+
+
+def test_recommends_unseen_quizzes_from_similar_students(app, quizzes, students):
+    quiz_ids, user_ids = quizzes(8), students(22)
+    maths, history = quiz_ids[:4], quiz_ids[4:]
+    # Two groups with distinct tastes; the history group is larger so it wins on popularity
+    for user_id in user_ids[:8]:
+        for quiz_id in maths:
+            attempt(user_id, quiz_id)
+    for user_id in user_ids[8:20]:
+        for quiz_id in history:
+            attempt(user_id, quiz_id)
+    learner, newcomer = user_ids[20], user_ids[21]
+    attempt(learner, maths[0])
+    attempt(learner, maths[1])
+    # An archived attempt still counts as seen
+    db.session.add(ArchivedScoreSummary(user_id=learner, quiz_id=maths[2], attempts=1,
+                                        percentage_sum=50.0, best_percentage=50.0))
+    db.session.commit()
+
+    assert build_recommendations(top_n=3, factors=2) == 22
+    assert recommended(learner)[0] == maths[3]
+    assert not set(recommended(learner)) & set(maths[:3])
+    assert not set(recommended(user_ids[0])) & set(maths)
+    # No history: the most attempted quizzes
+    assert set(recommended(newcomer)) <= set(history)
+    assert len(recommended(newcomer)) == 3
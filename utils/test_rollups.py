@@ -0,0 +1,58 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from database.models import db, Score, QuizStats
+from utils.rollups import refresh_rollups, summarize, BUCKETS
+
+
+def stats(histogram):
+    return SimpleNamespace(attempts=sum(histogram), passed=0, percentage_sum=0.0, time_taken_sum=0,
+                           histogram=','.join(map(str, histogram)))
+
+
+@pytest.mark.parametrize('histogram, median', [
+    ([0, 0, 0, 0, 0, 4, 0, 0, 0, 0], 55.0),  # Middle of the only bucket
+    ([0, 1, 0, 1, 0, 1, 0, 1, 0, 1], 55.0),
+    ([2, 0, 0, 0, 0, 0, 0, 0, 0, 2], 10.0),  # Top of the lower half
+    ([0, 0, 0, 0, 0, 0, 0, 0, 0, 3], 95.0),
+])
+def test_summarize_interpolates_median(histogram, median):
+    assert summarize(stats(histogram))['median'] == median
+
+
+def test_summarize_without_attempts():
+    assert summarize(None) is None
+    assert summarize(stats([0] * BUCKETS)) is None
+
+
+def test_incremental_refresh_matches_full_rebuild(app, quizzes, students):
+    (quiz_id,), user_ids = quizzes(1), students(3)
+    rng = np.random.default_rng(0)
+    scored = rng.integers(0, 21, 60).tolist()
+
+    def add(values):
+        db.session.add_all(Score(quiz_id=quiz_id, user_id=user_ids[i % 3], total_scored=value, total_questions=20,
+                                 time_taken='0:01:30', time_stamp_of_attempt=datetime(2024, 1, 1))
+                           for i, value in enumerate(values))
+        db.session.commit()
+
+    add(scored[:40])
+    assert refresh_rollups() == 40
+    add(scored[40:])
+    assert refresh_rollups() == 20
+    assert refresh_rollups() == 0
+    incremental = summarize(db.session.get(QuizStats, quiz_id))
+
+    refresh_rollups(full=True)
+    assert summarize(db.session.get(QuizStats, quiz_id)) == incremental
+
+    percentages = np.array(scored) * 5
+    assert incremental['attempts'] == 60
+    assert incremental['mean'] == pytest.approx(percentages.mean(), abs=0.01)
+    assert incremental['pass_rate'] == pytest.approx((percentages >= 50).mean() * 100, abs=0.01)
+    assert incremental['histogram'] == np.bincount(np.minimum(percentages // 10, 9), minlength=BUCKETS).tolist()
+    assert abs(incremental['median'] - np.median(percentages)) <= 100 / BUCKETS
+    assert incremental['avg_time'] == '0:01:30'
@@ -0,0 +1,107 @@
+from calendar import timegm
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from database.models import db, Score, ArchivedScoreSummary
+from utils.score_archive import ScoreArchive, INT_COLUMNS, NO_TIME, _narrow, archive_scores
+from utils.score_store import user_scores, iter_scores
+
+
+@pytest.mark.parametrize('values, dtype', [
+    ([1_700_000_000, 1_700_000_200], np.uint8),
+    ([-5, 0, 250], np.uint8),
+    ([0, 60_000], np.uint16),
+    ([1, 1 << 20], np.uint32),
+    ([0, 1 << 40], np.uint64),
+])
+def test_narrow_round_trips(values, dtype):
+    values = np.array(values, dtype=np.int64)
+    encoded, offset = _narrow(values)
+    assert encoded.dtype == dtype
+    assert (encoded.astype(np.int64) + offset == values).all()
+
+
+def columns(rows, seed=0):
+    """Random archive columns; timestamps spread over 2023"""
+    rng = np.random.default_rng(seed)
+    start = timegm((2023, 1, 1, 0, 0, 0))
+    ability = rng.normal(0.0, 1.0, rows)
+    ability[rng.random(rows) < 0.5] = np.nan
+    return {
+        'id': np.arange(1, rows + 1, dtype=np.int64),
+        'user_id': rng.integers(2, 40, rows),
+        'quiz_id': rng.integers(1, 500, rows),
+        'ts': start + rng.integers(0, 360 * 86400, rows),
+        'total_scored': rng.integers(0, 10, rows),
+        'total_questions': np.full(rows, 10, dtype=np.int64),
+        'time_taken': np.where(rng.random(rows) < 0.1, NO_TIME, rng.integers(0, 3600, rows)),
+        'ability': ability,
+    }
+
+
+def by_id(data):
+    order = np.argsort(data['id'])
+    return {name: values[order] for name, values in data.items()}
+
+
+def test_append_round_trips_by_quarter(tmp_path):
+    archive = ScoreArchive(str(tmp_path))
+    data = columns(2000)
+    archive.append(data)
+
+    partitions = archive.partitions()
+    assert [p.path.rsplit('/', 1)[-1] for p in partitions] == ['2023q1', '2023q2', '2023q3', '2023q4']
+    assert sum(p.rows for p in partitions) == 2000
+    loaded = {name: np.concatenate([p.load()[name] for p in partitions]) for name in data}
+    expected, actual = by_id(data), by_id(loaded)
+    for name in INT_COLUMNS:
+        assert (expected[name] == actual[name]).all(), name
+    np.testing.assert_allclose(expected['ability'], actual['ability'], rtol=1e-6)
+
+    # A user's rows are one contiguous, time-ordered slice of each partition
+    for partition in partitions:
+        index = partition.user_slice(7)
+        assert (partition.column('user_id', index) == 7).all()
+        assert (np.diff(partition.column('ts', index)) >= 0).all()
+    assert sum(len(partition.column('id', partition.user_slice(7))) for partition in partitions) == (data['user_id'] == 7).sum()
+
+
+def test_append_drops_repeated_copies(tmp_path):
+    archive = ScoreArchive(str(tmp_path))
+    data = columns(500)
+    archive.append(data)
+    # The same rows again plus one new attempt
+    repeated = {name: np.concatenate([values, values[:1]]) for name, values in data.items()}
+    repeated['id'][-1] = 10_000
+    archive.append(repeated)
+    assert sum(p.rows for p in archive.partitions()) == 501
+
+
+def test_archived_scores_read_back_unchanged(app, quizzes, students):
+    quiz_ids, user_ids = quizzes(3), students(4)
+    old, recent = datetime(2022, 3, 1, 12, 0, 0), datetime.utcnow().replace(microsecond=0)
+    for i, user_id in enumerate(user_ids):
+        for j, quiz_id in enumerate(quiz_ids):
+            db.session.add(Score(quiz_id=quiz_id, user_id=user_id, total_scored=i + j, total_questions=10,
+                                 time_taken=f'0:0{j}:1{i}', time_stamp_of_attempt=old + timedelta(days=i * 40 + j),
+                                 ability=0.5 * j if j else None))
+        db.session.add(Score(quiz_id=quiz_ids[0], user_id=user_id, total_scored=5, total_questions=5,
+                             time_stamp_of_attempt=recent))
+    db.session.commit()
+    before = {user_id: user_scores(user_id) for user_id in user_ids}
+
+    assert archive_scores(datetime(2023, 1, 1)) == 12
+    assert Score.query.count() == 4
+    assert ArchivedScoreSummary.query.count() == 12
+
+    for user_id in user_ids:
+        after = user_scores(user_id)
+        assert [row[:-1] for row in after] == [row[:-1] for row in before[user_id]]
+        assert [row.archived for row in after] == [False] + [True] * 3
+    assert len(user_scores(user_ids[0], since=recent)) == 1
+
+    rows = list(iter_scores())
+    assert len(rows) == 16
+    assert [row.time_stamp_of_attempt for row in rows] == sorted(row.time_stamp_of_attempt for row in rows)